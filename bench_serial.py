@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+import tracemalloc
+from bg95_serial import bg95_serial
+from bg95_atcmds import bg95_atcmds
+from bg95_transport import pty_transport
+
+############################################################################################################
+# micro-benchmark of the serial hot path: bytes/s and allocated bytes and blocks per AT command round trip
+############################################################################################################
+
+RESPONSE = b'\r\n+CSQ: 20,99\r\n\r\nOK\r\n'
+
+class sim_port:
+  # in-memory modem that echoes every command and answers with a canned response
+  name = "sim"
+  is_open = True
+
+  def __init__(self, response=RESPONSE):
+    self._response = response
+    self._rx = bytearray()
+    self._timeout = 0
+    self.port_calls = 0
+    self.timeout_updates = 0
+
+  @property
+  def timeout(self):
+    return self._timeout
+
+  @timeout.setter
+  def timeout(self, value):
+    # a real port does a termios ioctl here
+    self.port_calls += 1
+    self.timeout_updates += 1
+    self._timeout = value
+
+  @property
+  def in_waiting(self):
+    return len(self._rx)
+
+  def write(self, data):
+    self._rx += data
+    self._rx += b'\n'
+    self._rx += self._response
+    return len(data)
+
+  def read(self, size=1):
+    # a real port does a select() and read() system call here
+    self.port_calls += 1
+    data = bytes(self._rx[:size])
+    del self._rx[:size]
+    return data
+
+  def readinto(self, buffer):
+    self.port_calls += 1
+    size = min(len(buffer), len(self._rx))
+    buffer[:size] = self._rx[:size]
+    del self._rx[:size]
+    return size
+
+  def readline(self):
+    # like pyserial, which reads a line one byte at a time
+    line = bytearray()
+    while True:
+      c = self.read(1)
+      if not c:
+        break
+      line += c
+      if c == b'\n':
+        break
+    return bytes(line)
+
+  def close(self):
+    pass
+
+class pty_modem:
+  # modem on the master side of a pseudo terminal that echoes every command and answers with a
+  # canned response. the HAL opens peer_name with serial_transport, so reads go through pyserial
+  # and the same system calls as on a real UART
+  def __init__(self, response=RESPONSE):
+    self._response = response
+    self._port = pty_transport(timeout=0.1)
+    self.peer_name = self._port.peer_name
+    threading.Thread(target=self._run, daemon=True).start()
+
+  def _run(self):
+    command = b''
+    try:
+      while self._port.is_open:
+        command += self._port.read(max(1, self._port.in_waiting))
+        while b'\r' in command:
+          line, command = command.split(b'\r', 1)
+          self._port.write(line + b'\r\n' + self._response)
+    except OSError:
+      # closed while reading
+      pass
+
+  def close(self):
+    self._port.close()
+
+class port_counter:
+  # counts the system calls of the pyserial port under a serial_transport like sim_port does:
+  # reads, and timeout updates, which reconfigure the port
+  def __init__(self, transport):
+    self.port_calls = 0
+    self.timeout_updates = 0
+    port = transport._port
+    reconfigure, read = port._reconfigure_port, port.read
+
+    def counted_reconfigure():
+      self.port_calls += 1
+      self.timeout_updates += 1
+      reconfigure()
+
+    def counted_read(size=1):
+      self.port_calls += 1
+      return read(size)
+
+    port._reconfigure_port = counted_reconfigure
+    port.read = counted_read
+
+class readline_serial(bg95_serial):
+  # the previous implementation, readline() and a timeout update for every line, as reference
+  def _write_line(self, command) -> bool:
+    self._ser.write(command.encode('utf-8') + b'\r')
+    return True
+
+  def _read_line(self, timeout=0):
+    self._ser.timeout = timeout
+    return True, self._ser.readline().decode().rstrip()
+
+def run_lines(transport, commands):
+  # write each command and read echo plus response lines up to the final OK
+  for _ in range(commands):
+    transport._write_line("AT+CSQ")
+    while True:
+      status, line = transport._read_line(5)
+      if line == "OK":
+        break
+
+def bench(name, transport, commands=20000, counter=None):
+  # counter: port_calls and timeout_updates of the port, default the sim_port of transport
+  transport.open_usb()
+  counter = transport._ser if counter is None else counter(transport._ser)
+  per_command = len("AT+CSQ\r") + len("AT+CSQ\r\n") + len(RESPONSE)
+  run_lines(transport, 100)
+
+  counter.port_calls = 0
+  counter.timeout_updates = 0
+  start = time.perf_counter()
+  run_lines(transport, commands)
+  elapsed = time.perf_counter() - start
+  port_calls = counter.port_calls
+  timeout_updates = counter.timeout_updates
+
+  tracemalloc.start()
+  tracemalloc.reset_peak()
+  base, _ = tracemalloc.get_traced_memory()
+  run_lines(transport, 1)
+  _, peak = tracemalloc.get_traced_memory()
+  # memory blocks still allocated after many commands, e.g. by buffers or caches that keep growing
+  before = tracemalloc.take_snapshot()
+  run_lines(transport, 1000)
+  after = tracemalloc.take_snapshot()
+  tracemalloc.stop()
+  blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+
+  logging.info(f"{name:>16}: {commands / elapsed:10.0f} commands/s, {commands * per_command / elapsed:12.0f} bytes/s, "
+               f"{peak - base:6d} peak allocated bytes/command, {blocks / 1000:6.3f} retained blocks/command, "
+               f"{port_calls / commands:6.2f} port calls/command, {timeout_updates / commands:6.2f} timeout updates/command")
+  transport.close_usb()
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  bench("readline", readline_serial(logging, ser=sim_port()))
+  bench("bg95_serial", bg95_serial(logging, ser=sim_port()))
+  # the real transport path: serial_transport and pyserial on a pseudo terminal
+  my_modem = pty_modem()
+  bench("serial_transport", bg95_serial(logging, port=my_modem.peer_name), 2000, port_counter)
+  my_modem.close()
+
+  # full AT command path including response parsing
+  my_bg95 = bg95_atcmds(logging, ser=sim_port())
+  my_bg95.open_usb()
+  logging.getLogger().setLevel(logging.WARNING)
+  start = time.perf_counter()
+  for _ in range(5000):
+    my_bg95.AT_CSQ()
+  elapsed = time.perf_counter() - start
+  logging.getLogger().setLevel(logging.INFO)
+  logging.info(f"{'AT_CSQ':>16}: {5000 / elapsed:10.0f} commands/s")
@@ -1,5 +1,12 @@
 from bg95_serial import bg95_serial
+from bg95_scheduler import at_scheduler
+from bg95_cmux import cmux
+from bg95_framer import at_framer
+from bg95_gnss import decode_qgpsloc
 import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Tuple, Dict
 
 ############################################################################################################
@@ -11,8 +18,12 @@ class bg95_atcmds (bg95_serial):
   _SERIAL_TIMEOUT_ERROR = -2
   _SERIAL_ECHO_ERROR = -3
   _SERIAL_UNDEFINED = -4
+  _SERIAL_DEADLINE_ERROR = -5
+  _SERIAL_READ_ERROR = -6
 
   _CME_ERROR_CODES =  {
+    _SERIAL_READ_ERROR: "Serial port read error",
+    _SERIAL_DEADLINE_ERROR: "AT channel deadline expired",
     _SERIAL_UNDEFINED: "Undefined AT command error", 
     _SERIAL_ECHO_ERROR: "Serial port echo error",
     _SERIAL_TIMEOUT_ERROR: "Serial port timeout error",
@@ -145,11 +156,55 @@ class bg95_atcmds (bg95_serial):
   _POST_TIMEOUT = 80
   _READ_TIMEOUT = 80
 
-  _my_logger = None
+  # identity requests never change during a module resp. SIM session and are cached until invalidated
+  _MODULE_IDENTITY_REQUESTS = ["ATI", "AT_GSN"]
+  _SIM_IDENTITY_REQUESTS = ["AT_CIMI_REQUEST", "AT_QCCID_REQUEST"]
+  # time to live in [sec] of cached volatile status requests
+  _STATUS_CACHE_TTL = {"AT_CSQ": 5, "AT_QCSQ": 5, "AT_COPS_REQUEST": 30, "AT_QNWINFO": 30}
+  # URCs that indicate the SIM may have been swapped or re-initialised
+  _SIM_CHANGE_URCS = ["+QUSIM", "+CPIN"]
+
+  # AT channel priorities, see at_transaction()
+  AT_PRIO_HIGH = at_scheduler.PRIO_HIGH
+  AT_PRIO_NORMAL = at_scheduler.PRIO_NORMAL
+  AT_PRIO_BULK = at_scheduler.PRIO_BULK
 
-  def __init__(self, logger=None):
+  _my_logger = None
+  _at_channel = None
+  _request_cache = None
+  _request_cache_locks = None
+  _urc_handlers = None
+  _cmd_observers = None
+  # echo state of the modem as last seen, None until the first answer. ATE0/ATE1 last requested
+  _echo = None
+  _echo_requested = True
+
+  def __init__(self, logger=None, port='COM11', ser=None):
     self._my_logger = logger
-    super().__init__(logger=self._my_logger, default_timeout = self._DEFAULT_TIMEOUT)
+    super().__init__(logger=self._my_logger, port=port, default_timeout = self._DEFAULT_TIMEOUT, ser=ser)
+    self._at_channel = at_scheduler(logger=self._my_logger)
+    self._request_cache = {}
+    self._request_cache_locks = {}
+    self._cache_lock = threading.Lock()
+    self._urc_handlers = {}
+    self._cmd_observers = []
+    for urc in self._SIM_CHANGE_URCS:
+      self.register_urc_handler(urc, self._on_sim_change)
+    self._socket_events = {}
+    self.register_urc_handler("+QIOPEN:", self._on_socket_open)
+    self.register_urc_handler("+QIURC:", self._on_socket_urc)
+
+  def open_usb(self):
+    if not super().open_usb():
+      return False
+    # find out whether the modem echoes, it may have been left in ATE0 by an earlier session
+    self._echo = None
+    self.AT()
+    return True
+
+  def echo(self):
+    # cached echo state, True, False or None when not known yet
+    return self._echo
 
   def _get_cme_error_str(self, cme_error_code):
     if cme_error_code in self._CME_ERROR_CODES:
@@ -162,95 +217,257 @@ class bg95_atcmds (bg95_serial):
 # BASIC AT CMD HELPER FUNCTIONS
 ############################################################################################################
 
+  def at_transaction(self, priority=AT_PRIO_NORMAL, deadline=None):
+    # context manager that holds the AT channel for a sequence of commands, yields False when
+    # the channel was not granted within deadline [sec]. all _AT_* helpers run inside one
+    return self._at_channel.transaction(priority, deadline)
+
+  def at_channel_metrics(self):
+    # AT channel queue depth and wait times in [sec] per priority
+    return self._at_channel.metrics()
+
+  def register_cmd_observer(self, observer):
+    # call observer(cmd, at_status, seconds, cmd_result) after every command, e.g. for a health watchdog
+    self._cmd_observers.append(observer)
+
   def _AT_send_cmd(self, cmd="", timeout=_DEFAULT_TIMEOUT) -> Tuple[bool, str, Dict[str, str | int]]:
-    # send at command
+    start = time.monotonic()
+    with self.at_transaction() as granted:
+      if granted:
+        try:
+          at_status, cmd_response, cmd_result = self._AT_send_cmd_unlocked(cmd, timeout)
+        finally:
+          self._framer.command = None
+    if not granted:
+      cme_error_code = self._SERIAL_DEADLINE_ERROR
+      cmd_result = {"cmd": {cmd}, "CME_ERROR_CODE": {cme_error_code}, "CME_ERROR_STRING": self._get_cme_error_str(cme_error_code)}
+      self._my_logger.error(cmd_result["CME_ERROR_STRING"])
+      at_status, cmd_response = False, ""
+    self._notify_cmd_observers(cmd, at_status, start, cmd_result)
+    return at_status, cmd_response, cmd_result
+
+  def _notify_cmd_observers(self, cmd, at_status, start, cmd_result):
+    # for commands that are not sent with _AT_send_cmd, start is the time.monotonic() they were sent
+    for observer in self._cmd_observers:
+      observer(cmd, at_status, time.monotonic() - start, cmd_result)
+
+  def _AT_send_cmd_unlocked(self, cmd="", timeout=_DEFAULT_TIMEOUT) -> Tuple[bool, str, Dict[str, str | int]]:
+    # send at command, caller must hold the AT channel
     self._my_logger.info(">>>>>>")
     self._my_logger.info(f"sending {cmd}")
     cmd_response = ""
     cme_error_code = self._SERIAL_OK
+    # whatever arrived before the command is sent cannot be part of its response, e.g. the late
+    # result of a command that timed out
+    for line in self._read_pending_lines():
+      if len(line) > 0:
+        self._handle_urc(line)
+        self._my_logger.debug(f"discarded before {cmd}: {line}")
+    self._framer.command = cmd
     if not self._write_line(cmd):
       cme_error_code = self._SERIAL_TIMEOUT_ERROR
-    # read back echo, assume echo enabled (ATE)
-    elif not self._read_line(timeout):
-      cme_error_code = self._SERIAL_ECHO_ERROR
 
     if cme_error_code != self._SERIAL_OK:
       cmd_result = {"cmd": {cmd}, "CME_ERROR_CODE": {cme_error_code}, "CME_ERROR_STRING": self._get_cme_error_str(cme_error_code)} # OK
       self._my_logger.error(cmd_result["CME_ERROR_STRING"])
       return False, cmd_response, cmd_result
 
-    # collect cmd response
+    # collect cmd response up to the final result code, the echo (ATE1) is skipped when present so
+    # echo on and off both work and URCs go to their handlers only. a modem that stays silent for
+    # timeout [sec] is a timeout error
+    idle_deadline = time.monotonic() + timeout
+    echo_seen = False
     while True:
       at_status, line = self._read_line(timeout)
       if at_status:
         cme_error_code = None
-        if (len(line) > 0):
-          cmd_response += line + "\n"
-        if line.startswith((self._AT_CMD_OK, self._AT_CMD_CONNECT)):
-          cme_error_code = self._SERIAL_OK
-        elif line.startswith(self._AT_CMD_CME_ERROR):
-          # at command returned '+CME ERROR: <code>'
-          regex = r'\+CME ERROR: (?P<error>\d+)'
-          match = re.search(regex, line)
-          cme_error_code = int(match.group('error')) 
-        elif line.startswith(self._AT_CMD_ERROR):
-          # at command returned 'ERROR'
-          cme_error_code = self._SERIAL_UNDEFINED
+        kind = self._framer.classify(line)
+        if kind == at_framer.LINE_ECHO:
+          echo_seen = True
+          idle_deadline = time.monotonic() + timeout
+          continue
+        if kind == at_framer.LINE_EMPTY:
+          if time.monotonic() >= idle_deadline:
+            cme_error_code = self._SERIAL_TIMEOUT_ERROR
+        else:
+          if kind != at_framer.LINE_URC:
+            cmd_response += line + "\n"
+          self._handle_urc(line)
+          idle_deadline = time.monotonic() + timeout
+        if kind in [at_framer.LINE_FINAL, at_framer.LINE_PROMPT]:
+          if line.startswith((self._AT_CMD_OK, self._AT_CMD_CONNECT)):
+            cme_error_code = self._SERIAL_OK
+          elif line.startswith(self._AT_CMD_CME_ERROR):
+            # at command returned '+CME ERROR: <code>'
+            regex = r'\+CME ERROR: (?P<error>\d+)'
+            match = re.search(regex, line)
+            cme_error_code = int(match.group('error')) 
+          elif line.startswith(self._AT_CMD_ERROR):
+            # at command returned 'ERROR'
+            cme_error_code = self._SERIAL_UNDEFINED
+        if (cme_error_code is not None) and (cme_error_code != self._SERIAL_TIMEOUT_ERROR) and (echo_seen != self._echo):
+          # learn the echo state from the answer, e.g. at session start or after a modem reset
+          if self._echo is not None:
+            self._my_logger.info(f"echo is {'ON' if echo_seen else 'OFF'}, expected {'ON' if self._echo else 'OFF'}")
+          self._echo = echo_seen
         if cme_error_code is not None:
           cmd_result = {"cmd": {cmd}, "CME_ERROR_CODE": {cme_error_code}, "CME_ERROR_STRING": self._get_cme_error_str(cme_error_code)}
           self._my_logger.debug(cmd_response) if (cme_error_code == self._SERIAL_OK) else self._my_logger.error(cmd_response)
           self._my_logger.debug(cmd_result) if (cme_error_code == self._SERIAL_OK) else self._my_logger.error(cmd_result)
           return (cme_error_code == self._SERIAL_OK), cmd_response, cmd_result
       else:
-        # some unexpected error
-        cme_error_code = self._SERIAL_UNDEFINED
+        # the serial port failed, e.g. the USB device is gone
+        cme_error_code = self._SERIAL_READ_ERROR
         cmd_result = {"cmd": {cmd}, "CME_ERROR_CODE": {cme_error_code}, "CME_ERROR_STRING": self._get_cme_error_str(cme_error_code)}
         self._my_logger.error(cmd_result["CME_ERROR_STRING"])
         return False, cmd_response, cmd_result
 
   def _AT_send_payload(self, payload="", timeout=_DEFAULT_TIMEOUT):
-    response = ""
-    at_status = self._write_line(payload)
-    while True:
-      at_status, line = self._read_line(timeout)
-      if at_status:
-        if (len(line) > 0):
-          response += line + "\n"
-        if line.startswith(self._AT_CMD_OK):
-          self._my_logger.debug(f"response for 'send payload' = \n{response}")
-          return True, response
-      else:
-        self._my_logger.error(f"unexpected at_status for 'send_payload'")
-        return False, None
+    with self.at_transaction():
+      response = ""
+      at_status = self._write_line(payload)
+      idle_deadline = time.monotonic() + timeout
+      while True:
+        at_status, line = self._read_line(timeout)
+        if at_status:
+          kind = self._framer.classify(line)
+          if kind == at_framer.LINE_URC:
+            self._handle_urc(line)
+            idle_deadline = time.monotonic() + timeout
+            continue
+          if (len(line) > 0):
+            response += line + "\n"
+            idle_deadline = time.monotonic() + timeout
+          elif time.monotonic() >= idle_deadline:
+            self._my_logger.error(f"timeout for 'send_payload'")
+            return False, None
+          if (kind == at_framer.LINE_FINAL) and line.startswith(self._AT_CMD_OK):
+            self._my_logger.debug(f"response for 'send payload' = \n{response}")
+            return True, response
+        else:
+          self._my_logger.error(f"unexpected at_status for 'send_payload'")
+          return False, None
       
-  def _AT_receive_payload(self, timeout=_DEFAULT_TIMEOUT):
-    response = ""
-    while True:
-      at_status, line = self._read_line(timeout)
-      if at_status:
-        if (len(line) > 0):
-          response += line + "\n"
-        if line.startswith(self._AT_CMD_OK):
-          self._my_logger.debug(f"response for 'receive payload' = \n{response}")
-          return True, response
-      else:
-        self._my_logger.error(f"unexpected at_status for 'receive_payload'")
-        return False, None
+  def _AT_receive_payload(self, timeout=_DEFAULT_TIMEOUT, keep_empty_lines=False):
+    # keep_empty_lines preserves the blank line between HTTP response headers and body
+    with self.at_transaction():
+      response = ""
+      idle_deadline = time.monotonic() + timeout
+      while True:
+        at_status, line = self._read_line(timeout)
+        if at_status:
+          if (len(line) == 0) and (time.monotonic() >= idle_deadline):
+            self._my_logger.error(f"timeout for 'receive_payload'")
+            return False, None
+          if (len(line) > 0) or keep_empty_lines:
+            response += line + "\n"
+          if len(line) > 0:
+            idle_deadline = time.monotonic() + timeout
+          if line.startswith(self._AT_CMD_OK):
+            self._my_logger.debug(f"response for 'receive payload' = \n{response}")
+            return True, response
+        else:
+          self._my_logger.error(f"unexpected at_status for 'receive_payload'")
+          return False, None
 
   def _AT_wait_for_urc(self, urc="", timeout=_DEFAULT_TIMEOUT):
-    # collect all responses until given URC is found
-    response = ""
-    while True:
-      at_status, line = self._read_line(timeout)
-      if at_status:
-        if (len(line) > 0):
-          response += line + "\n"
-        if line.startswith(urc):
-          self._my_logger.debug(f"response for 'wait for urc' = \n{response}")
-          return True, response
-      else:
-        self._my_logger.error(f"incorrect response for {urc}")
-        return False, response
+    # wait until given URC is found, fails when nothing arrives for timeout [sec]. the response
+    # holds the URC and the result codes seen on the way, other URCs only go to their handlers
+    with self.at_transaction():
+      response = ""
+      idle_deadline = time.monotonic() + timeout
+      while True:
+        at_status, line = self._read_line(timeout)
+        if at_status:
+          if (len(line) > 0):
+            if line.startswith(urc) or (self._framer.classify(line) != at_framer.LINE_URC):
+              response += line + "\n"
+            self._handle_urc(line)
+            idle_deadline = time.monotonic() + timeout
+          elif time.monotonic() >= idle_deadline:
+            self._my_logger.error(f"timeout waiting for {urc}")
+            return False, response
+          if line.startswith(urc):
+            self._my_logger.debug(f"response for 'wait for urc' = \n{response}")
+            return True, response
+        else:
+          self._my_logger.error(f"incorrect response for {urc}")
+          return False, response
+
+  def _AT_send_cmd_prompt(self, cmd="", timeout=_DEFAULT_TIMEOUT) -> bool:
+    # send a command that answers with a '>' data prompt instead of a result code, e.g. AT+QISEND
+    with self.at_transaction():
+      self._my_logger.info(">>>>>>")
+      self._my_logger.info(f"sending {cmd}")
+      self._framer.command = cmd
+      self._framer.expect_prompt = True
+      try:
+        if not self._write_line(cmd):
+          return False
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+          at_status, line = self._read_line(min(1, max(0, end - time.monotonic())))
+          if not at_status:
+            return False
+          kind = self._framer.classify(line)
+          if line == ">":
+            return True
+          if kind == at_framer.LINE_FINAL:
+            self._my_logger.error(line)
+            return False
+          # URCs may arrive ahead of the prompt, also those named like the command, e.g. the
+          # '+QMTPUB' result of the previous publish
+          if kind in [at_framer.LINE_URC, at_framer.LINE_INTERMEDIATE]:
+            self._handle_urc(line)
+      finally:
+        self._framer.command = None
+        self._framer.expect_prompt = False
+      self._my_logger.error(f"no prompt for {cmd}")
+      return False
+
+  def _AT_read_raw(self, size, timeout=_DEFAULT_TIMEOUT):
+    # read exactly size raw bytes following a CONNECT, returns (False, partial data) on timeout
+    data = b''
+    end = time.monotonic() + timeout
+    while len(data) < size:
+      remaining = end - time.monotonic()
+      if remaining <= 0:
+        self._my_logger.error(f"received {len(data)} of {size} bytes")
+        return False, data
+      at_status, chunk = self._read_bytes(size - len(data), remaining)
+      if not at_status:
+        return False, data
+      data += chunk
+    return True, data
+
+  def _AT_poll_urcs(self, timeout=_DEFAULT_TIMEOUT, until=None) -> bool:
+    # read and dispatch unsolicited lines while no command is running, until until() holds or
+    # the timeout expires. returns whether until() holds, or True when no condition was given
+    with self.at_transaction():
+      end = time.monotonic() + timeout
+      while (until is None) or not until():
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+          return until is None
+        at_status, line = self._read_line(min(1, remaining))
+        if not at_status:
+          return False
+        if len(line) > 0:
+          self._handle_urc(line)
+      return True
+
+  def register_urc_handler(self, urc, handler):
+    # call handler(line) for every received line starting with the given URC prefix
+    self._urc_handlers.setdefault(urc, []).append(handler)
+
+  def _handle_urc(self, line):
+    # dispatch a received line to the registered URC handlers, all URCs start with '+'
+    if not line.startswith("+"):
+      return
+    for urc, handlers in self._urc_handlers.items():
+      if line.startswith(urc):
+        for handler in handlers:
+          handler(line)
 
   def _AT_cmd_wrapper(self, cmd="", timeout=_DEFAULT_TIMEOUT):
     at_status, response = self._AT_send_cmd(self, cmd="", timeout=self._DEFAULT_TIMEOUT)
@@ -258,7 +475,62 @@ class bg95_atcmds (bg95_serial):
 
   def strip_response(self, response, urc):
     return response.lstrip(urc).rstrip("\nOK\n")  
+
+############################################################################################################
+# REQUEST CACHE FUNCTIONS
+############################################################################################################
+
+  def cached_request(self, request, ttl=None) -> Tuple[bool, str, Dict[str, str | int]]:
+    # run an AT request function, e.g. self.AT_CSQ, at most once per ttl [sec] and share the result
+    # between all callers. identity requests are cached until invalidated, other requests use
+    # their _STATUS_CACHE_TTL entry, or are not cached at all when neither applies
+    name = request.__name__
+    if ttl is None:
+      if name in self._MODULE_IDENTITY_REQUESTS + self._SIM_IDENTITY_REQUESTS:
+        ttl = float("inf")
+      else:
+        ttl = self._STATUS_CACHE_TTL.get(name, 0)
+
+    entry = self._request_cache.get(name)
+    if (entry is not None) and (time.monotonic() - entry[0] < ttl):
+      at_status, cmd, response = entry[1]
+      return at_status, cmd, dict(response)
+
+    with self._cache_lock:
+      lock = self._request_cache_locks.setdefault(name, threading.Lock())
+    # concurrent callers of the same request wait for the one round trip in progress. the AT channel
+    # is taken first, so a caller that already holds it can never deadlock on the request lock
+    with self.at_transaction(), lock:
+      entry = self._request_cache.get(name)
+      if (entry is not None) and (time.monotonic() - entry[0] < ttl):
+        at_status, cmd, response = entry[1]
+        return at_status, cmd, dict(response)
+      at_status, cmd, response = request()
+      if at_status:
+        self._request_cache[name] = (time.monotonic(), (at_status, cmd, dict(response)))
+      return at_status, cmd, response
+
+  def invalidate_request_cache(self, names=None):
+    # drop the given cached requests, or all of them
+    with self._cache_lock:
+      for name in (list(self._request_cache) if names is None else names):
+        self._request_cache.pop(name, None)
+
+  def _on_sim_change(self, line):
+    self._my_logger.debug(f"SIM change URC '{line}', invalidating SIM identity")
+    self.invalidate_request_cache(self._SIM_IDENTITY_REQUESTS)
+
+  def identity(self) -> Tuple[bool, Dict[str, str]]:
+    # module and SIM identity, queried lazily and served from the request cache afterwards
+    identity = {}
+    for request in [self.ATI, self.AT_GSN, self.AT_CIMI_REQUEST, self.AT_QCCID_REQUEST]:
+      at_status, cmd, response = self.cached_request(request)
+      if not at_status:
+        return False, identity
+      identity.update({key: value for key, value in response.items() if key != "result"})
+    return True, identity
   
+
 ############################################################################################################
 # QUECTEL GENERAL COMMANDS
 ############################################################################################################
@@ -306,10 +578,12 @@ class bg95_atcmds (bg95_serial):
     return at_status, cmd, response
 
   def ATE(self, echo_on=True):
-    # Set echo on or off
+    # Set echo on or off, echo off saves a received line per command
     cmd = "ATE1" if echo_on else "ATE0"
+    self._echo_requested = echo_on
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
+      self._echo = echo_on
       response = {"result": "OK", 
                   "Echo": "ON" if echo_on else "OFF"}
     else:
@@ -319,31 +593,129 @@ class bg95_atcmds (bg95_serial):
   
   def AT_CFUN(self, radio_on=False):
     # Set radio on or off
-    cmd = "AT+CFUN=1" if radio_on else "AT+CFUN=0"
-    at_status, at_response, at_result = self._AT_send_cmd(cmd)
-    if at_status:
-      if radio_on:
-        urcs = ["+CPIN: READY", "+QUSIM: 1", "+QIND: SMS DONE"]
-        for urc in urcs:
-          if not self._AT_wait_for_urc(urc, timeout=10):
-            at_status = False
-            response = {"result": "ERROR", 
-                        "RADIO": "OFF"}
-          else:
-            response = {"result": "OK", 
-                        "RADIO": "ON"}
+    with self.at_transaction():
+      cmd = "AT+CFUN=1" if radio_on else "AT+CFUN=0"
+      at_status, at_response, at_result = self._AT_send_cmd(cmd)
+      if at_status:
+        if radio_on:
+          urcs = ["+CPIN: READY", "+QUSIM: 1", "+QIND: SMS DONE"]
+          for urc in urcs:
+            if not self._AT_wait_for_urc(urc, timeout=10):
+              at_status = False
+              response = {"result": "ERROR", 
+                          "RADIO": "OFF"}
+            else:
+              response = {"result": "OK", 
+                          "RADIO": "ON"}
+        else:
+          response = {"result": "ERROR", 
+                      "RADIO": "OFF"}
       else:
         response = {"result": "ERROR", 
                     "RADIO": "OFF"}
-    else:
-      response = {"result": "ERROR", 
-                  "RADIO": "OFF"}
-    return at_status, cmd, response
+      return at_status, cmd, response
 
 ############################################################################################################
 # QUECTEL SERIAL INTERFACE CONTROL COMMANDS
 ############################################################################################################
-#TBD
+
+  # 27.010 port speed codes for AT+CMUX
+  _CMUX_PORT_SPEEDS = {9600: 1, 19200: 2, 38400: 3, 57600: 4, 115200: 5, 230400: 6, 460800: 7, 921600: 8}
+
+  def AT_CMUX(self, frame_size=cmux.DEFAULT_FRAME_SIZE) -> Tuple[bool, str, Dict[str, str | int]]:
+    # switch the UART to 27.010 basic option multiplexing, afterwards only CMUX frames are accepted
+    port_speed = self._CMUX_PORT_SPEEDS.get(self._baudrate, 5)
+    cmd = f'AT+CMUX=0,0,{port_speed},{frame_size}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK", 
+                  "frame_size": frame_size}
+    else:
+      response = {"result": "ERROR", 
+                  "frame_size": 0}
+    return at_status, cmd, response
+
+  def AT_IPR(self, baudrate=115200, save=False) -> Tuple[bool, str, Dict[str, str | int]]:
+    # set the modem UART baud rate and follow on the host side, optionally store it with AT&W.
+    # the OK is still sent at the old rate, the new rate is verified with a plain AT afterwards
+    cmd = f'AT+IPR={baudrate};&W' if save else f'AT+IPR={baudrate}'
+    with self.at_transaction(self.AT_PRIO_HIGH):
+      previous_baudrate = self._baudrate
+      at_status, at_response, at_result = self._AT_send_cmd(cmd)
+      if at_status:
+        at_status = self.set_baudrate(baudrate) and self.AT()[0]
+        if not at_status:
+          self._my_logger.error(f"no response at {baudrate} baud, falling back to {previous_baudrate}")
+          self.set_baudrate(previous_baudrate)
+    if at_status:
+      response = {"result": "OK", 
+                  "baudrate": baudrate}
+    else:
+      response = {"result": "ERROR", 
+                  "baudrate": self._baudrate}
+    return at_status, cmd, response
+
+  def AT_IPR_REQUEST(self) -> Tuple[bool, str, Dict[str, str | int]]:
+    # request the modem UART baud rate
+    cmd = "AT+IPR?"
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      regex = r'\+IPR: (?P<baudrate>\d+)'
+      match = re.search(regex, at_response)
+      response = {"result": "OK", 
+                  "baudrate": int(match.group('baudrate'))}
+    else:
+      response = {"result": "ERROR", 
+                  "baudrate": 0}
+    return at_status, cmd, response
+
+  def AT_IFC(self, rtscts=True) -> Tuple[bool, str, Dict[str, str | int]]:
+    # set RTS/CTS hardware flow control in both directions, and follow on the host side
+    cmd = "AT+IFC=2,2" if rtscts else "AT+IFC=0,0"
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      at_status = self.set_flow_control(rtscts)
+    if at_status:
+      response = {"result": "OK", 
+                  "rtscts": rtscts}
+    else:
+      response = {"result": "ERROR", 
+                  "rtscts": self._rtscts}
+    return at_status, cmd, response
+
+  def AT_IFC_REQUEST(self) -> Tuple[bool, str, Dict[str, str | int]]:
+    # request flow control setting, 0=none, 2=RTS resp. CTS
+    cmd = "AT+IFC?"
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      regex = r'\+IFC: (?P<dce_by_dte>\d+),(?P<dte_by_dce>\d+)'
+      match = re.search(regex, at_response)
+      response = {"result": "OK", 
+                  "rtscts": (int(match.group('dce_by_dte')) == 2) and (int(match.group('dte_by_dce')) == 2)}
+    else:
+      response = {"result": "ERROR", 
+                  "rtscts": False}
+    return at_status, cmd, response
+
+  def start_cmux(self, dlcis=(1, 2, 3)) -> Tuple[bool, cmux, Dict[int, object]]:
+    # multiplex the serial port into virtual channels, each can be handed to a new bg95_atcmds or
+    # osi_layer as ser=... . this object no longer talks to the modem once the multiplexer runs
+    with self.at_transaction(self.AT_PRIO_HIGH):
+      at_status, cmd, response = self.AT_CMUX()
+      if not at_status:
+        return False, None, {}
+      self._connected = False
+      mux = cmux(self._ser, logger=self._my_logger, frame_size=response["frame_size"])
+      if not mux.start():
+        return False, None, {}
+      channels = {}
+      for dlci in dlcis:
+        channel = mux.open_channel(dlci)
+        if channel is None:
+          mux.stop()
+          return False, None, {}
+        channels[dlci] = channel
+    return True, mux, channels
 
 ############################################################################################################
 # QUECTEL (U)SIM RELATED COMMANDS
@@ -440,9 +812,13 @@ class bg95_atcmds (bg95_serial):
     # Request network information
     cmd = "AT+QNWINFO"
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    match = None
     if at_status:
       regex = r'\+QNWINFO: "(?P<act>\w+)","(?P<operator>\w+)","(?P<band>([\w\s]+))",(?P<channel>\d+)'
       match = re.search(regex, at_response)
+      # '+QNWINFO: No Service' when not registered
+      at_status = match is not None
+    if match:
       response = {"result": "OK", 
                   "act": match.group('act'), 
                   "operator": match.group('operator'), 
@@ -607,6 +983,8 @@ class bg95_atcmds (bg95_serial):
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       response = {"result": "OK"}
+      # the SIM may be swapped while powered down
+      self.invalidate_request_cache()
       #ToDo: wait for "POWERED DOWN" URC
     else:
       response = {"result": "ERROR"}
@@ -614,18 +992,58 @@ class bg95_atcmds (bg95_serial):
     return at_status, cmd, response
   
   def AT_CCLK_REQUEST(self):
-    # Request PDP context
+    # request the clock of the module, "datetime" is the UTC datetime or None when the clock
+    # was never set
     cmd = "AT+CCLK?"
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
-      regex_pattern = r'\+CCLK: \"(?P<date>[0-9/]*),(?P<time>[0-9:+]*)\"'
+      regex_pattern = r'\+CCLK: \"(?P<date>[0-9/]*),(?P<time>[0-9:+-]*)\"'
       match = re.search(regex_pattern, at_response)
       response = {"result": "OK", 
                   "date": match.group('date'), 
-                  "time": match.group('time')}
+                  "time": match.group('time'),
+                  "datetime": self.parse_clock(match.group('date'), match.group('time'))}
+    else:
+      response = {"result": "ERROR", "date": "00/00/00", "time": "00:00:00+0", "datetime": None} 
+    return at_status, cmd, response
+
+  def AT_CTZU(self, enable=True):
+    # update the clock and time zone of the module from the network (NITZ)
+    cmd = f'AT+CTZU={1 if enable else 0}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_CTZU_REQUEST(self):
+    cmd = 'AT+CTZU?'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      match = re.search(r'\+CTZU: (?P<onoff>\d+)', at_response)
+      response = {"result": "OK",
+                  "enabled": int(match.group('onoff')) != 0}
     else:
-      response = {"result": "ERROR", "date": "00/00/00", "time": "00:00:00+0"} 
+      response = {"result": "ERROR", "enabled": False}
     return at_status, cmd, response
+
+  @staticmethod
+  def parse_clock(date, clock):
+    # CCLK/QNTP local time 'yy/MM/dd' or 'yyyy/MM/dd' and 'hh:mm:ss±zz', zz in quarters of an
+    # hour east of UTC, to a UTC datetime. None when malformed, e.g. a clock that was never set
+    match = re.fullmatch(r'(?P<year>\d{2}|\d{4})/(?P<month>\d\d)/(?P<day>\d\d)', date)
+    clock_match = re.fullmatch(r'(?P<hour>\d\d):(?P<minute>\d\d):(?P<second>\d\d)(?P<zone>[+-]\d+)?', clock)
+    if not (match and clock_match):
+      return None
+    year = int(match.group('year'))
+    try:
+      local = datetime(year + 2000 if year < 100 else year, int(match.group('month')), int(match.group('day')),
+                       int(clock_match.group('hour')), int(clock_match.group('minute')), int(clock_match.group('second')))
+    except ValueError:
+      return None
+    quarters = int(clock_match.group('zone') or 0)
+    return (local - timedelta(minutes=15 * quarters)).replace(tzinfo=timezone.utc)
   
   def AT_QTEMP(self):
     # request silicon temperatures
@@ -643,15 +1061,153 @@ class bg95_atcmds (bg95_serial):
       response = {"result": "ERROR", "T_pmic": 0, "T_xo": 0, "T_pa": 0, "T_misc": 0} 
     return at_status, cmd, response
 
+############################################################################################################
+# QUECTEL POWER SAVING FUNCTIONS
+############################################################################################################
+
+  # 3GPP TS 24.008 timer units in [sec], index is the value of bits 8..6 of the timer octet
+  _T3412_EXT_UNITS = {0: 600, 1: 3600, 2: 36000, 3: 2, 4: 30, 5: 60, 6: 1152000}
+  _T3324_UNITS = {0: 2, 1: 60, 2: 360}
+  _TIMER_DEACTIVATED = "11100000"
+  # 3GPP TS 24.008 eDRX cycle length in [sec] for E-UTRAN, index is the 4 bit eDRX value
+  _EDRX_CYCLES = [5.12, 10.24, 20.48, 40.96, 61.44, 81.92, 102.4, 122.88,
+                  143.36, 163.84, 327.68, 655.36, 1310.72, 2621.44, 5242.88, 10485.76]
+  _EDRX_ACT_EMTC = 4
+  _EDRX_ACT_NBIOT = 5
+
+  # last known power saving configuration, kept in sync by the CPSMS/CEDRXS functions
+  _psm_state = None
+  _edrx_state = None
+
+  def _encode_gprs_timer(self, seconds, units) -> str:
+    # encode a period in [sec] as 8 bit GPRS timer string: 3 bits unit + 5 bits value (max 31)
+    # picks the finest unit that can hold the period, rounding the value up
+    for unit, multiplier in sorted(units.items(), key=lambda item: item[1]):
+      value = -(-int(seconds) // multiplier)
+      if value <= 31:
+        return f"{unit:03b}{value:05b}"
+    return self._TIMER_DEACTIVATED
+
+  def _decode_gprs_timer(self, bits, units) -> int:
+    # decode an 8 bit GPRS timer string to a period in [sec], returns -1 if deactivated or unknown
+    if (bits is None) or (len(bits) != 8):
+      return -1
+    unit = int(bits[0:3], 2)
+    if unit not in units:
+      return -1
+    return int(bits[3:8], 2) * units[unit]
+
+  def _encode_edrx_cycle(self, seconds) -> str:
+    # encode the shortest eDRX cycle that is at least the requested period as 4 bit string
+    for value, cycle in enumerate(self._EDRX_CYCLES):
+      if cycle >= seconds:
+        return f"{value:04b}"
+    return f"{len(self._EDRX_CYCLES) - 1:04b}"
+
+  def AT_CPSMS(self, psm_on=False, tau_sec=3600, active_sec=60) -> Tuple[bool, str, Dict[str, str | int]]:
+    # enable/disable power saving mode, requesting periodic TAU (T3412) and active time (T3324)
+    if psm_on:
+      tau = self._encode_gprs_timer(tau_sec, self._T3412_EXT_UNITS)
+      active = self._encode_gprs_timer(active_sec, self._T3324_UNITS)
+      cmd = f'AT+CPSMS=1,,,"{tau}","{active}"'
+    else:
+      cmd = "AT+CPSMS=0"
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK",
+                  "psm_on": psm_on,
+                  "tau": self._decode_gprs_timer(tau, self._T3412_EXT_UNITS) if psm_on else -1,
+                  "active_time": self._decode_gprs_timer(active, self._T3324_UNITS) if psm_on else -1}
+      self._psm_state = response
+    else:
+      response = {"result": "ERROR",
+                  "psm_on": False,
+                  "tau": -1,
+                  "active_time": -1}
+    return at_status, cmd, response
+
+  def AT_CPSMS_REQUEST(self) -> Tuple[bool, str, Dict[str, str | int]]:
+    # request power saving mode setting, timers are returned in [sec]
+    cmd = "AT+CPSMS?"
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      regex = r'\+CPSMS: (?P<mode>\d)(,[^,]*,[^,]*,"?(?P<tau>[01]*)"?,"?(?P<active>[01]*)"?)?'
+      match = re.search(regex, at_response)
+      response = {"result": "OK",
+                  "psm_on": int(match.group('mode')) == 1,
+                  "tau": self._decode_gprs_timer(match.group('tau'), self._T3412_EXT_UNITS),
+                  "active_time": self._decode_gprs_timer(match.group('active'), self._T3324_UNITS)}
+      self._psm_state = response
+    else:
+      response = {"result": "ERROR",
+                  "psm_on": False,
+                  "tau": -1,
+                  "active_time": -1}
+    return at_status, cmd, response
+
+  def AT_CEDRXS(self, edrx_on=False, edrx_sec=81.92, act_type=_EDRX_ACT_EMTC) -> Tuple[bool, str, Dict[str, str | int]]:
+    # enable/disable eDRX for the given access technology (4=eMTC, 5=NB-IoT)
+    edrx_value = self._encode_edrx_cycle(edrx_sec)
+    cmd = f'AT+CEDRXS=1,{act_type},"{edrx_value}"' if edrx_on else f'AT+CEDRXS=0,{act_type}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK",
+                  "edrx_on": edrx_on,
+                  "act_type": act_type,
+                  "edrx_cycle": self._EDRX_CYCLES[int(edrx_value, 2)] if edrx_on else -1}
+      self._edrx_state = response
+    else:
+      response = {"result": "ERROR",
+                  "edrx_on": False,
+                  "act_type": act_type,
+                  "edrx_cycle": -1}
+    return at_status, cmd, response
+
+  def AT_CEDRXS_REQUEST(self) -> Tuple[bool, str, Dict[str, str | int]]:
+    # request eDRX setting, only the first listed access technology is reported
+    cmd = "AT+CEDRXS?"
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      regex = r'\+CEDRXS: (?P<act_type>\d),"(?P<edrx_value>[01]{4})"'
+      match = re.search(regex, at_response)
+      if match:
+        response = {"result": "OK",
+                    "edrx_on": True,
+                    "act_type": int(match.group('act_type')),
+                    "edrx_cycle": self._EDRX_CYCLES[int(match.group('edrx_value'), 2)]}
+      else:
+        # no +CEDRXS lines means eDRX is disabled for all access technologies
+        response = {"result": "OK",
+                    "edrx_on": False,
+                    "act_type": 0,
+                    "edrx_cycle": -1}
+      self._edrx_state = response
+    else:
+      response = {"result": "ERROR",
+                  "edrx_on": False,
+                  "act_type": 0,
+                  "edrx_cycle": -1}
+    return at_status, cmd, response
+
+  def power_saving_state(self) -> Dict[str, Dict[str, str | int]]:
+    # last known PSM/eDRX configuration, None if never set or requested
+    return {"psm": self._psm_state, "edrx": self._edrx_state}
+
 ############################################################################################################
 # QUECTEL TCPIP FUNCTIONS
 ############################################################################################################
 
   PDP_CONTEXT_ID = 1
-
-  def AT_QIACT(self) -> Tuple[bool, str, Dict[str, str | int]]:
+  # QIOPEN/QICSGP context type 1=IPV4, 2=IPV6, 3=IPV4V6
+  _CONTEXT_TYPES = {"IP": 1, "IPV6": 2, "IPV4V6": 3}
+  _SOCKET_OPEN_TIMEOUT = 150
+  # BG95 supports connect IDs 0..11 for sockets
+  _MAX_CONNECT_IDS = 12
+  _SOCKET_READ_LENGTH = 1500
+
+  def AT_QIACT(self, context_id=PDP_CONTEXT_ID) -> Tuple[bool, str, Dict[str, str | int]]:
     # Activate a specified PDP context
-    cmd = f'AT+QIACT={self.PDP_CONTEXT_ID}'
+    cmd = f'AT+QIACT={context_id}'
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       response = {"result": "OK"}
@@ -659,9 +1215,9 @@ class bg95_atcmds (bg95_serial):
       response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  def AT_QIDEACT(self) -> Tuple[bool, str, Dict[str, str | int]]:
+  def AT_QIDEACT(self, context_id=PDP_CONTEXT_ID) -> Tuple[bool, str, Dict[str, str | int]]:
     # Deactivate a specified PDP context
-    cmd = f'AT+QIDEACT={self.PDP_CONTEXT_ID}'
+    cmd = f'AT+QIDEACT={context_id}'
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       response = {"result": "OK"}
@@ -669,8 +1225,9 @@ class bg95_atcmds (bg95_serial):
       response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  def AT_QIACT_REQUEST(self) -> Tuple[bool, str, Dict[str, str | int]]:
-    # query context type and state and IP address. Requires that PDP context is activated first
+  def AT_QIACT_REQUEST(self, context_id=None) -> Tuple[bool, str, Dict[str, str | int]]:
+    # query context type and state and IP address. Requires that PDP context is activated first.
+    # reports the first active context, or the given one
     cmd = f'AT+QIACT?'
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     # default response
@@ -680,9 +1237,10 @@ class bg95_atcmds (bg95_serial):
                 "context_type": 0, 
                 "ip_address": "0:0:0:0"}
     if at_status:
-      if "+QIACT: " in at_response:
-        regex_pattern = r'\+QIACT: (?P<pdp_context_id>\d+),(?P<context_state>\d+),(?P<context_type>\d+),"(?P<ip_address>[\w.]+)"'
-        match = re.search(regex_pattern, at_response)
+      context = r'\d+' if context_id is None else str(context_id)
+      regex_pattern = r'\+QIACT: (?P<pdp_context_id>' + context + r'),(?P<context_state>\d+),(?P<context_type>\d+),"(?P<ip_address>[\w.:]+)"'
+      match = re.search(regex_pattern, at_response)
+      if match:
         response = {"result": "OK", 
                     "pdp_context_id": int(match.group('pdp_context_id')), 
                     "context_state": int(match.group('context_state')), 
@@ -694,8 +1252,8 @@ class bg95_atcmds (bg95_serial):
       response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  def AT_QICSGP_REQUEST(self) -> Tuple[bool, str, Dict[str, str]]:
-    cmd = "AT+QICSGP=1"
+  def AT_QICSGP_REQUEST(self, context_id=PDP_CONTEXT_ID) -> Tuple[bool, str, Dict[str, str]]:
+    cmd = f"AT+QICSGP={context_id}"
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       response = {"result": "OK"}
@@ -703,69 +1261,278 @@ class bg95_atcmds (bg95_serial):
       response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  def AT_QPING(self) -> Tuple[bool, str, Dict[str, str | int]]:
-    # ping an IP address
-    # cmd = 'AT+QPING=1,"45.82.191.174"' # www.felixdonkers.nl
-    cmd = 'AT+QPING=1,"8.8.8.8"' # google DNS
+  def AT_QICSGP(self, context_id=PDP_CONTEXT_ID, apn=_APN_OPENINTERNET, pdp_type=_PDP_TYPE) -> Tuple[bool, str, Dict[str, str | int]]:
+    # configure APN and type of a PDP context, without authentication
+    cmd = f'AT+QICSGP={context_id},{self._CONTEXT_TYPES.get(pdp_type, 3)},"{apn}","","",0'
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
-    # default response
-    response = {"result": "ERROR",
-                "finresult": 550,
-                "sent": 0,
-                "rcvd": 0,
-                "lost": 0,
-                "min": 0,
-                "max": 0,
-                "avg": 0}
     if at_status:
-      self._my_logger.debug(response)
-      # also collect multiple URC responses
-      at_status, urc_res = self._AT_wait_for_urc("+QPING: 0,4", self._DEFAULT_TIMEOUT)
-      if at_status:
-        regex_pattern = r'\+QPING: (?P<finresult>\d+),(?P<sent>\d+),(?P<rcvd>\d+),(?P<lost>\d+),(?P<min>\d+),(?P<max>\d+),(?P<avg>\d+)'
-        match = re.search(regex_pattern, urc_res)
-        response = {"result": "OK",
-                    "finresult": int(match.group('finresult')),
-                    "sent": int(match.group('sent')),
-                    "rcvd": int(match.group('rcvd')),
-                    "lost": int(match.group('lost')),
-                    "min": int(match.group('min')),
-                    "max": int(match.group('max')),
-                    "avg": int(match.group('avg'))}
-      else:
-        response = {"result": "ERROR"}
+      response = {"result": "OK", 
+                  "context_id": context_id, 
+                  "apn": apn}
+    else:
+      response = {"result": "ERROR", 
+                  "context_id": context_id, 
+                  "apn": "???"}
+    return at_status, cmd, response
+
+  def _on_socket_open(self, line):
+    match = re.search(r'\+QIOPEN: (?P<connect_id>\d+),(?P<err>\d+)', line)
+    if match:
+      self._socket_events.setdefault(int(match.group('connect_id')), {})["open"] = int(match.group('err'))
+
+  def _on_socket_urc(self, line):
+    match = re.search(r'\+QIURC: "(?P<event>recv|closed)",(?P<connect_id>\d+)', line)
+    if match:
+      self._socket_events.setdefault(int(match.group('connect_id')), {})[match.group('event')] = True
+
+  def _socket_event(self, connect_id, event):
+    return self._socket_events.get(connect_id, {}).get(event)
+
+  def _free_connect_ids(self, count):
+    # the connect ids of count sockets that are not open, None when there are not as many. a
+    # connect id is taken from AT_QIOPEN resp. AT_QSSLOPEN until it is closed
+    free = [connect_id for connect_id in range(self._MAX_CONNECT_IDS) if connect_id not in self._socket_events]
+    return free[:count] if len(free) >= count else None
+
+  def AT_QIOPEN(self, connect_id=0, service_type="TCP", host="", port=0, context_id=PDP_CONTEXT_ID, wait=True) -> Tuple[bool, str, Dict[str, str | int]]:
+    # open a TCP or UDP socket in buffer access mode. with wait=False the '+QIOPEN' URC is left to
+    # AT_QIOPEN_WAIT, so several sockets can be opening at the same time
+    cmd = f'AT+QIOPEN={context_id},{connect_id},"{service_type}","{host}",{port},0,0'
+    with self.at_transaction():
+      self._socket_events[connect_id] = {}
+      at_status, at_response, at_result = self._AT_send_cmd(cmd)
+      if at_status and wait:
+        return self.AT_QIOPEN_WAIT(connect_id)
+    if at_status:
+      response = {"result": "OK", 
+                  "connect_id": connect_id}
+    else:
+      response = {"result": "ERROR", 
+                  "connect_id": connect_id}
+    return at_status, cmd, response
+
+  def AT_QIOPEN_WAIT(self, connect_id=0, timeout=_SOCKET_OPEN_TIMEOUT) -> Tuple[bool, str, Dict[str, str | int]]:
+    # wait for the '+QIOPEN: <connect_id>,<err>' URC of a socket that is being opened
+    cmd = f'+QIOPEN: {connect_id}'
+    at_status = self._AT_poll_urcs(timeout, lambda: self._socket_event(connect_id, "open") is not None)
+    err = self._socket_event(connect_id, "open")
+    if at_status and (err == 0):
+      response = {"result": "OK", 
+                  "connect_id": connect_id}
+    else:
+      self._my_logger.error(f"socket {connect_id} open failed: {self._get_cme_error_str(err)}")
+      at_status = False
+      response = {"result": "ERROR", 
+                  "connect_id": connect_id}
+    return at_status, cmd, response
+
+  def AT_QICLOSE(self, connect_id=0, timeout=10) -> Tuple[bool, str, Dict[str, str | int]]:
+    # close a socket
+    cmd = f'AT+QICLOSE={connect_id},{timeout}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=timeout + self._DEFAULT_TIMEOUT)
+    self._socket_events.pop(connect_id, None)
+    if at_status:
+      response = {"result": "OK"}
     else:
       response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  def AT_QNTP(self) -> Tuple[bool, str, Dict[str, str | int]]:
-    # request time from NTP server
-    cmd = 'AT+QNTP=1,"nl.pool.ntp.org",123' # google DNS
-    at_status, at_response, at_result = self._AT_send_cmd(cmd)
-    # default response
-    response = {"result": "ERROR",
-                "finresult": 550,
-                "date": "00/00/00",
-                "time": "00:00:00+00"}
+  def AT_QISEND(self, connect_id=0, data=b'') -> Tuple[bool, str, Dict[str, str | int]]:
+    # send data on an open socket
+    data = data.encode('utf-8') if isinstance(data, str) else data
+    cmd = f'AT+QISEND={connect_id},{len(data)}'
+    with self.at_transaction():
+      at_status = self._AT_send_cmd_prompt(cmd) and self._write_bytes(data)
+      if at_status:
+        at_status, urc_res = self._AT_wait_for_urc(("SEND OK", "SEND FAIL", self._AT_CMD_ERROR), self._DEFAULT_TIMEOUT)
+        at_status = at_status and ("SEND OK" in urc_res)
     if at_status:
-      self._my_logger.debug(response)
-      # also collect multiple URC responses
-      at_status, urc_res = self._AT_wait_for_urc("+QNTP: ", self._DEFAULT_TIMEOUT)
+      response = {"result": "OK", 
+                  "sent": len(data)}
+    else:
+      response = {"result": "ERROR", 
+                  "sent": 0}
+    return at_status, cmd, response
+
+  def AT_QIRD(self, connect_id=0, length=_SOCKET_READ_LENGTH) -> Tuple[bool, str, Dict[str, str | int]]:
+    # read received data of a socket, payload is returned as bytes and may be empty
+    cmd = f'AT+QIRD={connect_id},{length}'
+    default_response = {"result": "ERROR", 
+                        "length": 0, 
+                        "payload": b''}
+    start = time.monotonic()
+    with self.at_transaction():
+      at_status, read_length, payload, cme_error_code = self._AT_read_socket(cmd, connect_id, length)
+    cmd_result = {"cmd": {cmd}, "CME_ERROR_CODE": {cme_error_code}, "CME_ERROR_STRING": self._get_cme_error_str(cme_error_code)}
+    if not at_status:
+      self._my_logger.error(f"{cmd}: {cmd_result['CME_ERROR_STRING']}")
+    self._notify_cmd_observers(cmd, at_status, start, cmd_result)
+    if not at_status:
+      return False, cmd, default_response
+    response = {"result": "OK", 
+                "length": read_length, 
+                "payload": payload}
+    return at_status, cmd, response
+
+  def _AT_read_socket(self, cmd, connect_id, length):
+    # send AT+QIRD and read its answer, caller holds the AT channel. returns (status, length,
+    # payload, cme error code). a modem that stays silent for _DEFAULT_TIMEOUT is a timeout error
+    self._my_logger.info(">>>>>>")
+    self._my_logger.info(f"sending {cmd}")
+    if not self._write_line(cmd):
+      return False, 0, b'', self._SERIAL_TIMEOUT_ERROR
+    # skip echo and URCs up to the '+QIRD: <length>' header, the data follows as raw bytes
+    idle_deadline = time.monotonic() + self._DEFAULT_TIMEOUT
+    while True:
+      at_status, line = self._read_line(self._DEFAULT_TIMEOUT)
+      if not at_status:
+        return False, 0, b'', self._SERIAL_TIMEOUT_ERROR
+      if line.startswith(self._AT_CMD_CME_ERROR):
+        match = re.search(r'\+CME ERROR: (?P<error>\d+)', line)
+        return False, 0, b'', int(match.group('error')) if match else self._SERIAL_UNDEFINED
+      if line.startswith(self._AT_CMD_ERROR):
+        return False, 0, b'', self._SERIAL_UNDEFINED
+      if line.startswith("+QIRD: "):
+        break
+      if len(line) > 0:
+        self._handle_urc(line)
+        idle_deadline = time.monotonic() + self._DEFAULT_TIMEOUT
+      elif time.monotonic() >= idle_deadline:
+        return False, 0, b'', self._SERIAL_TIMEOUT_ERROR
+    read_length = int(line[len("+QIRD: "):].split(",")[0])
+    at_status, payload = self._AT_read_raw(read_length, self._DEFAULT_TIMEOUT)
+    if not at_status:
+      return False, 0, b'', self._SERIAL_TIMEOUT_ERROR
+    at_status, urc_res = self._AT_wait_for_urc(self._AT_CMD_OK, self._DEFAULT_TIMEOUT)
+    if not at_status:
+      return False, 0, b'', self._SERIAL_TIMEOUT_ERROR
+    if read_length < length:
+      # everything buffered has been read, wait for the next 'recv' URC
+      self._socket_events.setdefault(connect_id, {})["recv"] = False
+    return True, read_length, payload, self._SERIAL_OK
+
+  def AT_QPING(self) -> Tuple[bool, str, Dict[str, str | int]]:
+    # ping an IP address
+    # cmd = 'AT+QPING=1,"45.82.191.174"' # www.felixdonkers.nl
+    with self.at_transaction():
+      cmd = 'AT+QPING=1,"8.8.8.8"' # google DNS
+      at_status, at_response, at_result = self._AT_send_cmd(cmd)
+      # default response
+      response = {"result": "ERROR",
+                  "finresult": 550,
+                  "sent": 0,
+                  "rcvd": 0,
+                  "lost": 0,
+                  "min": 0,
+                  "max": 0,
+                  "avg": 0}
       if at_status:
-        regex_pattern = r'\+QNTP: (?P<finresult>\d+),"(?P<date>[\w\/]+),(?P<time>[\w\:\-\+]+)"'
-        match = re.search(regex_pattern, urc_res)
+        self._my_logger.debug(response)
+        # also collect multiple URC responses
+        at_status, urc_res = self._AT_wait_for_urc("+QPING: 0,4", self._DEFAULT_TIMEOUT)
+        if at_status:
+          regex_pattern = r'\+QPING: (?P<finresult>\d+),(?P<sent>\d+),(?P<rcvd>\d+),(?P<lost>\d+),(?P<min>\d+),(?P<max>\d+),(?P<avg>\d+)'
+          match = re.search(regex_pattern, urc_res)
+          response = {"result": "OK",
+                      "finresult": int(match.group('finresult')),
+                      "sent": int(match.group('sent')),
+                      "rcvd": int(match.group('rcvd')),
+                      "lost": int(match.group('lost')),
+                      "min": int(match.group('min')),
+                      "max": int(match.group('max')),
+                      "avg": int(match.group('avg'))}
+        else:
+          response = {"result": "ERROR"}
+      else:
+        response = {"result": "ERROR"}
+      return at_status, cmd, response
 
-        response = {"result": "OK",
-                    "finresult": int(match.group('finresult')),
-                    "date": match.group('date'),
-                    "time": match.group('time')}
+  NTP_SERVER = "nl.pool.ntp.org"
+  _NTP_TIMEOUT = 125
+
+  def AT_QNTP(self, server=NTP_SERVER, port=123, context_id=PDP_CONTEXT_ID, timeout=_NTP_TIMEOUT) -> Tuple[bool, str, Dict[str, str | int]]:
+    # request time from NTP server and set the clock of the module, "datetime" is the UTC datetime
+    with self.at_transaction():
+      cmd = f'AT+QNTP={context_id},"{server}",{port}'
+      at_status, at_response, at_result = self._AT_send_cmd(cmd)
+      # default response
+      response = {"result": "ERROR",
+                  "finresult": 550,
+                  "date": "00/00/00",
+                  "time": "00:00:00+00"}
+      if at_status:
         self._my_logger.debug(response)
+        # also collect multiple URC responses
+        at_status, urc_res = self._AT_wait_for_urc("+QNTP: ", timeout)
+        if at_status:
+          regex_pattern = r'\+QNTP: (?P<finresult>\d+)(,"(?P<date>[\w\/]+),(?P<time>[\w\:\-\+]+)")?'
+          match = re.search(regex_pattern, urc_res)
+
+          # without a time on error, e.g. '+QNTP: 565'
+          date, clock = match.group('date') or "00/00/00", match.group('time') or "00:00:00+00"
+          response = {"result": "OK",
+                      "finresult": int(match.group('finresult')),
+                      "date": date,
+                      "time": clock,
+                      "datetime": self.parse_clock(date, clock)}
+          self._my_logger.debug(response)
+        else:
+          response = {"result": "ERROR"}
       else:
         response = {"result": "ERROR"}
+      return at_status, cmd, response
+
+
+  _DNS_TIMEOUT = 60
+
+  def AT_QIDNSCFG(self, context_id=PDP_CONTEXT_ID, primary="", secondary="") -> Tuple[bool, str, Dict[str, str | int]]:
+    # set the DNS servers of a PDP context, or query them when primary is empty
+    if primary:
+      cmd = f'AT+QIDNSCFG={context_id},"{primary}"' + (f',"{secondary}"' if secondary else '')
     else:
-      response = {"result": "ERROR"}
+      cmd = f'AT+QIDNSCFG={context_id}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      match = re.search(r'\+QIDNSCFG: \d+,"?(?P<primary>[\w.:]+)"?,"?(?P<secondary>[\w.:]+)"?', at_response)
+      response = {"result": "OK", 
+                  "primary": match.group('primary') if match else primary, 
+                  "secondary": match.group('secondary') if match else secondary}
+    else:
+      response = {"result": "ERROR", 
+                  "primary": "", 
+                  "secondary": ""}
     return at_status, cmd, response
 
+  def AT_QIDNSGIP(self, host="", context_id=PDP_CONTEXT_ID) -> Tuple[bool, str, Dict[str, str | int]]:
+    # resolve host, response has the addresses and the DNS TTL in [sec]
+    cmd = f'AT+QIDNSGIP={context_id},"{host}"'
+    default_response = {"result": "ERROR", 
+                        "ips": [], 
+                        "ttl": 0}
+    with self.at_transaction():
+      at_status, at_response, at_result = self._AT_send_cmd(cmd)
+      if at_status != True:
+        return False, cmd, default_response
+
+      # '+QIURC: "dnsgip",<err>,<IP_count>,<DNS_ttl>' followed by one URC per address
+      at_status, urc_res = self._AT_wait_for_urc('+QIURC: "dnsgip",', self._DNS_TIMEOUT)
+      match = re.search(r'\+QIURC: "dnsgip",(?P<err>\d+),(?P<count>\d+),(?P<ttl>\d+)', urc_res) if at_status else None
+      if (match is None) or (int(match.group('err')) != 0):
+        err = int(match.group('err')) if match else None
+        self._my_logger.error(f"DNS lookup of {host} failed: {self._get_cme_error_str(err)}")
+        return False, cmd, default_response
+      ips = []
+      for _ in range(int(match.group('count'))):
+        at_status, urc_res = self._AT_wait_for_urc('+QIURC: "dnsgip",', self._DEFAULT_TIMEOUT)
+        ip = re.search(r'\+QIURC: "dnsgip","(?P<ip>[\w.:]+)"', urc_res) if at_status else None
+        if ip is None:
+          return False, cmd, default_response
+        ips.append(ip.group('ip'))
+
+    response = {"result": "OK", 
+                "ips": ips, 
+                "ttl": int(match.group('ttl'))}
+    return at_status, cmd, response
 
 ############################################################################################################
 # QUECTEL GNSS FUNCTIONS
@@ -822,41 +1589,88 @@ class bg95_atcmds (bg95_serial):
                   "gps_on": False}
     return at_status, cmd, response
 
-  def AT_QGPSLOC_REQUEST(self) -> Tuple[bool, str, Dict[str, str | int]]:
-    # query GNSS location
+  def AT_QGPSLOC_REQUEST(self, mode=None) -> Tuple[bool, str, Dict[str, str | int]]:
+    # query GNSS location, mode 0, 1 or 2 selects the latitude/longitude format of the modem,
+    # default is the format of 'AT+QGPSLOC?'. all are decoded to decimal degrees and numbers, see
+    # bg95_gnss.FIX_FIELDS, "time" is in seconds since the epoch
     default_response = {"result": "ERROR",
                         "gps_error": 549, # unknown error
                         "utc_time": "0.0",
-                        "latitude": "0.0N",
-                        "longitude": "0.0E"}
-    cmd = f'AT+QGPSLOC?'
+                        "latitude": 0.0,
+                        "longitude": 0.0}
+    cmd = f'AT+QGPSLOC?' if mode is None else f'AT+QGPSLOC={mode}'
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       self._my_logger.debug(at_response)
-      if ("+QGPSLOC: " in at_response):
-        regex_pattern = r'\+QGPSLOC: (?P<utc_time>[\d\.]+),(?P<latitude>[\w\.]+),(?P<longitude>[\w\.]+),'
-        match = re.search(regex_pattern, at_response)
+      fix = None
+      start = at_response.find("+QGPSLOC: ")
+      if start >= 0:
+        end = at_response.find("\n", start)
+        line = at_response[start:end if end >= 0 else len(at_response)]
+        fix = decode_qgpsloc(line)
+      if fix is not None:
         response = {"result": "OK",
                     "gps_error": 0, # no error, we have a fix 
-                    "utc_time": match.group('utc_time'),
-                    "latitude": match.group('latitude'),
-                    "longitude": match.group('longitude')}
-      elif ("+CME ERROR: 516" in at_response):
-        response = default_response
-        response["gps_error"] = 516 # no fix
+                    "utc_time": line[len("+QGPSLOC: "):].split(",", 1)[0]}
+        response.update(fix)
       else:
         response = default_response
+    elif 516 in at_result.get("CME_ERROR_CODE", set()):
+      response = default_response
+      response["gps_error"] = 516 # no fix
     else:
       response = default_response
     return at_status, cmd, response
 
+  def AT_QCFGEXT_ADDGEO(self, geo_id=0, mode=3, shape=0, *coordinates) -> Tuple[bool, str, Dict[str, str | int]]:
+    # add a geofence of the GNSS engine, geo_id 0..9. mode 0 = no URC, 1 = URC on entering, 2 = URC
+    # on leaving, 3 = both. shape 0 = circle (lat, lon, radius [m]), 1 = circle (center lat, lon,
+    # lat, lon on the circle), 2 = triangle, 3 = quadrangle (lat, lon of each corner). the URC is
+    # '+QIND: "GEOFENCE",<geo_id>,<1 entered | 2 left>'
+    cmd = f'AT+QCFGEXT="addgeo",{geo_id},{mode},{shape}' + "".join(f',{value}' for value in coordinates)
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QCFGEXT_DELETEGEO(self, geo_id=0) -> Tuple[bool, str, Dict[str, str | int]]:
+    # fails with +CME ERROR: 517 when the geofence does not exist
+    cmd = f'AT+QCFGEXT="deletegeo",{geo_id}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QCFGEXT_QUERYGEO(self, geo_id=0) -> Tuple[bool, str, Dict[str, str | int]]:
+    # position relative to a geofence: 0 = unknown, 1 = inside, 2 = outside
+    cmd = f'AT+QCFGEXT="querygeo",{geo_id}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      regex = r'\+QCFGEXT: "querygeo",(?P<geo_id>\d+),(?P<position>\d+)'
+      match = re.search(regex, at_response)
+      if match:
+        response = {"result": "OK",
+                    "geo_id": int(match.group('geo_id')),
+                    "position": int(match.group('position'))}
+      else:
+        response = {"result": "ERROR"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
 ############################################################################################################
 # QUECTEL SSL FUNCTIONS
 ############################################################################################################
 
-  def AT_QSSLCFG_SSLVERSION(self) -> Tuple[bool, str, Dict[str, str | int]]:
+  SSL_CONTEXT_ID = 1
+
+  def AT_QSSLCFG_SSLVERSION(self, ssl_context_id=SSL_CONTEXT_ID) -> Tuple[bool, str, Dict[str, str | int]]:
     # set SSL verification mode to 0 (SSL3.0), 1 (TLS1.0), 2 (TLS1.1), 3 (TLS1.2), 4 (all)
-    cmd = f'AT+QSSLCFG="sslversion",1,4'
+    cmd = f'AT+QSSLCFG="sslversion",{ssl_context_id},4'
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       response = {"result": "OK"}
@@ -864,9 +1678,152 @@ class bg95_atcmds (bg95_serial):
       response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  def AT_QSSLCFG_CIPHERSUITE(self) -> Tuple[bool, str, Dict[str, str | int]]:
+  def AT_QSSLCFG_CIPHERSUITE(self, ssl_context_id=SSL_CONTEXT_ID) -> Tuple[bool, str, Dict[str, str | int]]:
     # set SSL cipher suite to: all
-    cmd = f'AT+QSSLCFG="ciphersuite",1,0xFFFF'
+    cmd = f'AT+QSSLCFG="ciphersuite",{ssl_context_id},0xFFFF'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  # QSSLCFG seclevel
+  SSL_SECLEVEL_NONE = 0
+  SSL_SECLEVEL_SERVER = 1
+  SSL_SECLEVEL_MUTUAL = 2
+  _SSL_OPEN_TIMEOUT = 150
+
+  def AT_QSSLCFG_SECLEVEL(self, ssl_context_id=SSL_CONTEXT_ID, level=SSL_SECLEVEL_NONE) -> Tuple[bool, str, Dict[str, str | int]]:
+    # set SSL security level to 0 (no CA certificate verification), 1 (verify the server with the
+    # CA certificate) or 2 (also authenticate with the client certificate)
+    cmd = f'AT+QSSLCFG="seclevel",{ssl_context_id},{level}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def _AT_QSSLCFG_FILE(self, setting, ssl_context_id, name) -> Tuple[bool, str, Dict[str, str | int]]:
+    # point a certificate or key setting of an SSL context at a UFS file
+    cmd = f'AT+QSSLCFG="{setting}",{ssl_context_id},"{name}"'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QSSLCFG_CACERT(self, ssl_context_id=SSL_CONTEXT_ID, name="UFS:cacert.pem") -> Tuple[bool, str, Dict[str, str | int]]:
+    return self._AT_QSSLCFG_FILE("cacert", ssl_context_id, name)
+
+  def AT_QSSLCFG_CLIENTCERT(self, ssl_context_id=SSL_CONTEXT_ID, name="UFS:clientcert.pem") -> Tuple[bool, str, Dict[str, str | int]]:
+    return self._AT_QSSLCFG_FILE("clientcert", ssl_context_id, name)
+
+  def AT_QSSLCFG_CLIENTKEY(self, ssl_context_id=SSL_CONTEXT_ID, name="UFS:clientkey.pem") -> Tuple[bool, str, Dict[str, str | int]]:
+    return self._AT_QSSLCFG_FILE("clientkey", ssl_context_id, name)
+
+  def AT_QSSLCFG_SESSION(self, ssl_context_id=SSL_CONTEXT_ID, on=True) -> Tuple[bool, str, Dict[str, str | int]]:
+    # enable the session cache, so later handshakes in this context resume the TLS session
+    cmd = f'AT+QSSLCFG="session",{ssl_context_id},{1 if on else 0}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QSSLCFG_SNI(self, ssl_context_id=SSL_CONTEXT_ID, on=True) -> Tuple[bool, str, Dict[str, str | int]]:
+    # send the server name indication in the client hello
+    cmd = f'AT+QSSLCFG="sni",{ssl_context_id},{1 if on else 0}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QSSLOPEN(self, ssl_context_id=SSL_CONTEXT_ID, connect_id=0, host="", port=443, context_id=PDP_CONTEXT_ID) -> Tuple[bool, str, Dict[str, str | int]]:
+    # open a TLS connection in buffer access mode, returns once the handshake has completed
+    cmd = f'AT+QSSLOPEN={context_id},{ssl_context_id},{connect_id},"{host}",{port},0'
+    default_response = {"result": "ERROR", 
+                        "connect_id": connect_id}
+    with self.at_transaction():
+      at_status, at_response, at_result = self._AT_send_cmd(cmd)
+      if at_status != True:
+        return False, cmd, default_response
+      at_status, urc_res = self._AT_wait_for_urc("+QSSLOPEN:", self._SSL_OPEN_TIMEOUT)
+      match = re.search(r'\+QSSLOPEN: (?P<connect_id>\d+),(?P<err>-?\d+)', urc_res) if at_status else None
+    if (match is None) or (int(match.group('err')) != 0):
+      err = int(match.group('err')) if match else None
+      self._my_logger.error(f"TLS connection to {host} failed: {self._get_cme_error_str(err)}")
+      return False, cmd, default_response
+    # the connect id is taken until AT_QSSLCLOSE, like the one of a socket
+    self._socket_events[connect_id] = {}
+    response = {"result": "OK", 
+                "connect_id": connect_id}
+    return at_status, cmd, response
+
+  def AT_QSSLCLOSE(self, connect_id=0, timeout=10) -> Tuple[bool, str, Dict[str, str | int]]:
+    cmd = f'AT+QSSLCLOSE={connect_id},{timeout}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=timeout + self._DEFAULT_TIMEOUT)
+    self._socket_events.pop(connect_id, None)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+############################################################################################################
+# QUECTEL MQTT FUNCTIONS
+############################################################################################################
+
+  # the results of QMTOPEN/QMTCONN/QMTSUB/QMTPUB arrive later as URCs, see bg95_mqtt
+
+  def AT_QMTCFG(self, setting="version", client_idx=0, *values) -> Tuple[bool, str, Dict[str, str | int]]:
+    # configure an MQTT client, values are passed as given, e.g. AT_QMTCFG("keepalive", 0, 120)
+    cmd = f'AT+QMTCFG="{setting}",{client_idx}' + "".join(f',{value}' for value in values)
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QMTOPEN(self, client_idx=0, host="", port=1883) -> Tuple[bool, str, Dict[str, str | int]]:
+    # open the network connection for an MQTT client, result in '+QMTOPEN: <idx>,<result>'
+    cmd = f'AT+QMTOPEN={client_idx},"{host}",{port}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QMTCLOSE(self, client_idx=0) -> Tuple[bool, str, Dict[str, str | int]]:
+    cmd = f'AT+QMTCLOSE={client_idx}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QMTCONN(self, client_idx=0, client_id="", username=None, password=None) -> Tuple[bool, str, Dict[str, str | int]]:
+    # connect to the broker, result in '+QMTCONN: <idx>,<result>[,<ret_code>]'
+    cmd = f'AT+QMTCONN={client_idx},"{client_id}"'
+    if username is not None:
+      cmd += f',"{username}","{password or ""}"'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QMTDISC(self, client_idx=0) -> Tuple[bool, str, Dict[str, str | int]]:
+    cmd = f'AT+QMTDISC={client_idx}'
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       response = {"result": "OK"}
@@ -874,10 +1831,227 @@ class bg95_atcmds (bg95_serial):
       response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  #TODO: add support for CA certificates
-  def AT_QSSLCFG_SECLEVEL(self) -> Tuple[bool, str, Dict[str, str | int]]:
-    # set SSL security level to 0 (no CA certificate verification)
-    cmd = f'AT+QSSLCFG="seclevel",1,0'
+  def AT_QMTSUB(self, client_idx=0, msg_id=1, topics=()) -> Tuple[bool, str, Dict[str, str | int]]:
+    # subscribe to a list of (topic, qos), result in '+QMTSUB: <idx>,<msg_id>,<result>[,<value>]'
+    cmd = f'AT+QMTSUB={client_idx},{msg_id}' + "".join(f',"{topic}",{qos}' for topic, qos in topics)
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QMTUNS(self, client_idx=0, msg_id=1, topics=()) -> Tuple[bool, str, Dict[str, str | int]]:
+    cmd = f'AT+QMTUNS={client_idx},{msg_id}' + "".join(f',"{topic}"' for topic in topics)
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QMTPUB(self, client_idx=0, msg_id=0, qos=0, retain=False, topic="", payload=b'') -> Tuple[bool, str, Dict[str, str | int]]:
+    # publish a message, result in '+QMTPUB: <idx>,<msg_id>,<result>[,<value>]'. msg_id is 0 for QoS 0
+    payload = payload.encode('utf-8') if isinstance(payload, str) else payload
+    cmd = f'AT+QMTPUB={client_idx},{msg_id},{qos},{1 if retain else 0},"{topic}",{len(payload)}'
+    with self.at_transaction():
+      at_status = self._AT_send_cmd_prompt(cmd) and self._write_bytes(payload)
+      if at_status:
+        at_status, at_response = self._AT_wait_for_urc((self._AT_CMD_OK, self._AT_CMD_ERROR, self._AT_CMD_CME_ERROR), self._DEFAULT_TIMEOUT)
+        at_status = at_status and at_response.rstrip().endswith(self._AT_CMD_OK)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+############################################################################################################
+# QUECTEL FILE SYSTEM FUNCTIONS
+############################################################################################################
+
+  _UFS_TIMEOUT = 60
+  # QFOPEN modes
+  UFS_MODE_CREATE = 0
+  UFS_MODE_OVERWRITE = 1
+  UFS_MODE_READ_ONLY = 2
+
+  @staticmethod
+  def ufs_checksum(data) -> int:
+    # checksum as reported by QFUPL/QFDWL: XOR of all 16 bit big endian words, an odd last byte
+    # is padded with 0x00
+    checksum = 0
+    for i in range(0, len(data) - 1, 2):
+      checksum ^= (data[i] << 8) | data[i + 1]
+    if len(data) % 2:
+      checksum ^= data[-1] << 8
+    return checksum
+
+  def AT_QFLST(self, pattern="*") -> Tuple[bool, str, Dict[str, str | int]]:
+    # list files in UFS matching pattern, response "files" maps name to size
+    cmd = f'AT+QFLST="{pattern}"'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      files = {match.group('name'): int(match.group('size')) for match in re.finditer(r'\+QFLST: "(?P<name>[^"]+)",(?P<size>\d+)', at_response)}
+      response = {"result": "OK", 
+                  "files": files}
+    elif at_result["CME_ERROR_CODE"] == {405}:
+      # 405 = file not found, no match is not an error here
+      at_status = True
+      response = {"result": "OK", 
+                  "files": {}}
+    else:
+      response = {"result": "ERROR", 
+                  "files": {}}
+    return at_status, cmd, response
+
+  def AT_QFDEL(self, name="*") -> Tuple[bool, str, Dict[str, str | int]]:
+    # delete a file from UFS, "*" deletes all files
+    cmd = f'AT+QFDEL="{name}"'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QFUPL(self, name="", data=b'') -> Tuple[bool, str, Dict[str, str | int]]:
+    # upload a complete file to UFS, verified with the checksum reported by the modem
+    data = data.encode('utf-8') if isinstance(data, str) else data
+    cmd = f'AT+QFUPL="{name}",{len(data)},{self._UFS_TIMEOUT}'
+    default_response = {"result": "ERROR", 
+                        "size": 0, 
+                        "checksum": 0}
+    with self.at_transaction():
+      at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._UFS_TIMEOUT)
+      if (at_status != True) or ("CONNECT" not in at_response):
+        return False, cmd, default_response
+
+      if not self._write_bytes(data):
+        return False, cmd, default_response
+      at_status, urc_res = self._AT_wait_for_urc(("+QFUPL:", self._AT_CMD_CME_ERROR), self._UFS_TIMEOUT)
+      match = re.search(r'\+QFUPL: (?P<size>\d+),(?P<checksum>[0-9a-fA-F]+)', urc_res) if at_status else None
+      if match is None:
+        return False, cmd, default_response
+      at_status, at_response = self._AT_wait_for_urc(self._AT_CMD_OK, self._DEFAULT_TIMEOUT)
+
+    size = int(match.group('size'))
+    checksum = int(match.group('checksum'), 16)
+    if (size != len(data)) or (checksum != self.ufs_checksum(data)):
+      self._my_logger.error(f"upload of {name} corrupted: {size} bytes, checksum {checksum:04x}")
+      return False, cmd, default_response
+    response = {"result": "OK", 
+                "size": size, 
+                "checksum": checksum}
+    return at_status, cmd, response
+
+  def AT_QFDWL(self, name="", size=None) -> Tuple[bool, str, Dict[str, str | int]]:
+    # download a complete file from UFS, verified with the checksum reported by the modem
+    cmd = f'AT+QFDWL="{name}"'
+    default_response = {"result": "ERROR", 
+                        "size": 0, 
+                        "checksum": 0, 
+                        "payload": b''}
+    with self.at_transaction():
+      if size is None:
+        at_status, list_cmd, list_response = self.AT_QFLST(name)
+        if name not in list_response["files"]:
+          return False, cmd, default_response
+        size = list_response["files"][name]
+
+      at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._UFS_TIMEOUT)
+      if (at_status != True) or ("CONNECT" not in at_response):
+        return False, cmd, default_response
+
+      at_status, payload = self._AT_read_raw(size, self._UFS_TIMEOUT)
+      if not at_status:
+        return False, cmd, default_response
+      at_status, urc_res = self._AT_wait_for_urc("+QFDWL:", self._DEFAULT_TIMEOUT)
+      match = re.search(r'\+QFDWL: (?P<size>\d+),(?P<checksum>[0-9a-fA-F]+)', urc_res) if at_status else None
+      if match is None:
+        return False, cmd, default_response
+      at_status, at_response = self._AT_wait_for_urc(self._AT_CMD_OK, self._DEFAULT_TIMEOUT)
+
+    checksum = int(match.group('checksum'), 16)
+    if (int(match.group('size')) != len(payload)) or (checksum != self.ufs_checksum(payload)):
+      self._my_logger.error(f"download of {name} corrupted")
+      return False, cmd, default_response
+    response = {"result": "OK", 
+                "size": len(payload), 
+                "checksum": checksum, 
+                "payload": payload}
+    return at_status, cmd, response
+
+  def AT_QFOPEN(self, name="", mode=UFS_MODE_CREATE) -> Tuple[bool, str, Dict[str, str | int]]:
+    # open a file for chunked access, returns its file handle
+    cmd = f'AT+QFOPEN="{name}",{mode}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    match = re.search(r'\+QFOPEN: (?P<handle>\d+)', at_response) if at_status else None
+    if match:
+      response = {"result": "OK", 
+                  "handle": int(match.group('handle'))}
+    else:
+      at_status = False
+      response = {"result": "ERROR", 
+                  "handle": None}
+    return at_status, cmd, response
+
+  def AT_QFSEEK(self, handle=0, offset=0) -> Tuple[bool, str, Dict[str, str | int]]:
+    # move the file pointer to offset from the start of the file
+    cmd = f'AT+QFSEEK={handle},{offset},0'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
+    if at_status:
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
+    return at_status, cmd, response
+
+  def AT_QFWRITE(self, handle=0, data=b'') -> Tuple[bool, str, Dict[str, str | int]]:
+    # write data at the file pointer, response has the bytes written and the new file size
+    data = data.encode('utf-8') if isinstance(data, str) else data
+    cmd = f'AT+QFWRITE={handle},{len(data)},{self._UFS_TIMEOUT}'
+    default_response = {"result": "ERROR", 
+                        "written": 0, 
+                        "size": 0}
+    with self.at_transaction():
+      at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._UFS_TIMEOUT)
+      if (at_status != True) or ("CONNECT" not in at_response):
+        return False, cmd, default_response
+
+      if not self._write_bytes(data):
+        return False, cmd, default_response
+      at_status, urc_res = self._AT_wait_for_urc(("+QFWRITE:", self._AT_CMD_CME_ERROR), self._UFS_TIMEOUT)
+      match = re.search(r'\+QFWRITE: (?P<written>\d+),(?P<size>\d+)', urc_res) if at_status else None
+      if match is None:
+        return False, cmd, default_response
+      at_status, at_response = self._AT_wait_for_urc(self._AT_CMD_OK, self._DEFAULT_TIMEOUT)
+
+    response = {"result": "OK", 
+                "written": int(match.group('written')), 
+                "size": int(match.group('size'))}
+    return at_status and (response["written"] == len(data)), cmd, response
+
+  def AT_QFREAD(self, handle=0, length=1024) -> Tuple[bool, str, Dict[str, str | int]]:
+    # read up to length bytes at the file pointer, an empty payload means end of file
+    cmd = f'AT+QFREAD={handle},{length}'
+    default_response = {"result": "ERROR", 
+                        "payload": b''}
+    with self.at_transaction():
+      at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._UFS_TIMEOUT)
+      match = re.search(r'CONNECT (?P<length>\d+)', at_response) if at_status else None
+      if match is None:
+        return False, cmd, default_response
+
+      at_status, payload = self._AT_read_raw(int(match.group('length')), self._UFS_TIMEOUT)
+      if not at_status:
+        return False, cmd, default_response
+      at_status, at_response = self._AT_wait_for_urc(self._AT_CMD_OK, self._DEFAULT_TIMEOUT)
+
+    response = {"result": "OK", 
+                "payload": payload}
+    return at_status, cmd, response
+
+  def AT_QFCLOSE(self, handle=0) -> Tuple[bool, str, Dict[str, str | int]]:
+    cmd = f'AT+QFCLOSE={handle}'
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       response = {"result": "OK"}
@@ -944,9 +2118,9 @@ class bg95_atcmds (bg95_serial):
       response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  def AT_QHTTPCFG_SSLCTXID(self) -> Tuple[bool, str, Dict[str, str | int]]:
-    # set SSL context ID to 1
-    cmd = f'AT+QHTTPCFG="sslctxid",1'
+  def AT_QHTTPCFG_REQUESTHEADER(self, on=False) -> Tuple[bool, str, Dict[str, str | int]]:
+    # with request header on, QHTTPGET/QHTTPPOST data is the complete request including headers
+    cmd = f'AT+QHTTPCFG="requestheader",1' if on else f'AT+QHTTPCFG="requestheader",0'
     at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       response = {"result": "OK"}
@@ -954,103 +2128,184 @@ class bg95_atcmds (bg95_serial):
       response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  def AT_QHTTPURL(self, url="http://postman-echo.com/get/") -> Tuple[bool, str, Dict[str, str | int]]:
-    # set URL for HTTP GET/POST
-    #TODO: fix TLS version for https://echo.free.beeceptor.com/ -> +QHTTPGET: 701
-    default_response = {"result": "ERROR"}
-    cmd = f'AT+QHTTPURL={len(url)}'
-    at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._URL_TIMEOUT)
-    if (at_status != True) or ("CONNECT" not in at_response):
-      return False, cmd, default_response
-
-    # send URL
-    at_status, at_response = self._AT_send_payload(url, timeout=self._URL_TIMEOUT)
+  def AT_QHTTPCFG_SSLCTXID(self, ssl_context_id=SSL_CONTEXT_ID) -> Tuple[bool, str, Dict[str, str | int]]:
+    # set SSL context ID used for HTTPS
+    cmd = f'AT+QHTTPCFG="sslctxid",{ssl_context_id}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
       response = {"result": "OK"}
     else:
       response = {"result": "ERROR"}
     return at_status, cmd, response
-  
-  def AT_QHTTPGET(self) -> Tuple[bool, str, Dict[str, str | int]]:
-    # send GET request
-    default_response = {"result": "ERROR", 
-                        "httprspcode": 0, 
-                        "datalen": 0}
-    cmd = f'AT+QHTTPGET={self._GET_TIMEOUT}'
-    at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._GET_TIMEOUT)
-    if at_status != True:
-      return False, cmd, default_response
-
-    # wait for URC
-    at_status, urc_res = self._AT_wait_for_urc("+QHTTPGET:", self._GET_TIMEOUT)
-    regex = r'\+QHTTPGET: (?P<result>\d+),(?P<httprspcode>\d+),(?P<datalen>\d+)'
-    match = re.search(regex, urc_res)
 
+  def AT_QHTTPCFG_CONTEXTID(self, context_id=PDP_CONTEXT_ID) -> Tuple[bool, str, Dict[str, str | int]]:
+    # set PDP context ID used for HTTP(S)
+    cmd = f'AT+QHTTPCFG="contextid",{context_id}'
+    at_status, at_response, at_result = self._AT_send_cmd(cmd)
     if at_status:
-      if (int(match.group('result')) == 0) and (int(match.group('httprspcode')) == 200):
-        response = default_response
-        response["result"] = "OK"
-        response["httprspcode"] = int(match.group('httprspcode'))
-        response["datalen"] =int(match.group('datalen'))
-      else:
-        response = default_response
-    else: 
-      response = default_response
-
+      response = {"result": "OK"}
+    else:
+      response = {"result": "ERROR"}
     return at_status, cmd, response
 
-  def AT_QHTTPPOST(self, body="test=1234") -> Tuple[bool, str, Dict[str, str | int]]:
-    # send POST request
-    default_response = {"result": "ERROR", 
-                        "httprspcode": 0, 
-                        "datalen": 0}
-    cmd = f'AT+QHTTPPOST={len(body)},{self._POST_TIMEOUT},{self._POST_TIMEOUT}'
-    at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._POST_TIMEOUT)
-    if at_status != True:
-      return False, cmd, default_response
-
-    # send payload
-    at_status, at_response = self._AT_send_payload(body, timeout=self._POST_TIMEOUT)
-    if at_status != True:
-      return False, cmd, default_response
-
-    # wait for URC. ToDo analyse urc for non-0 at_status
-    at_status, urc_res = self._AT_wait_for_urc("+QHTTPPOST:", self._POST_TIMEOUT)
-    regex = r'\+QHTTPPOST: (?P<result>\d+),(?P<httprspcode>\d+),(?P<datalen>\d+)'
-    match = re.search(regex, urc_res)
-
-    if at_status:
-      if (int(match.group('result')) == 0) and (int(match.group('httprspcode')) == 200):
-        response = default_response
-        response["result"] = "OK"
-        response["httprspcode"] = int(match.group('httprspcode'))
-        response["datalen"] =int(match.group('datalen'))
+  def AT_QHTTPURL(self, url="http://postman-echo.com/get/") -> Tuple[bool, str, Dict[str, str | int]]:
+    # set URL for HTTP GET/POST
+    #TODO: fix TLS version for https://echo.free.beeceptor.com/ -> +QHTTPGET: 701
+    with self.at_transaction():
+      default_response = {"result": "ERROR"}
+      cmd = f'AT+QHTTPURL={len(url)}'
+      at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._URL_TIMEOUT)
+      if (at_status != True) or ("CONNECT" not in at_response):
+        return False, cmd, default_response
+
+      # send URL
+      at_status, at_response = self._AT_send_payload(url, timeout=self._URL_TIMEOUT)
+      if at_status:
+        response = {"result": "OK"}
       else:
+        response = {"result": "ERROR"}
+      return at_status, cmd, response
+  
+  def AT_QHTTPGET(self, request="", accepted_codes=(200,)) -> Tuple[bool, str, Dict[str, str | int]]:
+    # send GET request. request is the complete request for requestheader mode, accepted_codes
+    # are the HTTP response codes that count as success, None accepts all
+    with self.at_transaction():
+      default_response = {"result": "ERROR", 
+                          "httprspcode": 0, 
+                          "datalen": 0}
+      if request:
+        cmd = f'AT+QHTTPGET={self._GET_TIMEOUT},{len(request.encode('utf-8'))}'
+        at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._GET_TIMEOUT)
+        if (at_status != True) or ("CONNECT" not in at_response):
+          return False, cmd, default_response
+
+        # send request line, headers and body
+        at_status = self._write_bytes(request.encode('utf-8'))
+        if at_status:
+          at_status, at_response = self._AT_wait_for_urc(self._AT_CMD_OK, self._GET_TIMEOUT)
+      else:
+        cmd = f'AT+QHTTPGET={self._GET_TIMEOUT}'
+        at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._GET_TIMEOUT)
+      if at_status != True:
+        return False, cmd, default_response
+
+      # wait for URC
+      at_status, urc_res = self._AT_wait_for_urc("+QHTTPGET:", self._GET_TIMEOUT)
+      regex = r'\+QHTTPGET: (?P<result>\d+)(,(?P<httprspcode>\d+)(,(?P<datalen>\d+))?)?'
+      match = re.search(regex, urc_res) if at_status else None
+
+      if match:
+        httprspcode = int(match.group('httprspcode') or 0)
+        if (int(match.group('result')) == 0) and ((accepted_codes is None) or (httprspcode in accepted_codes)):
+          response = default_response
+          response["result"] = "OK"
+          response["httprspcode"] = httprspcode
+          response["datalen"] = int(match.group('datalen') or 0)
+        else:
+          response = default_response
+      else: 
         response = default_response
-    else: 
-      response = default_response
 
-    return at_status, cmd, response
+      return at_status, cmd, response
+
+  def AT_QHTTPPOST(self, body="test=1234", accepted_codes=(200,)) -> Tuple[bool, str, Dict[str, str | int]]:
+    # send POST request. in requestheader mode body is the complete request including headers
+    with self.at_transaction():
+      default_response = {"result": "ERROR", 
+                          "httprspcode": 0, 
+                          "datalen": 0}
+      # the modem counts bytes, not characters
+      body = body.encode('utf-8') if isinstance(body, str) else body
+      cmd = f'AT+QHTTPPOST={len(body)},{self._POST_TIMEOUT},{self._POST_TIMEOUT}'
+      at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._POST_TIMEOUT)
+      if at_status != True:
+        return False, cmd, default_response
+
+      # send payload
+      at_status, at_response = self._AT_send_payload(body, timeout=self._POST_TIMEOUT)
+      if at_status != True:
+        return False, cmd, default_response
+
+      # wait for URC. ToDo analyse urc for non-0 at_status
+      at_status, urc_res = self._AT_wait_for_urc("+QHTTPPOST:", self._POST_TIMEOUT)
+      regex = r'\+QHTTPPOST: (?P<result>\d+)(,(?P<httprspcode>\d+)(,(?P<datalen>\d+))?)?'
+      match = re.search(regex, urc_res) if at_status else None
+
+      if match:
+        httprspcode = int(match.group('httprspcode') or 0)
+        if (int(match.group('result')) == 0) and ((accepted_codes is None) or (httprspcode in accepted_codes)):
+          response = default_response
+          response["result"] = "OK"
+          response["httprspcode"] = httprspcode
+          response["datalen"] = int(match.group('datalen') or 0)
+        else:
+          response = default_response
+      else: 
+        response = default_response
 
-  def AT_QHTTPREAD(self) -> Tuple[bool, str, Dict[str, str | int]]:
+      return at_status, cmd, response
+
+  def AT_QHTTPREAD(self, keep_empty_lines=False) -> Tuple[bool, str, Dict[str, str | int]]:
     # read GET response
-    default_response = {"result": "ERROR", 
-                        "payload": ""}
-    cmd = f'AT+QHTTPREAD={self._READ_TIMEOUT}'
-    at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._READ_TIMEOUT)
-    if at_status != True:
-      return False, cmd, default_response
+    with self.at_transaction():
+      default_response = {"result": "ERROR", 
+                          "payload": ""}
+      cmd = f'AT+QHTTPREAD={self._READ_TIMEOUT}'
+      at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._READ_TIMEOUT)
+      if at_status != True:
+        return False, cmd, default_response
     
-    # read payload
-    at_status, payload = self._AT_receive_payload(self._READ_TIMEOUT)
-    if at_status != True:
-      return False, cmd, default_response
+      # read payload
+      at_status, payload = self._AT_receive_payload(self._READ_TIMEOUT, keep_empty_lines)
+      if at_status != True:
+        return False, cmd, default_response
 
-    # wait for URC. ToDo analyse urc for non-0 at_status
-    at_status, urc_res = self._AT_wait_for_urc("+QHTTPREAD:", self._DEFAULT_TIMEOUT)
-    if at_status != True:
-      return False, cmd, default_response
+      # wait for URC. ToDo analyse urc for non-0 at_status
+      at_status, urc_res = self._AT_wait_for_urc("+QHTTPREAD:", self._DEFAULT_TIMEOUT)
+      if at_status != True:
+        return False, cmd, default_response
 
-    response = {"result": "OK", 
-                "payload": payload}
-    return at_status, cmd, response
+      response = {"result": "OK", 
+                  "payload": payload}
+      return at_status, cmd, response
+
+  def AT_QHTTPPOSTFILE(self, name="", accepted_codes=(200,)) -> Tuple[bool, str, Dict[str, str | int]]:
+    # send POST request with the contents of a UFS file as body
+    with self.at_transaction():
+      default_response = {"result": "ERROR", 
+                          "httprspcode": 0, 
+                          "datalen": 0}
+      cmd = f'AT+QHTTPPOSTFILE="{name}",{self._POST_TIMEOUT}'
+      at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._POST_TIMEOUT)
+      if at_status != True:
+        return False, cmd, default_response
+
+      at_status, urc_res = self._AT_wait_for_urc("+QHTTPPOSTFILE:", self._POST_TIMEOUT)
+      regex = r'\+QHTTPPOSTFILE: (?P<result>\d+)(,(?P<httprspcode>\d+)(,(?P<datalen>\d+))?)?'
+      match = re.search(regex, urc_res) if at_status else None
+
+      response = default_response
+      if match:
+        httprspcode = int(match.group('httprspcode') or 0)
+        if (int(match.group('result')) == 0) and ((accepted_codes is None) or (httprspcode in accepted_codes)):
+          response["result"] = "OK"
+          response["httprspcode"] = httprspcode
+          response["datalen"] = int(match.group('datalen') or 0)
+      return at_status, cmd, response
+
+  def AT_QHTTPREADFILE(self, name="") -> Tuple[bool, str, Dict[str, str | int]]:
+    # store the response body of the last request in a UFS file instead of reading it over the UART
+    with self.at_transaction():
+      cmd = f'AT+QHTTPREADFILE="{name}",{self._READ_TIMEOUT}'
+      at_status, at_response, at_result = self._AT_send_cmd(cmd, timeout=self._READ_TIMEOUT)
+      if at_status != True:
+        return False, cmd, {"result": "ERROR"}
+
+      at_status, urc_res = self._AT_wait_for_urc("+QHTTPREADFILE:", self._READ_TIMEOUT)
+      match = re.search(r'\+QHTTPREADFILE: (?P<result>\d+)', urc_res) if at_status else None
+      if match and (int(match.group('result')) == 0):
+        response = {"result": "OK"}
+      else:
+        at_status = False
+        response = {"result": "ERROR"}
+      return at_status, cmd, response
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import time
+from bg95_osi_layer import osi_layer
+
+############################################################################################################
+# class uart_autotuner: find the fastest working UART setting and remember it per device
+############################################################################################################
+
+class uart_autotuner:
+  CANDIDATE_BAUDRATES = [115200, 230400, 460800, 921600]
+  _DEFAULT_SETTINGS_FILE = "bg95_uart_settings.json"
+  _BLOCK_SIZE = 1024
+  _ROUNDS = 8
+  # a block that takes about a second at 115200 baud, so the transfer and not the command
+  # processing of the modem dominates the time
+  _UFS_BLOCK_SIZE = 16384
+  _UFS_ROUNDS = 2
+  _UFS_FILE = "autotune.bin"
+
+  _modem = None
+  _my_logger = None
+
+  def __init__(self, modem=None, logger=None, settings_file=_DEFAULT_SETTINGS_FILE, loopback=False):
+    # loopback: the port is wired to a loopback plug or simulated peer instead of a modem, so no
+    # AT commands are sent and throughput is measured by echoing raw blocks
+    self._modem = modem
+    self._my_logger = logger
+    self._settings_file = settings_file
+    self._loopback = loopback
+
+  def measure_loopback_throughput(self, block_size=_BLOCK_SIZE, rounds=_ROUNDS):
+    # bytes/s of raw blocks written and read back through a loopback peer, 0 if data got lost
+    block = bytes(range(256)) * (block_size // 256) + bytes(block_size % 256)
+    start = time.monotonic()
+    for _ in range(rounds):
+      if not self._modem._write_bytes(block):
+        return 0
+      received = b''
+      while len(received) < block_size:
+        status, data = self._modem._read_bytes(block_size - len(received), timeout=1)
+        if not status or not data:
+          self._my_logger.error(f"loopback lost {block_size - len(received)} bytes")
+          return 0
+        received += data
+      if received != block:
+        self._my_logger.error(f"loopback data corrupted")
+        return 0
+    return 2 * block_size * rounds / (time.monotonic() - start)
+
+  def measure_ufs_throughput(self, block_size=_UFS_BLOCK_SIZE, rounds=_UFS_ROUNDS):
+    # bytes/s of a block uploaded to the modem file system and downloaded again, both checksummed
+    # by the modem, 0 if a transfer failed
+    block = bytes(range(256)) * (block_size // 256) + bytes(block_size % 256)
+    start = time.monotonic()
+    for _ in range(rounds):
+      status, cmd, response = self._modem.AT_QFUPL(self._UFS_FILE, block)
+      if status:
+        status, cmd, response = self._modem.AT_QFDWL(self._UFS_FILE, block_size)
+      # QFUPL does not overwrite, the next round needs the file gone
+      self._modem.AT_QFDEL(self._UFS_FILE)
+      if not status or (response["payload"] != block):
+        self._my_logger.error(f"{cmd} FAILED!")
+        return 0
+    return 2 * block_size * rounds / (time.monotonic() - start)
+
+  def _apply(self, baudrate, rtscts):
+    if self._loopback:
+      return self._modem.set_baudrate(baudrate) and self._modem.set_flow_control(rtscts)
+    status, cmd, response = self._modem.AT_IFC(rtscts)
+    if not status:
+      return False
+    status, cmd, response = self._modem.AT_IPR(baudrate)
+    return status
+
+  def autotune(self, candidates=CANDIDATE_BAUDRATES, rtscts=True):
+    # try all candidate baud rates, keep the one with the best measured throughput and persist it
+    results = {}
+    for baudrate in candidates:
+      if not self._apply(baudrate, rtscts):
+        self._my_logger.info(f"{baudrate} baud not usable")
+        results[baudrate] = 0
+        continue
+      if self._loopback:
+        results[baudrate] = self.measure_loopback_throughput()
+      else:
+        results[baudrate] = self.measure_ufs_throughput()
+      self._my_logger.info(f"{baudrate} baud: {results[baudrate]:.0f} bytes/s")
+
+    best = max(results, key=results.get) if results else None
+    if (best is None) or (results[best] == 0):
+      self._my_logger.error(f"no working UART setting found")
+      return False, results
+
+    self._apply(best, rtscts)
+    self._store(best, rtscts, results[best])
+    self._my_logger.info(f"best UART setting {best} baud, RTS/CTS {'ON' if rtscts else 'OFF'}")
+    return True, results
+
+  def apply_stored(self):
+    # apply the persisted setting for this device, returns False when there is none or it fails
+    setting = self._load().get(self._device_id())
+    if setting is None:
+      return False
+    return self._apply(setting["baudrate"], setting["rtscts"])
+
+  def _device_id(self):
+    # persist per module IMEI, or per port name when the peer is not a modem. only AT+GSN, which
+    # unlike the SIM identity also answers before CFUN=1
+    if not self._loopback:
+      status, cmd, response = self._modem.cached_request(self._modem.AT_GSN)
+      if status:
+        return response["IMEI"]
+    return self._modem._port
+
+  def _load(self):
+    if not os.path.exists(self._settings_file):
+      return {}
+    try:
+      with open(self._settings_file) as f:
+        return json.load(f)
+    except Exception as e:
+      self._my_logger.error(f"Error: {e}")
+      return {}
+
+  def _store(self, baudrate, rtscts, throughput):
+    settings = self._load()
+    settings[self._device_id()] = {"baudrate": baudrate, "rtscts": rtscts, "throughput": round(throughput)}
+    with open(self._settings_file, "w") as f:
+      json.dump(settings, f, indent=2)
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  my_bg95 = osi_layer(logging)
+  my_tuner = uart_autotuner(my_bg95, logging)
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  if not my_tuner.apply_stored():
+    status, results = my_tuner.autotune()
+    logging.info(f"throughput per baud rate: {results}")
+
+  my_bg95.close_usb()
@@ -0,0 +1,279 @@
+import threading
+import time
+
+############################################################################################################
+# 3GPP TS 27.010 (GSM 07.10) basic option multiplexer
+############################################################################################################
+
+_CMUX_FLAG = 0xF9
+_CMUX_EA = 0x01
+_CMUX_CR = 0x02
+_CMUX_PF = 0x10
+
+# frame types
+_CMUX_SABM = 0x2F
+_CMUX_UA = 0x63
+_CMUX_DM = 0x0F
+_CMUX_DISC = 0x43
+_CMUX_UIH = 0xEF
+
+# control channel (DLCI 0) message types, including the EA and C/R bits
+_CMUX_MSG_CLD = 0xC3
+_CMUX_MSG_MSC = 0xE3
+# V.24 signals for MSC: EA, RTC, RTR, DV
+_CMUX_V24_SIGNALS = 0x8D
+
+def _cmux_crc_table():
+  # reversed CRC-8 with polynomial x^8 + x^2 + x + 1, as used for the 27.010 FCS
+  table = []
+  for byte in range(256):
+    crc = byte
+    for _ in range(8):
+      crc = (crc >> 1) ^ 0xE0 if (crc & 0x01) else (crc >> 1)
+    table.append(crc)
+  return table
+
+_CMUX_CRC_TABLE = _cmux_crc_table()
+
+def _cmux_fcs(header):
+  crc = 0xFF
+  for byte in header:
+    crc = _CMUX_CRC_TABLE[crc ^ byte]
+  return 0xFF - crc
+
+def _cmux_fcs_ok(header, fcs):
+  crc = 0xFF
+  for byte in header:
+    crc = _CMUX_CRC_TABLE[crc ^ byte]
+  return _CMUX_CRC_TABLE[crc ^ fcs] == 0xCF
+
+############################################################################################################
+# class cmux_port: one virtual channel, a pyserial compatible port object for bg95_serial(ser=...)
+############################################################################################################
+
+class cmux_port:
+  _mux = None
+  _dlci = 0
+
+  def __init__(self, mux, dlci):
+    self._mux = mux
+    self._dlci = dlci
+    self._rx = bytearray()
+    self._rx_cond = threading.Condition()
+    self.name = f"{mux.name}:dlci{dlci}"
+    self.timeout = None
+    self.is_open = False
+
+  def _receive(self, data):
+    # called from the multiplexer reader thread
+    with self._rx_cond:
+      self._rx += data
+      self._rx_cond.notify_all()
+
+  @property
+  def in_waiting(self):
+    with self._rx_cond:
+      return len(self._rx)
+
+  def write(self, data):
+    return self._mux._send_data(self._dlci, bytes(data))
+
+  def _wait_for(self, ready):
+    # wait until ready() holds or the port timeout expires, caller holds _rx_cond
+    end = None if self.timeout is None else time.monotonic() + self.timeout
+    while not ready() and self.is_open:
+      remaining = None if end is None else end - time.monotonic()
+      if (remaining is not None) and (remaining <= 0):
+        break
+      self._rx_cond.wait(remaining)
+
+  def read(self, size=1):
+    with self._rx_cond:
+      self._wait_for(lambda: len(self._rx) >= size)
+      data = bytes(self._rx[:size])
+      del self._rx[:size]
+      return data
+
+  def readinto(self, buffer):
+    with self._rx_cond:
+      self._wait_for(lambda: len(self._rx) > 0)
+      size = min(len(buffer), len(self._rx))
+      buffer[:size] = self._rx[:size]
+      del self._rx[:size]
+      return size
+
+  def readline(self):
+    # same semantics as pyserial: returns a partial line when the timeout expires
+    with self._rx_cond:
+      self._wait_for(lambda: b'\n' in self._rx)
+      end = self._rx.find(b'\n')
+      end = len(self._rx) if end < 0 else end + 1
+      data = bytes(self._rx[:end])
+      del self._rx[:end]
+      return data
+
+  def reset_input_buffer(self):
+    with self._rx_cond:
+      self._rx.clear()
+
+  def close(self):
+    self._mux.close_channel(self._dlci)
+
+############################################################################################################
+# class cmux: frames several virtual channels over one serial.Serial
+############################################################################################################
+
+class cmux:
+  # BG95 supports DLCI 1..4, frame size N1 as configured with AT+CMUX
+  MAX_DLCI = 4
+  DEFAULT_FRAME_SIZE = 127
+  _RESPONSE_TIMEOUT = 3
+
+  _my_logger = None
+  _ser = None
+
+  def __init__(self, ser, logger=None, frame_size=DEFAULT_FRAME_SIZE):
+    # ser: an open serial.Serial on which AT+CMUX has just been accepted
+    self._ser = ser
+    self._my_logger = logger
+    self._frame_size = frame_size
+    self.name = ser.name
+    self._channels = {}
+    self._tx_lock = threading.Lock()
+    self._ack_cond = threading.Condition()
+    self._acks = {}
+    self._running = False
+    self._reader = None
+    self._stats = {"tx_frames": 0, "rx_frames": 0, "tx_bytes": 0, "rx_bytes": 0, "fcs_errors": 0}
+
+  def start(self) -> bool:
+    # start the reader thread and open the control channel
+    self._ser.timeout = 0.1
+    self._running = True
+    self._reader = threading.Thread(target=self._read_loop, name=f"cmux-{self.name}", daemon=True)
+    self._reader.start()
+    if not self._open_dlci(0):
+      self._my_logger.error(f"CMUX control channel not accepted on {self.name}")
+      self._running = False
+      return False
+    self._my_logger.debug(f"CMUX started on {self.name}")
+    return True
+
+  def open_channel(self, dlci) -> cmux_port:
+    # open a virtual channel, returns None if the modem rejects it
+    if not (1 <= dlci <= self.MAX_DLCI):
+      self._my_logger.error(f"CMUX DLCI {dlci} out of range")
+      return None
+    port = cmux_port(self, dlci)
+    self._channels[dlci] = port
+    if not self._open_dlci(dlci):
+      self._my_logger.error(f"CMUX DLCI {dlci} not accepted")
+      del self._channels[dlci]
+      return None
+    # signal 'ready' on the new channel, the modem holds back data until it sees DV/RTC
+    self._send_frame(0, _CMUX_UIH, bytes([_CMUX_MSG_MSC, 0x05, (dlci << 2) | _CMUX_CR | _CMUX_EA, _CMUX_V24_SIGNALS]))
+    port.is_open = True
+    return port
+
+  def close_channel(self, dlci):
+    port = self._channels.pop(dlci, None)
+    if port is None:
+      return
+    self._send_frame(dlci, _CMUX_DISC | _CMUX_PF)
+    with port._rx_cond:
+      port.is_open = False
+      port._rx_cond.notify_all()
+
+  def stop(self):
+    # close all channels and return the modem to plain AT mode
+    for dlci in list(self._channels):
+      self.close_channel(dlci)
+    self._send_frame(0, _CMUX_UIH, bytes([_CMUX_MSG_CLD, 0x01]))
+    self._running = False
+    if self._reader is not None:
+      self._reader.join()
+    self._my_logger.debug(f"CMUX stopped on {self.name}, stats {self._stats}")
+
+  def stats(self):
+    return dict(self._stats)
+
+  def _open_dlci(self, dlci) -> bool:
+    with self._ack_cond:
+      self._acks.pop(dlci, None)
+    self._send_frame(dlci, _CMUX_SABM | _CMUX_PF)
+    with self._ack_cond:
+      self._ack_cond.wait_for(lambda: dlci in self._acks, self._RESPONSE_TIMEOUT)
+      return self._acks.get(dlci) == _CMUX_UA
+
+  def _send_data(self, dlci, data):
+    # split data into UIH frames of at most the negotiated frame size
+    for offset in range(0, len(data), self._frame_size):
+      self._send_frame(dlci, _CMUX_UIH, data[offset:offset + self._frame_size])
+    return len(data)
+
+  def _send_frame(self, dlci, control, info=b''):
+    address = (dlci << 2) | _CMUX_CR | _CMUX_EA
+    if len(info) <= 127:
+      header = bytes([address, control, (len(info) << 1) | _CMUX_EA])
+    else:
+      header = bytes([address, control, (len(info) & 0x7F) << 1, len(info) >> 7])
+    frame = bytes([_CMUX_FLAG]) + header + info + bytes([_cmux_fcs(header), _CMUX_FLAG])
+    with self._tx_lock:
+      self._ser.write(frame)
+    self._stats["tx_frames"] += 1
+    self._stats["tx_bytes"] += len(info)
+
+  def _read_loop(self):
+    buffer = bytearray()
+    while self._running:
+      try:
+        data = self._ser.read(max(1, self._ser.in_waiting))
+      except Exception as e:
+        self._my_logger.error(f"CMUX read error: {e}")
+        break
+      if data:
+        buffer += data
+        self._parse_frames(buffer)
+
+  def _parse_frames(self, buffer):
+    # consume all complete frames from buffer, leaves a trailing partial frame in place
+    while True:
+      # resync on the opening flag, skipping repeated flags between frames
+      while buffer and ((buffer[0] != _CMUX_FLAG) or ((len(buffer) > 1) and (buffer[1] == _CMUX_FLAG))):
+        del buffer[0]
+      if len(buffer) < 6:
+        return
+      if buffer[3] & _CMUX_EA:
+        length = buffer[3] >> 1
+        header_end = 4
+      else:
+        length = (buffer[3] >> 1) | (buffer[4] << 7)
+        header_end = 5
+      frame_end = header_end + length + 2
+      if len(buffer) < frame_end:
+        return
+      header = bytes(buffer[1:header_end])
+      info = bytes(buffer[header_end:header_end + length])
+      fcs = buffer[header_end + length]
+      del buffer[:frame_end - 1]
+      if not _cmux_fcs_ok(header, fcs):
+        self._stats["fcs_errors"] += 1
+        continue
+      self._dispatch(header[0] >> 2, header[1] & ~_CMUX_PF, info)
+
+  def _dispatch(self, dlci, control, info):
+    self._stats["rx_frames"] += 1
+    if control in [_CMUX_UA, _CMUX_DM]:
+      with self._ack_cond:
+        self._acks[dlci] = control
+        self._ack_cond.notify_all()
+    elif control == _CMUX_UIH:
+      self._stats["rx_bytes"] += len(info)
+      if dlci == 0:
+        # control channel messages, e.g. MSC responses, need no action
+        return
+      port = self._channels.get(dlci)
+      if port is not None:
+        port._receive(info)
+    elif control == _CMUX_DISC:
+      self._send_frame(dlci, _CMUX_UA | _CMUX_PF)
@@ -0,0 +1,402 @@
+import collections
+import ipaddress
+import logging
+import os
+import random
+import time
+from urllib.parse import urlparse
+from bg95_osi_layer import osi_layer
+
+############################################################################################################
+# class coap_client: CoAP (RFC 7252) over a BG95 UDP socket, with block-wise transfer and observe
+############################################################################################################
+
+class coap_client:
+  TYPE_CON = 0
+  TYPE_NON = 1
+  TYPE_ACK = 2
+  TYPE_RST = 3
+
+  METHOD_GET = 1
+  METHOD_POST = 2
+  METHOD_PUT = 3
+  METHOD_DELETE = 4
+
+  CONTENT_FORMAT_TEXT = 0
+  CONTENT_FORMAT_JSON = 50
+  CONTENT_FORMAT_CBOR = 60
+
+  _OPTION_OBSERVE = 6
+  _OPTION_URI_HOST = 3
+  _OPTION_URI_PATH = 11
+  _OPTION_CONTENT_FORMAT = 12
+  _OPTION_URI_QUERY = 15
+  _OPTION_BLOCK2 = 23
+  _OPTION_BLOCK1 = 27
+  _OPTION_SIZE1 = 60
+
+  # codes are class * 100 + detail, e.g. 2.05 Content is 205
+  _CODE_CONTINUE = 231
+
+  _DEFAULT_PORT = 5683
+  _DEFAULT_CONNECT_ID = 10
+  _DEFAULT_BLOCK_SIZE = 512
+  # transmission parameters of RFC 7252 section 4.8
+  _ACK_TIMEOUT = 2
+  _ACK_RANDOM_FACTOR = 1.5
+  _MAX_RETRANSMIT = 4
+  # IPv4 + UDP headers, counted in the bytes on air
+  _UDP_OVERHEAD = 28
+  _MAX_DATAGRAM = 1500
+
+  _modem = None
+  _my_logger = None
+
+  def __init__(self, modem=None, logger=None, connect_id=_DEFAULT_CONNECT_ID, block_size=_DEFAULT_BLOCK_SIZE,
+               ack_timeout=_ACK_TIMEOUT, max_retransmit=_MAX_RETRANSMIT):
+    # block_size: 16..1024, bodies larger than this are sent and received block-wise
+    self._modem = modem
+    self._my_logger = logger
+    self._connect_id = connect_id
+    self._block_szx = max(0, min(6, block_size.bit_length() - 5))
+    self._ack_timeout = ack_timeout
+    self._max_retransmit = max_retransmit
+    # (host, port, context_id) of the open socket, None when closed
+    self._remote = None
+    self._message_id = random.randrange(65536)
+    # token -> callback(response) of active observations
+    self._observations = {}
+    # datagrams read from the modem but not handled yet, and recently seen message ids
+    self._received = collections.deque()
+    self._recent = collections.deque(maxlen=32)
+    self._stats = {"requests": 0, "retransmissions": 0, "timeouts": 0, "bytes_sent": 0, "bytes_received": 0,
+                   "latency_sec": 0.0}
+
+  def get(self, url, confirmable=True, context_id=None):
+    # same (status, {"result", "status_code", "payload"}) as osi_layer.HTTP_GET
+    return self.request(self.METHOD_GET, url, confirmable=confirmable, context_id=context_id)
+
+  def post(self, url, body, content_format=CONTENT_FORMAT_TEXT, confirmable=True, context_id=None):
+    return self.request(self.METHOD_POST, url, body, content_format, confirmable, context_id)
+
+  def put(self, url, body, content_format=CONTENT_FORMAT_TEXT, confirmable=True, context_id=None):
+    return self.request(self.METHOD_PUT, url, body, content_format, confirmable, context_id)
+
+  def delete(self, url, confirmable=True, context_id=None):
+    return self.request(self.METHOD_DELETE, url, confirmable=confirmable, context_id=context_id)
+
+  def request(self, method, url, body=b'', content_format=None, confirmable=True, context_id=None):
+    # send one request, block-wise when body exceeds the block size, and collect all blocks of
+    # the response. returns (status, response), response also has "latency" [sec]
+    with self._modem.at_transaction(self._modem.AT_PRIO_BULK):
+      if not self._open(url, context_id):
+        return False, None
+      start = time.monotonic()
+      status, response = self._request(method, url, body, content_format, confirmable)
+    if not status:
+      self._my_logger.error(f"CoAP request to {url} FAILED!")
+      return False, None
+    latency = time.monotonic() - start
+    self._stats["requests"] += 1
+    self._stats["latency_sec"] += latency
+    result = self._to_dict(response)
+    result["latency"] = latency
+    self._my_logger.debug(f"CoAP request to {url} PASSED! with response:\n{result}")
+    return True, result
+
+  def observe(self, url, callback, context_id=None):
+    # register for notifications of url, callback(response) runs from loop() for each of them
+    token = os.urandom(4)
+    self._observations[token] = callback
+    with self._modem.at_transaction(self._modem.AT_PRIO_BULK):
+      if not self._open(url, context_id):
+        self._observations.pop(token)
+        return False, None
+      status, response = self._exchange(self._message(self.TYPE_CON, self.METHOD_GET, token, self._options(url, observe=0)), True)
+    if not status or (self._OPTION_OBSERVE not in response["options"]):
+      # the server does not support observe, or refused it
+      self._observations.pop(token)
+      return status, self._to_dict(response) if status else None
+    return True, {**self._to_dict(response), "token": token}
+
+  def cancel_observe(self, url, token):
+    self._observations.pop(token, None)
+    with self._modem.at_transaction(self._modem.AT_PRIO_BULK):
+      status, response = self._exchange(self._message(self.TYPE_CON, self.METHOD_GET, token, self._options(url, observe=1)), True)
+    return status
+
+  def loop(self, timeout=1):
+    # receive notifications for up to timeout [sec]
+    end = time.monotonic() + timeout
+    with self._modem.at_transaction(self._modem.AT_PRIO_BULK):
+      while (self._remote is not None) and (time.monotonic() < end):
+        self._receive(end - time.monotonic())
+
+  def close(self):
+    self._observations.clear()
+    self._received.clear()
+    if self._remote is None:
+      return True
+    self._remote = None
+    status, cmd, response = self._modem.AT_QICLOSE(self._connect_id)
+    return status
+
+  def stats(self):
+    stats = dict(self._stats)
+    if stats["requests"] > 0:
+      stats["latency_sec"] = stats["latency_sec"] / stats["requests"]
+    return stats
+
+  def _open(self, url, context_id):
+    # (re)open the UDP socket when url goes to another server than the last request
+    parsed = urlparse(url)
+    if context_id is None:
+      context_id = self._modem.context_for_url(url)
+    remote = (parsed.hostname, parsed.port or self._DEFAULT_PORT, context_id)
+    if remote == self._remote:
+      return True
+    self.close()
+    host = remote[0]
+    if self._modem._dns_rewrite:
+      status, ips = self._modem.resolve(host, context_id)
+      host = ips[0] if status else host
+    status, cmd, response = self._modem.AT_QIOPEN(self._connect_id, "UDP", host, remote[1], context_id)
+    if not status:
+      self._my_logger.error(f"{cmd} FAILED!")
+      return False
+    self._remote = remote
+    return True
+
+  def _request(self, method, url, body, content_format, confirmable):
+    body = body.encode('utf-8') if isinstance(body, str) else body
+    size = 16 << self._block_szx
+    message_type = self.TYPE_CON if confirmable else self.TYPE_NON
+    token = os.urandom(4)
+
+    # Block1: the request body in blocks, each acknowledged with 2.31 Continue except the last
+    number = 0
+    while True:
+      options = self._options(url, content_format=content_format if body else None)
+      block = body
+      if len(body) > size:
+        block = body[number * size:(number + 1) * size]
+        more = (number + 1) * size < len(body)
+        options.append((self._OPTION_BLOCK1, self._encode_uint((number << 4) | (more << 3) | self._block_szx)))
+        if number == 0:
+          options.append((self._OPTION_SIZE1, self._encode_uint(len(body))))
+      status, response = self._exchange(self._message(message_type, method, token, options, block), confirmable)
+      if not status:
+        return False, None
+      if (len(body) <= size) or not more:
+        break
+      if response["code"] != self._CODE_CONTINUE:
+        # the server stopped the upload before the last block, e.g. 4.13 Request Entity Too Large
+        self._my_logger.error(f"CoAP upload stopped at block {number} with code {response['code']}")
+        return False, None
+      number += 1
+
+    # Block2: fetch the remaining blocks of the response body
+    payload = response["payload"]
+    while self._OPTION_BLOCK2 in response["options"]:
+      value = self._decode_uint(response["options"][self._OPTION_BLOCK2][0])
+      if not value & 0x8:
+        break
+      options = self._options(url)
+      options.append((self._OPTION_BLOCK2, self._encode_uint((((value >> 4) + 1) << 4) | (value & 0x7))))
+      status, response = self._exchange(self._message(message_type, method, token, options), confirmable)
+      if not status:
+        return False, None
+      payload += response["payload"]
+    response["payload"] = payload
+    return True, response
+
+  def _exchange(self, message, confirmable):
+    # send a request and wait for the response with its token. a confirmable request is
+    # retransmitted with exponential backoff until it is acknowledged
+    message_id = int.from_bytes(message[2:4], "big")
+    token = message[4:4 + (message[0] & 0x0F)]
+    timeout = self._ack_timeout * random.uniform(1, self._ACK_RANDOM_FACTOR)
+    acknowledged = False
+    for attempt in range(self._max_retransmit + 1):
+      if attempt > 0:
+        self._stats["retransmissions"] += 1
+      if not self._send(message):
+        return False, None
+      end = time.monotonic() + timeout
+      while time.monotonic() < end:
+        response = self._receive(end - time.monotonic(), message_id, token)
+        if response is None:
+          continue
+        if response["type"] == self.TYPE_RST:
+          self._my_logger.error("CoAP request reset by the server")
+          return False, None
+        if response["code"] != 0:
+          return True, response
+        # empty ACK: the response follows separately, stop retransmitting
+        acknowledged = True
+        end = time.monotonic() + timeout * (2 ** self._max_retransmit)
+      if acknowledged or not confirmable:
+        break
+      timeout *= 2
+    self._stats["timeouts"] += 1
+    return False, None
+
+  def _receive(self, timeout, message_id=None, token=None):
+    # read datagrams for up to timeout [sec], returns the first one matching message_id or
+    # token. everything else is an observe notification or a duplicate
+    if len(self._received) == 0:
+      if not self._modem._AT_poll_urcs(max(0, timeout), lambda: self._modem._socket_event(self._connect_id, "recv")):
+        return None
+      # each read returns one datagram, the 'recv' URC only comes back once all are read
+      while True:
+        status, cmd, response = self._modem.AT_QIRD(self._connect_id, self._MAX_DATAGRAM)
+        if not status or (response["length"] == 0):
+          break
+        self._stats["bytes_received"] += response["length"] + self._UDP_OVERHEAD
+        self._received.append(response["payload"])
+    while len(self._received) > 0:
+      message = self._parse(self._received.popleft())
+      if message is None:
+        continue
+      if message["type"] == self.TYPE_CON:
+        # acknowledge separate responses and confirmable notifications
+        self._send(self._header(self.TYPE_ACK, 0, message["message_id"], b''))
+      duplicate = (message["message_id"], message["type"]) in self._recent
+      self._recent.append((message["message_id"], message["type"]))
+      if (message_id is not None) and (message["type"] in [self.TYPE_ACK, self.TYPE_RST]) and (message["message_id"] == message_id):
+        return message
+      if (token is not None) and (message["token"] == token) and (message["code"] != 0) and not duplicate:
+        return message
+      if (message["token"] in self._observations) and not duplicate:
+        self._observations[message["token"]](self._to_dict(message))
+      elif (message["type"] != self.TYPE_ACK) and (message["token"] not in self._observations):
+        # nobody is waiting for this, e.g. a notification of a cancelled observation
+        self._send(self._header(self.TYPE_RST, 0, message["message_id"], b''))
+    return None
+
+  def _send(self, message):
+    status, cmd, response = self._modem.AT_QISEND(self._connect_id, message)
+    if not status:
+      self._my_logger.error(f"{cmd} FAILED!")
+      return False
+    self._stats["bytes_sent"] += len(message) + self._UDP_OVERHEAD
+    return True
+
+  def _options(self, url, content_format=None, observe=None):
+    parsed = urlparse(url)
+    options = []
+    try:
+      ipaddress.ip_address(parsed.hostname)
+    except ValueError:
+      options.append((self._OPTION_URI_HOST, parsed.hostname.encode()))
+    if observe is not None:
+      options.append((self._OPTION_OBSERVE, self._encode_uint(observe)))
+    for segment in parsed.path.split("/"):
+      if segment:
+        options.append((self._OPTION_URI_PATH, segment.encode()))
+    if content_format is not None:
+      options.append((self._OPTION_CONTENT_FORMAT, self._encode_uint(content_format)))
+    for query in parsed.query.split("&"):
+      if query:
+        options.append((self._OPTION_URI_QUERY, query.encode()))
+    return options
+
+  def _message(self, message_type, code, token, options, payload=b''):
+    message_id = self._message_id = (self._message_id + 1) % 65536
+    data = self._header(message_type, code, message_id, token)
+    # options are delta encoded, so they go out sorted by number
+    previous = 0
+    for number, value in sorted(options, key=lambda option: option[0]):
+      delta, delta_ext = self._option_nibble(number - previous)
+      length, length_ext = self._option_nibble(len(value))
+      data += bytes([(delta << 4) | length]) + delta_ext + length_ext + value
+      previous = number
+    if payload:
+      data += b'\xff' + payload
+    return data
+
+  @staticmethod
+  def _header(message_type, code, message_id, token):
+    # version 1, type, token length, code as class.detail, message id
+    code_byte = ((code // 100) << 5) | (code % 100)
+    return bytes([0x40 | (message_type << 4) | len(token), code_byte]) + message_id.to_bytes(2, "big") + token
+
+  @staticmethod
+  def _option_nibble(value):
+    if value < 13:
+      return value, b''
+    if value < 269:
+      return 13, bytes([value - 13])
+    return 14, (value - 269).to_bytes(2, "big")
+
+  @staticmethod
+  def _encode_uint(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, "big")
+
+  @staticmethod
+  def _decode_uint(value):
+    return int.from_bytes(value, "big")
+
+  def _parse(self, data):
+    # decode a datagram, None when it is not a CoAP message
+    if (len(data) < 4) or (data[0] >> 6 != 1):
+      return None
+    token_length = data[0] & 0x0F
+    message = {"type": (data[0] >> 4) & 0x3, "code": (data[1] >> 5) * 100 + (data[1] & 0x1F),
+               "message_id": int.from_bytes(data[2:4], "big"), "token": data[4:4 + token_length],
+               "options": {}, "payload": b''}
+    position = 4 + token_length
+    number = 0
+    while position < len(data):
+      if data[position] == 0xFF:
+        message["payload"] = data[position + 1:]
+        break
+      delta, length = data[position] >> 4, data[position] & 0x0F
+      position += 1
+      if (delta == 15) or (length == 15):
+        return None
+      delta, position = self._option_extended(data, delta, position)
+      length, position = self._option_extended(data, length, position)
+      number += delta
+      message["options"].setdefault(number, []).append(data[position:position + length])
+      position += length
+    return message
+
+  @staticmethod
+  def _option_extended(data, value, position):
+    if value == 13:
+      return data[position] + 13, position + 1
+    if value == 14:
+      return int.from_bytes(data[position:position + 2], "big") + 269, position + 2
+    return value, position
+
+  def _to_dict(self, message):
+    # same shape as the HTTP_GET/HTTP_POST responses
+    code = message["code"]
+    return {"result": "OK" if 200 <= code < 300 else "ERROR",
+            "status_code": code,
+            "payload": message["payload"].decode('utf-8', errors="replace")}
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  my_bg95 = osi_layer(logging)
+  my_coap = coap_client(my_bg95, logging)
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  my_bg95.resume_modem_network_connection()
+
+  status, response = my_coap.get("coap://coap.me/large")
+  logging.info(f"CoAP GET {status}: {response}")
+  status, response = my_coap.post("coap://coap.me/test", "foo1=bar1")
+  logging.info(f"CoAP POST {status}: {response}")
+  status, response = my_coap.observe("coap://coap.me/obs", lambda notification: logging.info(f"CoAP notification: {notification}"))
+  my_coap.loop(30)
+  logging.info(f"CoAP stats: {my_coap.stats()}")
+  my_coap.close()
+
+  my_bg95.close_usb()
@@ -0,0 +1,128 @@
+############################################################################################################
+# class at_framer: incremental framing of the AT byte stream into lines, prompts and raw data
+############################################################################################################
+
+class at_framer:
+  LINE_EMPTY = "EMPTY"
+  LINE_ECHO = "ECHO"
+  LINE_INTERMEDIATE = "INTERMEDIATE"
+  LINE_FINAL = "FINAL"
+  LINE_URC = "URC"
+  # '>' data prompt and CONNECT, raw data follows
+  LINE_PROMPT = "PROMPT"
+
+  _FINAL_RESULTS = ("OK", "ERROR", "+CME ERROR:", "+CMS ERROR:", "NO CARRIER", "SEND OK", "SEND FAIL")
+  _PROMPTS = ("CONNECT",)
+  # unsolicited lines that do not start with '+'
+  _PLAIN_URCS = ("RDY", "APP RDY", "POWERED DOWN", "NORMAL POWER DOWN")
+  _WHITESPACE = b' \t\r\n\x0b\x0c'
+  _DEFAULT_SIZE = 4096
+  _MIN_FREE = 256
+
+  def __init__(self, size=_DEFAULT_SIZE):
+    # lines are scanned in place, data between _start and _end has not been consumed yet and
+    # _scan is how far that data is known to hold no line end
+    self._buf = bytearray(size)
+    self._view = memoryview(self._buf)
+    self._start = 0
+    self._end = 0
+    self._scan = 0
+    # command whose response is being read, to recognise its echo and intermediate lines
+    self.command = None
+    # a '>' without line end is only a prompt while a command that asks for data is running
+    self.expect_prompt = False
+
+  def __len__(self):
+    # bytes received but not consumed
+    return self._end - self._start
+
+  def reset(self):
+    self._start = self._end = self._scan = 0
+
+  def fill(self, read, size) -> int:
+    # receive up to size bytes with read(size), returns the number of bytes received. the data is
+    # copied into the buffer, a memoryview slice for readinto() would be one more allocation per
+    # read, and pyserial's readinto() reads into a new bytes object anyway
+    if self._start == self._end:
+      self.reset()
+    elif len(self._buf) - self._end < self._MIN_FREE:
+      if self._start > 0:
+        # move the unconsumed data to the front of the buffer
+        length = self._end - self._start
+        self._view[0:length] = self._view[self._start:self._end]
+        self._scan -= self._start
+        self._start, self._end = 0, length
+      else:
+        # a single line longer than the buffer, grow it
+        self._view.release()
+        self._buf.extend(bytes(len(self._buf)))
+        self._view = memoryview(self._buf)
+    size = max(1, min(size, len(self._buf) - self._end))
+    data = read(size)
+    received = len(data)
+    self._buf[self._end:self._end + received] = data
+    self._end += received
+    return received
+
+  def feed(self, data):
+    # add a chunk received elsewhere, e.g. from a test or another transport
+    view = memoryview(data)
+    while len(view) > 0:
+      view = view[self.fill(lambda size: view[:size], len(view)):]
+
+  def next_line(self):
+    # the next complete line without trailing whitespace, '>' for a data prompt, or None when
+    # it has not been received completely yet. partial data stays buffered for the next call
+    newline = self._buf.find(b'\n', self._scan, self._end)
+    if newline >= 0:
+      return self._take_line(newline + 1)
+    self._scan = self._end
+    if self.expect_prompt:
+      # the prompt is '> ' without line end, right after the '\r\n' that ended the previous line
+      start = self._start
+      while (start < self._end) and (self._buf[start] in b'\r'):
+        start += 1
+      if (start < self._end) and (self._buf[start] == ord('>')):
+        end = start + 1
+        if (end < self._end) and (self._buf[end] == ord(' ')):
+          end += 1
+        self._start = self._scan = end
+        return ">"
+    return None
+
+  def take_raw(self, size) -> bytes:
+    # up to size raw bytes of what is buffered, e.g. the payload after CONNECT or '+QIRD: <n>'
+    size = min(size, self._end - self._start)
+    data = bytes(self._view[self._start:self._start + size])
+    self._start += size
+    self._scan = max(self._scan, self._start)
+    return data
+
+  def classify(self, line) -> str:
+    # kind of a line returned by next_line(), in the context of the current command
+    if len(line) == 0:
+      return self.LINE_EMPTY
+    if line == ">" or line.startswith(self._PROMPTS):
+      return self.LINE_PROMPT
+    if line.startswith(self._FINAL_RESULTS):
+      return self.LINE_FINAL
+    if (self.command is not None) and (line == self.command):
+      return self.LINE_ECHO
+    if line.startswith("+"):
+      # '+CSQ: ..' answers AT+CSQ, any other '+' line is unsolicited
+      name = line.split(":", 1)[0]
+      if (self.command is not None) and self.command.startswith("AT" + name):
+        return self.LINE_INTERMEDIATE
+      return self.LINE_URC
+    if line.startswith(self._PLAIN_URCS) or (self.command is None):
+      return self.LINE_URC
+    return self.LINE_INTERMEDIATE
+
+  def _take_line(self, end) -> str:
+    # decode buffer[_start:end] without trailing whitespace and consume up to end
+    start = self._start
+    stop = end
+    while (stop > start) and (self._buf[stop - 1] in self._WHITESPACE):
+      stop -= 1
+    self._start = self._scan = end
+    return self._buf[start:stop].decode('utf-8', 'replace')
@@ -0,0 +1,300 @@
+import logging
+import math
+import re
+import threading
+import time
+from bg95_osi_layer import osi_layer
+
+############################################################################################################
+# class geofence_engine: geofences in the GNSS engine of the BG95 and a host side grid index for the rest
+############################################################################################################
+
+class geofence_engine:
+  EVENT_ENTER = "ENTER"
+  EVENT_LEAVE = "LEAVE"
+
+  # geo ids 0..9 of AT+QCFGEXT="addgeo"
+  HARDWARE_SLOTS = 10
+  # circles and polygons of up to 4 corners fit in the GNSS engine
+  _HARDWARE_MAX_CORNERS = 4
+  _SHAPE_CIRCLE = 0
+  _SHAPE_TRIANGLE = 2
+  _SHAPE_QUADRANGLE = 3
+  # URC on entering and on leaving
+  _HARDWARE_MODE = 3
+  _HARDWARE_EVENTS = {1: EVENT_ENTER, 2: EVENT_LEAVE}
+  _GEOFENCE_URC = '+QIND: "GEOFENCE"'
+  # grid cell size [degrees], about 1 km north-south. fences that span more cells than
+  # _MAX_CELLS are checked for every point instead of being indexed
+  _DEFAULT_CELL_SIZE = 0.01
+  _MAX_CELLS = 1024
+  _METERS_PER_DEGREE = 111320
+
+  _modem = None
+  _my_logger = None
+
+  def __init__(self, modem=None, logger=None, cell_size=_DEFAULT_CELL_SIZE, hardware=True, on_event=None):
+    # on_event(fence_id, event, fix) is called when a position enters or leaves a fence. for
+    # fences in the GNSS engine it comes from the URC, with fix None, from the thread that reads it.
+    # hardware=False keeps all fences on the host
+    self._modem = modem
+    self._my_logger = logger
+    self._cell_size = cell_size
+    self._hardware = hardware
+    self._on_event = on_event
+    # fence_id -> fence dict, see _add()
+    self._fences = {}
+    # (lat cell, lon cell) -> ids of fences whose bounding box overlaps the cell
+    self._grid = {}
+    self._large = set()
+    # host side fences the last position of update() was in
+    self._inside = set()
+    # geo id -> fence_id of the fences in the GNSS engine
+    self._slots = {}
+    self._lock = threading.RLock()
+    self._stats = {"updates": 0, "candidates": 0, "events": 0, "hardware_events": 0}
+    self._modem.register_urc_handler(self._GEOFENCE_URC, self._on_geofence_urc)
+    self._modem.register_reset_handler(self._on_reset)
+
+  def add_circle(self, fence_id, latitude, longitude, radius) -> bool:
+    # circle around latitude, longitude in decimal degrees with radius in [m]
+    dlat = radius / self._METERS_PER_DEGREE
+    dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+    geometry = (latitude, longitude, radius, math.cos(math.radians(latitude)))
+    return self._add(fence_id, "circle", geometry, (latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon),
+                     [self._SHAPE_CIRCLE, latitude, longitude, radius])
+
+  def add_polygon(self, fence_id, corners) -> bool:
+    # polygon of (latitude, longitude) corners in decimal degrees, in order, not closed
+    corners = [(float(latitude), float(longitude)) for latitude, longitude in corners]
+    if len(corners) < 3:
+      self._my_logger.error(f"geofence {fence_id}: a polygon needs at least 3 corners")
+      return False
+    latitudes = [latitude for latitude, longitude in corners]
+    longitudes = [longitude for latitude, longitude in corners]
+    hardware = None
+    if len(corners) <= self._HARDWARE_MAX_CORNERS:
+      hardware = [self._SHAPE_TRIANGLE if len(corners) == 3 else self._SHAPE_QUADRANGLE]
+      for latitude, longitude in corners:
+        hardware += [latitude, longitude]
+    return self._add(fence_id, "polygon", tuple(corners), (min(latitudes), min(longitudes), max(latitudes), max(longitudes)),
+                     hardware)
+
+  def remove(self, fence_id) -> bool:
+    with self._lock:
+      fence = self._fences.pop(fence_id, None)
+      if fence is None:
+        return False
+      self._unindex(fence_id, fence)
+      slot = fence["slot"]
+      if slot is not None:
+        del self._slots[slot]
+    if slot is not None:
+      status, cmd, response = self._modem.AT_QCFGEXT_DELETEGEO(slot)
+      if not status:
+        self._my_logger.error(f"{cmd} FAILED!")
+    return True
+
+  def clear(self):
+    for fence_id in list(self._fences):
+      self.remove(fence_id)
+
+  def locate(self, latitude, longitude):
+    # ids of all fences containing the position, hardware fences included
+    with self._lock:
+      return {fence_id for fence_id in self._candidates(latitude, longitude)
+              if self._contains(self._fences[fence_id], latitude, longitude)}
+
+  def update(self, fix):
+    # new position, e.g. the response of AT_QGPSLOC_REQUEST or a gnss_track fix. fires the events
+    # of the host side fences and returns them as (fence_id, event) pairs, the GNSS engine reports
+    # its own fences with URCs
+    latitude, longitude = fix["latitude"], fix["longitude"]
+    events = []
+    with self._lock:
+      self._stats["updates"] += 1
+      inside = set()
+      for fence_id in self._candidates(latitude, longitude):
+        self._stats["candidates"] += 1
+        fence = self._fences[fence_id]
+        if (fence["slot"] is None) and self._contains(fence, latitude, longitude):
+          inside.add(fence_id)
+      # only fences that were inside before can have been left
+      for fence_id in self._inside - inside:
+        events.append((fence_id, self.EVENT_LEAVE))
+      for fence_id in inside - self._inside:
+        events.append((fence_id, self.EVENT_ENTER))
+      self._inside = inside
+      self._stats["events"] += len(events)
+    for fence_id, event in events:
+      self._fire(fence_id, event, fix)
+    return events
+
+  def query(self, fence_id):
+    # position relative to a fence in the GNSS engine as reported by the modem: 0 = unknown,
+    # 1 = inside, 2 = outside. None for host side fences, see locate()
+    fence = self._fences.get(fence_id)
+    if (fence is None) or (fence["slot"] is None):
+      return None
+    status, cmd, response = self._modem.AT_QCFGEXT_QUERYGEO(fence["slot"])
+    return response["position"] if status else None
+
+  def hardware_fences(self):
+    # fence ids in the GNSS engine, by geo id
+    return [self._slots[slot] for slot in sorted(self._slots)]
+
+  def stats(self):
+    with self._lock:
+      stats = dict(self._stats)
+      stats.update({"fences": len(self._fences), "hardware": len(self._slots), "cells": len(self._grid),
+                    "large": len(self._large)})
+    if stats["updates"] > 0:
+      stats["candidates_per_update"] = stats["candidates"] / stats["updates"]
+    return stats
+
+  def _add(self, fence_id, shape, geometry, bbox, hardware):
+    # replaces a fence with the same id. hardware: shape and coordinates of AT+QCFGEXT="addgeo",
+    # None when the fence does not fit in the GNSS engine
+    if fence_id in self._fences:
+      self.remove(fence_id)
+    fence = {"shape": shape, "geometry": geometry, "bbox": bbox, "hardware": hardware, "slot": None}
+    if self._hardware and (hardware is not None):
+      fence["slot"] = self._program(fence_id, hardware)
+    with self._lock:
+      self._fences[fence_id] = fence
+      self._index(fence_id, fence)
+    return True
+
+  def _program(self, fence_id, hardware):
+    # put the fence in a free slot of the GNSS engine, None when all are used or the modem refuses
+    with self._lock:
+      free = [slot for slot in range(self.HARDWARE_SLOTS) if slot not in self._slots]
+      if len(free) == 0:
+        return None
+      slot = free[0]
+      self._slots[slot] = fence_id
+    status, cmd, response = self._modem.AT_QCFGEXT_ADDGEO(slot, self._HARDWARE_MODE, *hardware)
+    if status:
+      self._my_logger.debug(f"geofence {fence_id} is geo id {slot} of the GNSS engine")
+      return slot
+    self._my_logger.error(f"{cmd} FAILED! geofence {fence_id} is checked on the host")
+    with self._lock:
+      del self._slots[slot]
+    return None
+
+  def _cells(self, bbox):
+    south, west, north, east = bbox
+    size = self._cell_size
+    return [(lat_cell, lon_cell)
+            for lat_cell in range(math.floor(south / size), math.floor(north / size) + 1)
+            for lon_cell in range(math.floor(west / size), math.floor(east / size) + 1)]
+
+  def _cell_count(self, bbox):
+    south, west, north, east = bbox
+    size = self._cell_size
+    return (math.floor(north / size) - math.floor(south / size) + 1) * (math.floor(east / size) - math.floor(west / size) + 1)
+
+  def _index(self, fence_id, fence):
+    if self._cell_count(fence["bbox"]) > self._MAX_CELLS:
+      self._large.add(fence_id)
+      return
+    for cell in self._cells(fence["bbox"]):
+      self._grid.setdefault(cell, set()).add(fence_id)
+
+  def _unindex(self, fence_id, fence):
+    self._inside.discard(fence_id)
+    if fence_id in self._large:
+      self._large.discard(fence_id)
+      return
+    for cell in self._cells(fence["bbox"]):
+      fence_ids = self._grid.get(cell)
+      if fence_ids is not None:
+        fence_ids.discard(fence_id)
+        if len(fence_ids) == 0:
+          del self._grid[cell]
+
+  def _candidates(self, latitude, longitude):
+    # fences whose bounding box may contain the position
+    cell = (math.floor(latitude / self._cell_size), math.floor(longitude / self._cell_size))
+    candidates = self._grid.get(cell, ())
+    if len(self._large) == 0:
+      return list(candidates)
+    return list(candidates) + list(self._large)
+
+  def _contains(self, fence, latitude, longitude):
+    south, west, north, east = fence["bbox"]
+    if not ((south <= latitude <= north) and (west <= longitude <= east)):
+      return False
+    if fence["shape"] == "circle":
+      # equirectangular distance, accurate to well below 1% for fences up to tens of km
+      center_lat, center_lon, radius, cos_lat = fence["geometry"]
+      dy = (latitude - center_lat) * self._METERS_PER_DEGREE
+      dx = (longitude - center_lon) * self._METERS_PER_DEGREE * cos_lat
+      return dx * dx + dy * dy <= radius * radius
+    # even-odd ray casting along the latitude
+    corners = fence["geometry"]
+    inside = False
+    lat_j, lon_j = corners[-1]
+    for lat_i, lon_i in corners:
+      if (lat_i > latitude) != (lat_j > latitude):
+        if longitude < lon_i + (latitude - lat_i) * (lon_j - lon_i) / (lat_j - lat_i):
+          inside = not inside
+      lat_j, lon_j = lat_i, lon_i
+    return inside
+
+  def _on_geofence_urc(self, line):
+    match = re.search(r'\+QIND: "GEOFENCE",(?P<geo_id>\d+),(?P<event>\d+)', line)
+    if not match:
+      return
+    event = self._HARDWARE_EVENTS.get(int(match.group('event')))
+    with self._lock:
+      fence_id = self._slots.get(int(match.group('geo_id')))
+      if (fence_id is None) or (event is None):
+        return
+      self._stats["hardware_events"] += 1
+    self._fire(fence_id, event, None)
+
+  def _on_reset(self):
+    # the GNSS engine lost its geofences, program them again in the order of their geo ids
+    with self._lock:
+      fence_ids = [self._slots[slot] for slot in sorted(self._slots)]
+      self._slots.clear()
+      for fence_id in fence_ids:
+        self._fences[fence_id]["slot"] = None
+    for fence_id in fence_ids:
+      fence = self._fences.get(fence_id)
+      if fence is not None:
+        fence["slot"] = self._program(fence_id, fence["hardware"])
+
+  def _fire(self, fence_id, event, fix):
+    self._my_logger.debug(f"geofence {fence_id}: {event}")
+    if self._on_event is not None:
+      self._on_event(fence_id, event, fix)
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  my_bg95 = osi_layer(logging)
+  my_geofences = geofence_engine(my_bg95, logging, on_event=lambda fence_id, event, fix: logging.info(f"{fence_id} {event}"))
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  my_geofences.add_circle("office", 52.0907, 5.1214, 200)
+  my_geofences.add_polygon("campus", [(52.0850, 5.1700), (52.0850, 5.1800), (52.0900, 5.1800), (52.0900, 5.1700)])
+  my_bg95.AT_QGPSCFG_PRIO(gnss_prio=0)
+  my_bg95.AT_QGPS_ON()
+  for i in range(60):
+    status, cmd, response = my_bg95.AT_QGPSLOC_REQUEST(mode=2)
+    if status:
+      my_geofences.update(response)
+      logging.info(f"inside {my_geofences.locate(response['latitude'], response['longitude'])}")
+    time.sleep(1)
+  my_bg95.AT_QGPS_END()
+  my_bg95.AT_QGPSCFG_PRIO(gnss_prio=1)
+  my_geofences.clear()
+  logging.info(f"geofence stats: {my_geofences.stats()}")
+
+  my_bg95.close_usb()
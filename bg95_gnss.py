@@ -0,0 +1,269 @@
+import calendar
+import logging
+import math
+import time
+from array import array
+
+# numpy is optional, the track columns fall back to typed arrays
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+############################################################################################################
+# GNSS DECODERS: +QGPSLOC responses and NMEA RMC/GGA/GSV sentences into numeric fields
+############################################################################################################
+
+# fields of a fix, missing values are nan resp. 0
+FIX_FIELDS = ["time", "latitude", "longitude", "hdop", "altitude", "fix", "cog", "speed_kmh", "speed_knots", "nsat"]
+
+_QGPSLOC_PREFIX = "+QGPSLOC: "
+_KNOTS_TO_KMH = 1.852
+_NAN = float("nan")
+# epoch of a 'ddmmyy' date, fixes of a log share a few dates
+_epoch_days = {}
+
+def _float(value):
+  return float(value) if value else _NAN
+
+def _int(value):
+  return int(value) if value else 0
+
+def _utc_seconds(utc_time):
+  # 'hhmmss.sss' to seconds of the day
+  return int(utc_time[0:2]) * 3600 + int(utc_time[2:4]) * 60 + float(utc_time[4:])
+
+def _epoch(date, utc_time):
+  # 'ddmmyy' and 'hhmmss.sss' to seconds since the epoch, nan without a date
+  if not (date and utc_time):
+    return _NAN
+  day = _epoch_days.get(date)
+  if day is None:
+    day = calendar.timegm((2000 + int(date[4:6]), int(date[2:4]), int(date[0:2]), 0, 0, 0))
+    _epoch_days[date] = day
+  return day + _utc_seconds(utc_time)
+
+def _degrees(value, hemisphere):
+  # NMEA '(d)ddmm.mmmm' and N/S/E/W to signed decimal degrees
+  if not value:
+    return _NAN
+  dot = value.find(".")
+  minutes_start = (dot if dot >= 0 else len(value)) - 2
+  degrees = int(value[:minutes_start]) + float(value[minutes_start:]) / 60
+  return -degrees if hemisphere in ("S", "W") else degrees
+
+def decode_qgpsloc(line):
+  # '+QGPSLOC: ...' in any <mode> to a fix dict, None when the line is not a location:
+  # mode 0: <UTC>,ddmm.mmmmN,dddmm.mmmmE,<hdop>,<alt>,<fix>,<cog>,<spkm>,<spkn>,<date>,<nsat>
+  # mode 1: <UTC>,ddmm.mmmmmm,N,dddmm.mmmmmm,E,<hdop>,...       (hemispheres as fields)
+  # mode 2: <UTC>,(-)dd.ddddd,(-)ddd.ddddd,<hdop>,...            (decimal degrees)
+  if not line.startswith(_QGPSLOC_PREFIX):
+    return None
+  fields = line[len(_QGPSLOC_PREFIX):].split(",")
+  try:
+    if len(fields) == 13:
+      latitude = _degrees(fields[1], fields[2])
+      longitude = _degrees(fields[3], fields[4])
+      del fields[1:5]
+      fields[1:1] = [latitude, longitude]
+    elif len(fields) == 11:
+      if fields[1][-1:].isalpha():
+        fields[1] = _degrees(fields[1][:-1], fields[1][-1])
+        fields[2] = _degrees(fields[2][:-1], fields[2][-1])
+      else:
+        fields[1] = float(fields[1])
+        fields[2] = float(fields[2])
+    else:
+      return None
+    return {"time": _epoch(fields[9], fields[0]),
+            "latitude": fields[1],
+            "longitude": fields[2],
+            "hdop": _float(fields[3]),
+            "altitude": _float(fields[4]),
+            "fix": _int(fields[5]),
+            "cog": _float(fields[6]),
+            "speed_kmh": _float(fields[7]),
+            "speed_knots": _float(fields[8]),
+            "nsat": _int(fields[10])}
+  except ValueError:
+    return None
+
+def nmea_checksum_ok(sentence):
+  # '$...*hh', the checksum is the XOR of all characters between '$' and '*'
+  star = sentence.rfind("*")
+  if (star < 0) or not sentence.startswith("$"):
+    return False
+  checksum = 0
+  for char in sentence[1:star].encode("ascii", errors="replace"):
+    checksum ^= char
+  try:
+    return checksum == int(sentence[star + 1:star + 3], 16)
+  except ValueError:
+    return False
+
+def decode_nmea(sentence, check=True):
+  # RMC, GGA or GSV sentence of any talker (GP, GL, GA, GB, GN) to a dict with its "type", None
+  # for other sentences or a bad checksum. RMC/GGA carry "utc_time" to merge the sentences of one fix
+  sentence = sentence.strip()
+  if check and not nmea_checksum_ok(sentence):
+    return None
+  star = sentence.rfind("*")
+  fields = sentence[1:star if star >= 0 else len(sentence)].split(",")
+  kind = fields[0][2:]
+  try:
+    if kind == "RMC" and len(fields) >= 10:
+      speed_knots = _float(fields[7])
+      return {"type": "RMC",
+              "utc_time": fields[1],
+              "date": fields[9],
+              "time": _epoch(fields[9], fields[1]),
+              "valid": fields[2] == "A",
+              "latitude": _degrees(fields[3], fields[4]),
+              "longitude": _degrees(fields[5], fields[6]),
+              "speed_knots": speed_knots,
+              "speed_kmh": speed_knots * _KNOTS_TO_KMH,
+              "cog": _float(fields[8])}
+    if kind == "GGA" and len(fields) >= 10:
+      return {"type": "GGA",
+              "utc_time": fields[1],
+              "latitude": _degrees(fields[2], fields[3]),
+              "longitude": _degrees(fields[4], fields[5]),
+              "quality": _int(fields[6]),
+              "nsat": _int(fields[7]),
+              "hdop": _float(fields[8]),
+              "altitude": _float(fields[9])}
+    if kind == "GSV" and len(fields) >= 4:
+      satellites = []
+      for index in range(4, len(fields) - 3, 4):
+        satellites.append({"prn": _int(fields[index]),
+                           "elevation": _int(fields[index + 1]),
+                           "azimuth": _int(fields[index + 2]),
+                           "snr": _int(fields[index + 3])})
+      return {"type": "GSV",
+              "talker": fields[0][:2],
+              "messages": _int(fields[1]),
+              "message": _int(fields[2]),
+              "in_view": _int(fields[3]),
+              "satellites": satellites}
+  except ValueError:
+    return None
+  return None
+
+############################################################################################################
+# class gnss_track: columnar buffer of fixes for high rate logging and post processing of recorded logs
+############################################################################################################
+
+class gnss_track:
+  # column typecodes, also the numpy structured dtype of records()
+  COLUMNS = [("time", 'd'), ("latitude", 'd'), ("longitude", 'd'), ("altitude", 'f'), ("hdop", 'f'),
+             ("cog", 'f'), ("speed_kmh", 'f'), ("nsat", 'b'), ("fix", 'b')]
+
+  def __init__(self):
+    self._columns = {name: array(typecode) for name, typecode in self.COLUMNS}
+    # NMEA sentences of the fix being assembled and the last RMC date, for GGA without RMC
+    self._pending = None
+    self._date = ""
+
+  def __len__(self):
+    return len(self._columns["time"])
+
+  def clear(self):
+    for column in self._columns.values():
+      del column[:]
+    self._pending = None
+
+  def append(self, fix):
+    # add a fix dict, e.g. from decode_qgpsloc() or the response of AT_QGPSLOC_REQUEST
+    for name, typecode in self.COLUMNS:
+      self._columns[name].append(fix.get(name, 0 if typecode == 'b' else _NAN))
+
+  def extend_log(self, lines) -> int:
+    # decode a recorded log of '+QGPSLOC:' responses and/or NMEA sentences, other lines are
+    # skipped. RMC and GGA of the same UTC time are merged into one fix, returns the fixes added
+    count = len(self)
+    append = self.append
+    for line in lines:
+      if line.startswith(_QGPSLOC_PREFIX):
+        fix = decode_qgpsloc(line)
+        if fix is not None:
+          # the NMEA fix being assembled came first
+          self.flush()
+          append(fix)
+      elif line.startswith("$"):
+        self._add_nmea(line)
+    self.flush()
+    return len(self) - count
+
+  def flush(self):
+    # add the fix whose sentences are still being assembled
+    pending = self._pending
+    self._pending = None
+    if (pending is not None) and not math.isnan(pending.get("latitude", _NAN)):
+      if math.isnan(pending.get("time", _NAN)):
+        pending["time"] = _epoch(self._date, pending["utc_time"])
+      self.append(pending)
+
+  def columns(self):
+    # copy of all columns, numpy arrays when available
+    if np is not None:
+      return {name: np.frombuffer(column, dtype=column.typecode).copy() for name, column in self._columns.items()}
+    return {name: array(column.typecode, column) for name, column in self._columns.items()}
+
+  def records(self):
+    # numpy structured array with one record per fix, a list of tuples without numpy
+    if np is None:
+      return list(zip(*(self._columns[name] for name, typecode in self.COLUMNS)))
+    records = np.empty(len(self), dtype=[(name, typecode) for name, typecode in self.COLUMNS])
+    for name, column in self._columns.items():
+      records[name] = np.frombuffer(column, dtype=column.typecode)
+    return records
+
+  def _add_nmea(self, line):
+    sentence = decode_nmea(line)
+    if (sentence is None) or (sentence["type"] == "GSV"):
+      return
+    # a new UTC time or a second sentence of the same type starts the next fix
+    if (self._pending is not None) and ((self._pending["utc_time"] != sentence["utc_time"]) or
+                                        (("cog" if sentence["type"] == "RMC" else "nsat") in self._pending)):
+      self.flush()
+    if self._pending is None:
+      self._pending = {"utc_time": sentence["utc_time"]}
+    pending = self._pending
+    if sentence["type"] == "RMC":
+      if not sentence["valid"]:
+        return
+      self._date = sentence["date"]
+      for name in ["time", "latitude", "longitude", "cog", "speed_kmh", "speed_knots"]:
+        pending[name] = sentence[name]
+    else:
+      if sentence["quality"] == 0:
+        return
+      for name in ["latitude", "longitude", "nsat", "hdop", "altitude"]:
+        pending[name] = sentence[name]
+      # GGA does not tell 2D from 3D, a fix with an altitude is taken as 3D
+      pending["fix"] = 2 if math.isnan(sentence["altitude"]) else 3
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  from bg95_osi_layer import osi_layer
+  my_bg95 = osi_layer(logging)
+  my_track = gnss_track()
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  my_bg95.AT_QGPSCFG_PRIO(gnss_prio=0)
+  my_bg95.AT_QGPS_ON()
+  for i in range(60):
+    status, cmd, response = my_bg95.AT_QGPSLOC_REQUEST(mode=2)
+    if status:
+      my_track.append(response)
+    time.sleep(1)
+  my_bg95.AT_QGPS_END()
+  my_bg95.AT_QGPSCFG_PRIO(gnss_prio=1)
+  logging.info(f"{len(my_track)} fixes: {my_track.columns()}")
+
+  my_bg95.close_usb()
@@ -0,0 +1,115 @@
+from urllib.parse import urlparse
+
+############################################################################################################
+# HTTP request builder and response parser for the BG95 QHTTP stack with requestheader/responseheader on
+############################################################################################################
+
+class http_request:
+  # a complete HTTP request as sent to the modem with AT+QHTTPCFG="requestheader",1, where the
+  # application supplies the request line and all headers itself
+
+  def __init__(self, method="GET", url="", body="", content_type=None, keep_alive=True):
+    self.method = method.upper()
+    self.url = url
+    self.body = body
+    self._headers = {}
+    parsed = urlparse(url)
+    self.header("Host", parsed.netloc)
+    self.header("Accept", "*/*")
+    self.header("User-Agent", "QUECTEL_MODULE")
+    self.header("Connection", "keep-alive" if keep_alive else "close")
+    if content_type is not None:
+      self.header("Content-Type", content_type)
+
+  def header(self, name, value):
+    # add or replace a header, returns self so calls can be chained
+    self._headers[name.lower()] = (name, str(value))
+    return self
+
+  def get_header(self, name, default=None):
+    name, value = self._headers.get(name.lower(), (name, default))
+    return value
+
+  def if_none_match(self, etag):
+    # conditional request: the server answers 304 without body when etag is still current
+    return self.header("If-None-Match", etag) if etag else self
+
+  def if_modified_since(self, last_modified):
+    return self.header("If-Modified-Since", last_modified) if last_modified else self
+
+  def is_https(self):
+    return self.url.lower().startswith("https://")
+
+  def build(self) -> str:
+    parsed = urlparse(self.url)
+    target = parsed.path or "/"
+    if parsed.query:
+      target += "?" + parsed.query
+    lines = [f"{self.method} {target} HTTP/1.1"]
+    headers = dict(self._headers)
+    if self.body or self.method in ["POST", "PUT"]:
+      headers["content-length"] = ("Content-Length", str(len(self.body.encode('utf-8'))))
+    lines += [f"{name}: {value}" for name, value in headers.values()]
+    return "\r\n".join(lines) + "\r\n\r\n" + self.body
+
+class http_response:
+  # status line, headers and body of a response read with AT+QHTTPCFG="responseheader",1
+
+  def __init__(self, status_code=0, reason="", headers=None, body=""):
+    self.status_code = status_code
+    self.reason = reason
+    # header names are stored lower case
+    self.headers = {} if headers is None else headers
+    self.body = body
+
+  def header(self, name, default=None):
+    return self.headers.get(name.lower(), default)
+
+  @property
+  def etag(self):
+    return self.header("etag")
+
+  @property
+  def last_modified(self):
+    return self.header("last-modified")
+
+  @property
+  def not_modified(self):
+    return self.status_code == 304
+
+  def to_dict(self):
+    # same shape as the HTTP_GET/HTTP_POST responses, plus the parsed parts
+    return {"result": "OK" if 200 <= self.status_code < 400 else "ERROR",
+            "status_code": self.status_code,
+            "reason": self.reason,
+            "headers": self.headers,
+            "payload": self.body}
+
+  @classmethod
+  def parse(cls, payload, status_code=0):
+    # split a QHTTPREAD payload into status line, headers and body. the payload has the lines as
+    # read from the modem, joined with '\n' and followed by the final 'OK'
+    if payload.endswith("OK\n"):
+      payload = payload[:-len("OK\n")]
+    if payload.endswith("\n"):
+      payload = payload[:-1]
+    if not payload.startswith("HTTP/"):
+      # response headers were not enabled, all of it is body
+      return cls(status_code, "", {}, payload)
+
+    head, separator, body = payload.partition("\n\n")
+    lines = head.split("\n")
+    version, _, status = lines[0].partition(" ")
+    code, _, reason = status.partition(" ")
+    headers = {}
+    for line in lines[1:]:
+      if ":" not in line:
+        continue
+      name, _, value = line.partition(":")
+      name = name.strip().lower()
+      if name in headers:
+        # repeated headers are combined as allowed by RFC 9110
+        headers[name] += ", " + value.strip()
+      else:
+        headers[name] = value.strip()
+    return cls(int(code) if code.isdigit() else status_code, reason.strip(), headers, body)
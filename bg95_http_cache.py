@@ -0,0 +1,169 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+############################################################################################################
+# class http_cache: size bounded LRU cache of HTTP GET responses, persisted to disk
+############################################################################################################
+
+class http_cache:
+  _DEFAULT_CACHE_FILE = "bg95_http_cache.json"
+  _DEFAULT_MAX_BYTES = 256 * 1024
+  _DEFAULT_MAX_ENTRIES = 64
+  # freshness when the server gives validators but no lifetime: always revalidate
+  _DEFAULT_TTL = 0
+
+  _my_logger = None
+
+  def __init__(self, logger=None, cache_file=_DEFAULT_CACHE_FILE, max_bytes=_DEFAULT_MAX_BYTES, max_entries=_DEFAULT_MAX_ENTRIES):
+    # cache_file=None keeps the cache in memory only
+    self._my_logger = logger
+    self._cache_file = cache_file
+    self._max_bytes = max_bytes
+    self._max_entries = max_entries
+    self._entries = OrderedDict()
+    self._size = 0
+    self._lock = threading.Lock()
+    self._stats = {"hits": 0, "revalidated": 0, "misses": 0, "evictions": 0, "bytes_saved": 0}
+    self._load()
+
+  def lookup(self, url):
+    # returns (entry, fresh). entry is None on a miss, a stale entry carries the validators for a
+    # conditional request
+    with self._lock:
+      entry = self._entries.get(url)
+      if entry is None:
+        self._stats["misses"] += 1
+        return None, False
+      self._entries.move_to_end(url)
+      fresh = time.time() < entry["expires"]
+      if fresh:
+        self._stats["hits"] += 1
+        self._stats["bytes_saved"] += len(entry["body"])
+      return dict(entry), fresh
+
+  def store(self, url, status_code, headers, body) -> bool:
+    # store a 200 response, returns False when it may not or cannot be cached
+    if (status_code != 200) or not self._cacheable(headers):
+      self.invalidate(url)
+      return False
+    entry = {"status_code": status_code, "headers": headers, "body": body, "expires": self._expires(headers)}
+    size = self._entry_size(url, entry)
+    if size > self._max_bytes:
+      self.invalidate(url)
+      return False
+    with self._lock:
+      self._remove(url)
+      self._entries[url] = entry
+      self._size += size
+      self._evict()
+    self._save()
+    return True
+
+  def revalidated(self, url, headers):
+    # a 304 confirmed the cached body, update its headers and lifetime. returns the entry
+    with self._lock:
+      entry = self._entries.get(url)
+      if entry is None:
+        return None
+      self._size -= self._entry_size(url, entry)
+      entry["headers"] = {**entry["headers"], **headers}
+      entry["expires"] = self._expires(entry["headers"])
+      self._size += self._entry_size(url, entry)
+      self._stats["revalidated"] += 1
+      self._stats["bytes_saved"] += len(entry["body"])
+      entry = dict(entry)
+    self._save()
+    return entry
+
+  def invalidate(self, url=None):
+    # drop one URL, or everything
+    with self._lock:
+      if url is None:
+        self._entries.clear()
+        self._size = 0
+      elif not self._remove(url):
+        return
+    self._save()
+
+  def stats(self):
+    with self._lock:
+      return {**self._stats, "entries": len(self._entries), "bytes": self._size}
+
+  def _cacheable(self, headers):
+    # this is a private cache, so only no-store forbids storing
+    if "no-store" in headers.get("cache-control", "").lower():
+      return False
+    # without validators or a lifetime the entry could never be used
+    return ("etag" in headers) or ("last-modified" in headers) or (self._lifetime(headers) > 0)
+
+  def _lifetime(self, headers):
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-cache" in cache_control:
+      return 0
+    match = re.search(r'max-age=(?P<max_age>\d+)', cache_control)
+    if match:
+      return int(match.group('max_age')) - int(headers.get("age", "0") or 0)
+    if "expires" in headers:
+      try:
+        expires = parsedate_to_datetime(headers["expires"]).timestamp()
+        date = parsedate_to_datetime(headers["date"]).timestamp() if "date" in headers else time.time()
+        return expires - date
+      except (TypeError, ValueError):
+        # an invalid Expires means already expired
+        return 0
+    return self._DEFAULT_TTL
+
+  def _expires(self, headers):
+    return time.time() + max(0, self._lifetime(headers))
+
+  def _entry_size(self, url, entry):
+    return len(url) + len(entry["body"]) + sum(len(name) + len(value) for name, value in entry["headers"].items())
+
+  def _remove(self, url):
+    # caller holds _lock
+    entry = self._entries.pop(url, None)
+    if entry is None:
+      return False
+    self._size -= self._entry_size(url, entry)
+    return True
+
+  def _evict(self):
+    # caller holds _lock, drop least recently used entries until both limits hold
+    while (self._size > self._max_bytes) or (len(self._entries) > self._max_entries):
+      url, entry = self._entries.popitem(last=False)
+      self._size -= self._entry_size(url, entry)
+      self._stats["evictions"] += 1
+
+  def _load(self):
+    if (self._cache_file is None) or not os.path.exists(self._cache_file):
+      return
+    try:
+      with open(self._cache_file) as f:
+        entries = json.load(f)
+    except Exception as e:
+      self._my_logger.error(f"Error: {e}")
+      return
+    # the file is written in LRU order, least recently used first
+    with self._lock:
+      for url, entry in entries:
+        self._entries[url] = entry
+        self._size += self._entry_size(url, entry)
+      self._evict()
+
+  def _save(self):
+    if self._cache_file is None:
+      return
+    with self._lock:
+      entries = list(self._entries.items())
+    # write to a temporary file first, a power cut must not leave a truncated cache behind
+    try:
+      with open(self._cache_file + ".tmp", "w") as f:
+        json.dump(entries, f)
+      os.replace(self._cache_file + ".tmp", self._cache_file)
+    except Exception as e:
+      self._my_logger.error(f"Error: {e}")
@@ -0,0 +1,303 @@
+import itertools
+import logging
+import re
+import threading
+import time
+from bg95_osi_layer import osi_layer
+
+############################################################################################################
+# class mqtt_client: one persistent MQTT connection through the BG95 QMT* commands
+############################################################################################################
+
+class mqtt_client:
+  STATE_DISCONNECTED = "DISCONNECTED"
+  STATE_CONNECTED = "CONNECTED"
+
+  _DEFAULT_KEEPALIVE = 120
+  _DEFAULT_MAX_INFLIGHT = 4
+  _RESPONSE_TIMEOUT = 30
+  # [sec] between reconnect attempts, the last value repeats
+  _RECONNECT_BACKOFF = [1, 2, 5, 10, 30, 60]
+  _LOOP_INTERVAL = .2
+  # QMTPUB/QMTSUB results
+  _RESULT_OK = 0
+  _RESULT_RETRANSMISSION = 1
+  _RESULT_FAILED = 2
+
+  _modem = None
+  _my_logger = None
+
+  def __init__(self, modem=None, logger=None, host="", port=1883, client_id="bg95", username=None, password=None,
+               client_idx=0, keepalive=_DEFAULT_KEEPALIVE, clean_session=True, ssl_context_id=None,
+               context_id=osi_layer.PDP_CONTEXT_ID, max_inflight=_DEFAULT_MAX_INFLIGHT, on_message=None):
+    # on_message(topic, payload) is called for every received message, from the thread that
+    # happens to read its URC. ssl_context_id enables MQTT over TLS with that SSL context
+    self._modem = modem
+    self._my_logger = logger
+    self._host = host
+    self._port = port
+    self._client_id = client_id
+    self._username = username
+    self._password = password
+    self._idx = client_idx
+    self._keepalive = keepalive
+    self._clean_session = clean_session
+    self._ssl_context_id = ssl_context_id
+    self._context_id = context_id
+    self._max_inflight = max_inflight
+    self._on_message = on_message
+    self._state = self.STATE_DISCONNECTED
+    # URC results: "open", "conn" and per message id "pub"/"sub"
+    self._results = {}
+    self._msg_ids = itertools.cycle(range(1, 65536))
+    # msg_id -> (topic, payload, qos, retain) of QoS 1/2 messages not acknowledged yet
+    self._inflight = {}
+    self._subscriptions = {}
+    self._lock = threading.RLock()
+    self._stop = threading.Event()
+    self._thread = None
+    self._reconnects = 0
+    self._next_reconnect = 0
+    self._stats = {"published": 0, "acknowledged": 0, "failed": 0, "received": 0, "reconnects": 0}
+    for urc, handler in [("+QMTOPEN:", self._on_open), ("+QMTCONN:", self._on_conn), ("+QMTPUB:", self._on_pub),
+                         ("+QMTSUB:", self._on_sub), ("+QMTRECV:", self._on_recv), ("+QMTSTAT:", self._on_stat)]:
+      self._modem.register_urc_handler(urc, handler)
+    self._modem.register_reset_handler(self._on_reset)
+
+  def connect(self) -> bool:
+    # configure the client, open the connection, connect and restore the subscriptions
+    with self._modem.at_transaction(self._modem.AT_PRIO_NORMAL):
+      if (self._ssl_context_id is not None) and not self._modem._TLS_RESTORE(self._ssl_context_id):
+        self._my_logger.error(f"SSL context {self._ssl_context_id} FAILED!")
+        return False
+      settings = [("version", 4), ("pdpcid", self._context_id), ("keepalive", self._keepalive),
+                  ("session", 1 if self._clean_session else 0), ("recv/mode", 0, 1)]
+      if self._ssl_context_id is not None:
+        settings.append(("ssl", 1, self._ssl_context_id))
+      for setting, *values in settings:
+        status, cmd, response = self._modem.AT_QMTCFG(setting, self._idx, *values)
+        if not status:
+          self._my_logger.error(f"{cmd} FAILED!")
+          return False
+
+      self._results.pop("open", None)
+      status, cmd, response = self._modem.AT_QMTOPEN(self._idx, self._host, self._port)
+      # result 2 = identifier already in use, i.e. still open from before
+      if not (status and self._wait_result("open") in [0, 2]):
+        self._my_logger.error(f"MQTT open of {self._host}:{self._port} FAILED!")
+        return False
+
+      self._results.pop("conn", None)
+      status, cmd, response = self._modem.AT_QMTCONN(self._idx, self._client_id, self._username, self._password)
+      if not (status and self._wait_result("conn") == 0):
+        self._my_logger.error(f"MQTT connect as {self._client_id} FAILED!")
+        self._modem.AT_QMTCLOSE(self._idx)
+        return False
+      self._state = self.STATE_CONNECTED
+      self._reconnects = 0
+
+      for topic, qos in list(self._subscriptions.items()):
+        self._subscribe([(topic, qos)])
+      # messages that were in flight when the connection dropped are sent again
+      with self._lock:
+        inflight = list(self._inflight.items())
+        self._inflight.clear()
+      for msg_id, (topic, payload, qos, retain) in inflight:
+        self.publish(topic, payload, qos, retain)
+    self._my_logger.debug(f"MQTT connected to {self._host}:{self._port} as {self._client_id}")
+    return True
+
+  def disconnect(self):
+    self._state = self.STATE_DISCONNECTED
+    status, cmd, response = self._modem.AT_QMTDISC(self._idx)
+    if not status:
+      self._modem.AT_QMTCLOSE(self._idx)
+    return status
+
+  def is_connected(self):
+    return self._state == self.STATE_CONNECTED
+
+  def publish(self, topic, payload, qos=0, retain=False, timeout=_RESPONSE_TIMEOUT) -> bool:
+    # QoS 0 returns once the modem took the message. for QoS 1/2 at most max_inflight messages
+    # wait for their acknowledgement, a full window blocks until one completes or timeout expires
+    if not self._ensure_connected():
+      return False
+    if qos > 0:
+      if not self.loop(timeout, lambda: len(self._inflight) < self._max_inflight):
+        self._my_logger.error(f"MQTT inflight window full, publish to {topic} FAILED!")
+        return False
+      msg_id = next(self._msg_ids)
+      with self._lock:
+        self._inflight[msg_id] = (topic, payload, qos, retain)
+    else:
+      msg_id = 0
+    status, cmd, response = self._modem.AT_QMTPUB(self._idx, msg_id, qos, retain, topic, payload)
+    if not status:
+      self._my_logger.error(f"{cmd} FAILED!")
+      with self._lock:
+        self._inflight.pop(msg_id, None)
+      return False
+    self._stats["published"] += 1
+    return True
+
+  def flush(self, timeout=_RESPONSE_TIMEOUT) -> bool:
+    # wait until all QoS 1/2 messages are acknowledged
+    return self.loop(timeout, lambda: len(self._inflight) == 0)
+
+  def subscribe(self, topic, qos=0) -> bool:
+    self._subscriptions[topic] = qos
+    if not self._ensure_connected():
+      # subscribed on the next successful connect
+      return False
+    return self._subscribe([(topic, qos)])
+
+  def unsubscribe(self, topic) -> bool:
+    self._subscriptions.pop(topic, None)
+    if not self.is_connected():
+      return True
+    status, cmd, response = self._modem.AT_QMTUNS(self._idx, next(self._msg_ids), [topic])
+    return status
+
+  def loop(self, timeout=_LOOP_INTERVAL, until=None) -> bool:
+    # read URCs for up to timeout [sec], or until until() holds. reconnects a dropped connection
+    if not self._ensure_connected():
+      return False
+    with self._modem.at_transaction(self._modem.AT_PRIO_BULK):
+      return self._modem._AT_poll_urcs(timeout, until)
+
+  def start(self):
+    # keep reading URCs in the background, so messages arrive without calling loop()
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._run, name=f"mqtt-{self._idx}", daemon=True)
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def stats(self):
+    return {**self._stats, "inflight": len(self._inflight), "state": self._state}
+
+  def _run(self):
+    while not self._stop.is_set():
+      if not self.loop(self._LOOP_INTERVAL):
+        self._stop.wait(self._LOOP_INTERVAL)
+      else:
+        # leave a gap so other users of the AT channel get in
+        time.sleep(0)
+
+  def _ensure_connected(self) -> bool:
+    if self.is_connected():
+      return True
+    if time.monotonic() < self._next_reconnect:
+      return False
+    backoff = self._RECONNECT_BACKOFF[min(self._reconnects, len(self._RECONNECT_BACKOFF) - 1)]
+    self._reconnects += 1
+    self._next_reconnect = time.monotonic() + backoff
+    self._stats["reconnects"] += 1
+    return self.connect()
+
+  def _subscribe(self, topics) -> bool:
+    msg_id = next(self._msg_ids)
+    self._results.pop(("sub", msg_id), None)
+    status, cmd, response = self._modem.AT_QMTSUB(self._idx, msg_id, topics)
+    if not (status and self._wait_result(("sub", msg_id)) == self._RESULT_OK):
+      self._my_logger.error(f"MQTT subscribe to {topics} FAILED!")
+      return False
+    return True
+
+  def _wait_result(self, key, timeout=_RESPONSE_TIMEOUT):
+    self._modem._AT_poll_urcs(timeout, lambda: key in self._results)
+    return self._results.pop(key, None)
+
+  def _parse(self, regex, line):
+    match = re.search(regex, line)
+    if (match is None) or (int(match.group('idx')) != self._idx):
+      return None
+    return match
+
+  def _on_open(self, line):
+    match = self._parse(r'\+QMTOPEN: (?P<idx>\d+),(?P<result>-?\d+)', line)
+    if match:
+      self._results["open"] = int(match.group('result'))
+
+  def _on_conn(self, line):
+    match = self._parse(r'\+QMTCONN: (?P<idx>\d+),(?P<result>\d+)(,(?P<ret_code>\d+))?', line)
+    if match:
+      # a refused connection reports result 0 with a non zero return code
+      self._results["conn"] = int(match.group('result')) or int(match.group('ret_code') or 0)
+
+  def _on_sub(self, line):
+    match = self._parse(r'\+QMTSUB: (?P<idx>\d+),(?P<msg_id>\d+),(?P<result>\d+)', line)
+    if match:
+      self._results[("sub", int(match.group('msg_id')))] = int(match.group('result'))
+
+  def _on_pub(self, line):
+    match = self._parse(r'\+QMTPUB: (?P<idx>\d+),(?P<msg_id>\d+),(?P<result>\d+)', line)
+    if (match is None) or (int(match.group('msg_id')) == 0):
+      return
+    result = int(match.group('result'))
+    if result == self._RESULT_RETRANSMISSION:
+      # the modem retransmits by itself, the message stays in flight
+      return
+    with self._lock:
+      message = self._inflight.pop(int(match.group('msg_id')), None)
+    if message is None:
+      return
+    if result == self._RESULT_OK:
+      self._stats["acknowledged"] += 1
+    else:
+      self._stats["failed"] += 1
+      self._my_logger.error(f"MQTT publish to {message[0]} FAILED!")
+
+  def _on_recv(self, line):
+    # '+QMTRECV: <idx>,<msg_id>,"<topic>",<len>,"<payload>"' in recv/mode 0,1
+    match = self._parse(r'\+QMTRECV: (?P<idx>\d+),(?P<msg_id>\d+),"(?P<topic>[^"]*)",((?P<length>\d+),)?"(?P<payload>.*)"$', line)
+    if match is None:
+      return
+    self._stats["received"] += 1
+    if self._on_message is not None:
+      self._on_message(match.group('topic'), match.group('payload'))
+
+  def _on_stat(self, line):
+    # the connection was closed or dropped, the next call reconnects
+    match = self._parse(r'\+QMTSTAT: (?P<idx>\d+),(?P<err>\d+)', line)
+    if match:
+      self._my_logger.error(f"MQTT connection lost, error {match.group('err')}")
+      self._state = self.STATE_DISCONNECTED
+      self._next_reconnect = 0
+
+  def _on_reset(self):
+    # the module restarted or went through a CFUN cycle and lost the connection without a
+    # +QMTSTAT, the next call reconnects
+    if self._state == self.STATE_CONNECTED:
+      self._my_logger.error(f"MQTT connection lost with the module state")
+    self._state = self.STATE_DISCONNECTED
+    self._next_reconnect = 0
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  my_bg95 = osi_layer(logging)
+  my_mqtt = mqtt_client(my_bg95, logging, host="test.mosquitto.org", client_id="bg95_python_hal",
+                        on_message=lambda topic, payload: logging.info(f"MQTT {topic}: {payload}"))
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  my_bg95.resume_modem_network_connection()
+
+  if my_mqtt.connect():
+    my_mqtt.subscribe("bg95_python_hal/echo", qos=1)
+    for i in range(10):
+      my_mqtt.publish("bg95_python_hal/echo", f"telemetry {i}", qos=1)
+    my_mqtt.flush()
+    my_mqtt.loop(5)
+    logging.info(f"MQTT stats: {my_mqtt.stats()}")
+    my_mqtt.disconnect()
+
+  my_bg95.close_usb()
@@ -1,14 +1,67 @@
+import ipaddress
 import logging
 import time
+from urllib.parse import urlparse
 from timer import timer
 from bg95_atcmds import bg95_atcmds
+from bg95_http import http_request, http_response
 
 class osi_layer(bg95_atcmds):
   _AT_CMD_RETRY_INTERVAL = .5
-
-  def __init__(self, logger=None):
+  _SOCKET_RESPONSE_TIMEOUT = 60
+  _UFS_CHUNK_SIZE = 4096
+  _TLS_TIMING_SAMPLES = 100
+  # bounds for the DNS TTL [sec] of cached host addresses
+  _DNS_MIN_TTL = 30
+  _DNS_MAX_TTL = 3600
+
+  def __init__(self, logger=None, port='COM11', ser=None):
     self._my_logger = logger
-    super().__init__(logger=self._my_logger)
+    super().__init__(logger=self._my_logger, port=port, ser=ser)
+    # PDP context id -> {"apn", "ssl_context_id"}, host -> PDP context id
+    self._pdp_contexts = {self.PDP_CONTEXT_ID: {"apn": self._APN_OPENINTERNET, "ssl_context_id": self.SSL_CONTEXT_ID}}
+    self._host_contexts = {}
+    # host -> (addresses, expiry), and whether plain HTTP and socket requests use them directly
+    self._dns_cache = {}
+    self._dns_rewrite = False
+    # PDP context the HTTP(S) stack is currently configured for
+    self._http_context_id = self.PDP_CONTEXT_ID
+    # HTTP(S) stack settings left by the last HTTP_REQUEST, None is unknown
+    self._http_request_header = None
+    self._http_response_header = None
+    self._http_url = None
+    self._http_ssl_context_id = None
+    # optional http_cache for HTTP_GET_CACHED, see set_http_cache()
+    self._http_cache = None
+    # SSL contexts set up by TLS_CONFIGURE that the module still has, the settings of all of them
+    # to set them up again after reset_state(), and recent TLS timings
+    self._ssl_contexts = {}
+    self._ssl_settings = {}
+    self._tls_timing = {"handshake": [], "setup": [], "request": []}
+    # called by reset_state(), see register_reset_handler()
+    self._reset_handlers = []
+
+  def open_usb(self):
+    if not super().open_usb():
+      return False
+    # the module may have restarted while the port was closed, e.g. after AT+QPOWD
+    self.reset_state()
+    return True
+
+  def register_reset_handler(self, handler):
+    # call handler() when the module lost its settings, e.g. to program geofences or reconnect again
+    self._reset_handlers.append(handler)
+
+  def reset_state(self):
+    # forget what the module was configured with, after it restarted or went through a CFUN cycle
+    self._http_context_id = None
+    self._http_request_header = None
+    self._http_response_header = None
+    self._http_url = None
+    self._http_ssl_context_id = None
+    self._ssl_contexts = {}
+    for handler in self._reset_handlers:
+      handler()
 
 ############################################################################################################
 # PHYSICAL LINK LAYER FUNCTIONS
@@ -103,7 +156,7 @@ class osi_layer(bg95_atcmds):
       logging.error(f"{cmd} FAILED!")
       return False
 
-    status, cmd, response = self.ATI()
+    status, cmd, response = self.cached_request(self.ATI)
     # request product information
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
@@ -119,7 +172,7 @@ class osi_layer(bg95_atcmds):
       logging.error(f"{cmd} FAILED!")
       return False
 
-    status, cmd, response = self.AT_GSN()
+    status, cmd, response = self.cached_request(self.AT_GSN)
     # request IMEI
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
@@ -162,6 +215,7 @@ class osi_layer(bg95_atcmds):
     else:
       logging.error(f"{cmd} FAILED!")
       return False
+    self.reset_state()
 
     # wait for proper signal strength
     NO_SIGNAL = 99
@@ -179,6 +233,129 @@ class osi_layer(bg95_atcmds):
 
     return True
 
+  def resume_modem_network_connection(self):
+    # reuse an existing registration and PDP context, e.g. after a host process restart,
+    # and only fall back to a full CFUN=0/CFUN=1 cycle when the modem is not registered
+    status, cmd, response = self.AT_CEREG()
+    if status and (response["result"] == "OK"):
+      logging.debug(f"{cmd} PASSED! with response:\n{response}")
+    else:
+      logging.info(f"modem not registered, running full network connect")
+      return self.connect_modem_to_network()
+
+    status, cmd, response = self.AT_CGATT_REQUEST()
+    if status and (response["PS_attach"] == 1):
+      logging.debug(f"{cmd} PASSED! with response:\n{response}")
+    else:
+      logging.info(f"modem not attached, running full network connect")
+      return self.connect_modem_to_network()
+
+    status, cmd, response = self.AT_QIACT_REQUEST()
+    if status and (response["result"] == "OK") and (response["context_state"] == 1):
+      logging.debug(f"{cmd} PASSED! with response:\n{response}")
+    else:
+      # registration is still valid, only the PDP context needs to be (re)activated
+      status, cmd, response = self.AT_QIACT()
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False
+
+    logging.info(f"resumed existing network registration")
+    return True
+
+  def add_pdp_context(self, context_id, apn, ssl_context_id=None, hosts=()):
+    # configure and activate an additional PDP context, e.g. on _APN_KNPTHINGS. HTTP(S) requests
+    # to any of hosts are routed through this context, using its own SSL context for HTTPS
+    status, cmd, response = self.AT_QICSGP(context_id, apn)
+    if status:
+      logging.debug(f"{cmd} PASSED! with response:\n{response}")
+    else:
+      logging.error(f"{cmd} FAILED!")
+      return False
+
+    status, cmd, response = self.AT_QIACT_REQUEST(context_id)
+    if status and (response["result"] == "OK"):
+      logging.debug(f"{cmd} PASSED! with response:\n{response}")
+    elif response["result"] == "NO_PDP_CONTEXT":
+      status, cmd, response = self.AT_QIACT(context_id)
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False
+    else:
+      logging.error(f"{cmd} FAILED!")
+      return False
+
+    self._pdp_contexts[context_id] = {"apn": apn, "ssl_context_id": context_id if ssl_context_id is None else ssl_context_id}
+    for host in hosts:
+      self._host_contexts[host] = context_id
+    return True
+
+  def remove_pdp_context(self, context_id):
+    status, cmd, response = self.AT_QIDEACT(context_id)
+    if status:
+      logging.debug(f"{cmd} PASSED! with response:\n{response}")
+    else:
+      logging.error(f"{cmd} FAILED!")
+    self._pdp_contexts.pop(context_id, None)
+    self._host_contexts = {host: cid for host, cid in self._host_contexts.items() if cid != context_id}
+    return status
+
+  def context_for_url(self, url):
+    # PDP context a request to url is routed through
+    return self._host_contexts.get(urlparse(url).hostname, self.PDP_CONTEXT_ID)
+
+  def set_dns_servers(self, primary, secondary="", context_id=bg95_atcmds.PDP_CONTEXT_ID):
+    status, cmd, response = self.AT_QIDNSCFG(context_id, primary, secondary)
+    if status:
+      logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      self._dns_cache.clear()
+    else:
+      logging.error(f"{cmd} FAILED!")
+    return status
+
+  def set_dns_rewrite(self, on):
+    # with rewrite on, plain HTTP requests and socket opens go to the cached address of their host
+    # so the modem does no DNS lookup. the Host header is kept, HTTPS keeps the host name for SNI
+    self._dns_rewrite = on
+
+  def resolve(self, host, context_id=None):
+    # addresses of host, from the cache while its DNS TTL lasts. returns (status, addresses)
+    try:
+      ipaddress.ip_address(host)
+      return True, [host]
+    except ValueError:
+      pass
+    entry = self._dns_cache.get(host)
+    if (entry is not None) and (time.monotonic() < entry[1]):
+      return True, entry[0]
+
+    context_id = self._host_contexts.get(host, self.PDP_CONTEXT_ID) if context_id is None else context_id
+    status, cmd, response = self.AT_QIDNSGIP(host, context_id)
+    if not (status and response["ips"]):
+      logging.error(f"{cmd} FAILED!")
+      # a stale address is better than none when the lookup fails
+      return (True, entry[0]) if entry is not None else (False, [])
+    logging.debug(f"{cmd} PASSED! with response:\n{response}")
+    ttl = min(self._DNS_MAX_TTL, max(self._DNS_MIN_TTL, response["ttl"]))
+    self._dns_cache[host] = (response["ips"], time.monotonic() + ttl)
+    return True, response["ips"]
+
+  def _dns_rewrite_url(self, url, context_id=None):
+    # url with the host replaced by its cached address when rewriting applies
+    parsed = urlparse(url)
+    if not self._dns_rewrite or (parsed.scheme.lower() != "http") or not parsed.hostname:
+      return url
+    status, ips = self.resolve(parsed.hostname, context_id)
+    if not status:
+      return url
+    address = ips[0] if ":" not in ips[0] else f"[{ips[0]}]"
+    netloc = address if parsed.port is None else f"{address}:{parsed.port}"
+    return parsed._replace(netloc=netloc).geturl()
+
   def disconnect_modem_from_network(self):
     status, cmd, response = self.AT_CFUN(0)
     if status:
@@ -197,14 +374,14 @@ class osi_layer(bg95_atcmds):
       logging.error(f"{cmd} FAILED!")
       return False
 
-    status, cmd, response = self.AT_QCSQ()
+    status, cmd, response = self.cached_request(self.AT_QCSQ)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
     else:
       logging.error(f"{cmd} FAILED!")
       return False
 
-    status, cmd, response = self.AT_CIMI_REQUEST()
+    status, cmd, response = self.cached_request(self.AT_CIMI_REQUEST)
     # request IMSI, only valid after CFUN=1
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
@@ -212,7 +389,7 @@ class osi_layer(bg95_atcmds):
       logging.error(f"{cmd} FAILED!")
       return False
 
-    status, cmd, response = self.AT_QCCID_REQUEST()
+    status, cmd, response = self.cached_request(self.AT_QCCID_REQUEST)
     # request CCID
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
@@ -248,14 +425,14 @@ class osi_layer(bg95_atcmds):
       logging.error(f"{cmd} FAILED!")
       return False
     
-    status, cmd, response = self.AT_COPS_REQUEST()
+    status, cmd, response = self.cached_request(self.AT_COPS_REQUEST)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
     else:
       logging.error(f"{cmd} FAILED!")
       return False
 
-    status, cmd, response = self.AT_QNWINFO()
+    status, cmd, response = self.cached_request(self.AT_QNWINFO)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
     else:
@@ -292,7 +469,99 @@ class osi_layer(bg95_atcmds):
 # PRESENTATION LAYER FUNCTIONS
 ############################################################################################################
 
-  def TLS_SETUP(self):
+  def TLS_CONFIGURE(self, ssl_context_id=bg95_atcmds.SSL_CONTEXT_ID, ca_cert=None, client_cert=None, client_key=None, session_cache=True, sni=True):
+    # set up an SSL context for verified HTTPS. certificates and key are PEM data, uploaded to UFS.
+    # with ca_cert the server is verified, with client_cert and client_key as well the client
+    # authenticates itself. the session cache lets later handshakes resume the TLS session
+    files = {}
+    for setting, data in [("cacert", ca_cert), ("clientcert", client_cert), ("clientkey", client_key)]:
+      if data is None:
+        continue
+      name = f"UFS:ssl{ssl_context_id}_{setting}.pem"
+      status, response = self.UFS_UPLOAD(name, data, resume=False)
+      if not status:
+        logging.error(f"UFS_UPLOAD of {name} FAILED!")
+        return False
+      files[setting] = name
+
+    if "cacert" not in files:
+      seclevel = self.SSL_SECLEVEL_NONE
+    elif ("clientcert" in files) and ("clientkey" in files):
+      seclevel = self.SSL_SECLEVEL_MUTUAL
+    else:
+      seclevel = self.SSL_SECLEVEL_SERVER
+    return self._TLS_APPLY(ssl_context_id, files, seclevel, session_cache, sni)
+
+  def _TLS_APPLY(self, ssl_context_id, files, seclevel, session_cache, sni):
+    # the AT+QSSLCFG settings of TLS_CONFIGURE, the certificate files are already in UFS
+    commands = [lambda: self.AT_QSSLCFG_SSLVERSION(ssl_context_id), 
+                lambda: self.AT_QSSLCFG_CIPHERSUITE(ssl_context_id)]
+    commands += [lambda setting=setting, name=name: self._AT_QSSLCFG_FILE(setting, ssl_context_id, name) for setting, name in files.items()]
+    commands += [lambda: self.AT_QSSLCFG_SECLEVEL(ssl_context_id, seclevel), 
+                 lambda: self.AT_QSSLCFG_SESSION(ssl_context_id, session_cache), 
+                 lambda: self.AT_QSSLCFG_SNI(ssl_context_id, sni)]
+    for command in commands:
+      status, cmd, response = command()
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False
+
+    self._ssl_settings[ssl_context_id] = {"files": files, "seclevel": seclevel, "session_cache": session_cache, "sni": sni}
+    self._ssl_contexts[ssl_context_id] = self._ssl_settings[ssl_context_id]
+    if self._http_ssl_context_id == ssl_context_id:
+      self._http_ssl_context_id = None
+    return True
+
+  def _TLS_RESTORE(self, ssl_context_id):
+    # set up a context of TLS_CONFIGURE again when the module lost it, see reset_state()
+    if (ssl_context_id not in self._ssl_settings) or (ssl_context_id in self._ssl_contexts):
+      return True
+    return self._TLS_APPLY(ssl_context_id, **self._ssl_settings[ssl_context_id])
+
+  def TLS_HANDSHAKE(self, host, port=443, ssl_context_id=bg95_atcmds.SSL_CONTEXT_ID, context_id=bg95_atcmds.PDP_CONTEXT_ID, connect_id=11):
+    # time a bare TLS handshake to host, without any HTTP traffic. with the session cache on, the
+    # first handshake is a full one and later ones are resumed. returns (status, seconds)
+    start = time.monotonic()
+    status, cmd, response = self.AT_QSSLOPEN(ssl_context_id, connect_id, host, port, context_id)
+    handshake = time.monotonic() - start
+    if not status:
+      logging.error(f"{cmd} FAILED!")
+      return False, None
+    logging.debug(f"{cmd} PASSED! in {handshake:.3f} seconds")
+    self._record_tls_timing("handshake", handshake)
+    self.AT_QSSLCLOSE(connect_id)
+    return True, handshake
+
+  def tls_timing(self):
+    # count, mean and last duration in [sec] of TLS handshakes, TLS setup and HTTPS requests
+    return {kind: {"count": len(times), "mean": sum(times) / len(times), "last": times[-1]} for kind, times in self._tls_timing.items() if times}
+
+  def _record_tls_timing(self, kind, seconds):
+    times = self._tls_timing[kind]
+    times.append(seconds)
+    if len(times) > self._TLS_TIMING_SAMPLES:
+      del times[0]
+
+  def _HTTPS_PREPARE(self, context_id):
+    # select the SSL context of context_id for the HTTP(S) stack, only when it changed
+    ssl_context_id = self._pdp_contexts.get(context_id, {}).get("ssl_context_id", self.SSL_CONTEXT_ID)
+    if ssl_context_id == self._http_ssl_context_id:
+      return True
+    start = time.monotonic()
+    status, response = self.TLS_SETUP(ssl_context_id)
+    if status:
+      logging.debug(f"TLS_SETUP PASSED! with response:\n{response}")
+      self._record_tls_timing("setup", time.monotonic() - start)
+      self._http_ssl_context_id = ssl_context_id
+      self._http_response_header = True
+    else:
+      logging.error(f"TLS_SETUP FAILED!")
+      self._http_ssl_context_id = None
+    return status
+
+  def TLS_SETUP(self, ssl_context_id=bg95_atcmds.SSL_CONTEXT_ID):
     status, cmd, response = self.AT_QHTTPCFG_RESPONSEHEADER(True)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
@@ -300,28 +569,34 @@ class osi_layer(bg95_atcmds):
       logging.error(f"{cmd} FAILED!")
       return False, None
 
-    status, cmd, response = self.AT_QHTTPCFG_SSLCTXID()
+    status, cmd, response = self.AT_QHTTPCFG_SSLCTXID(ssl_context_id)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
     else:
       logging.error(f"{cmd} FAILED!")
       return False, None
 
-    status, cmd, response = self.AT_QSSLCFG_SSLVERSION()
+    if ssl_context_id in self._ssl_settings:
+      # set up by TLS_CONFIGURE, keep its certificates and security level
+      if not self._TLS_RESTORE(ssl_context_id):
+        return False, None
+      return status, response
+
+    status, cmd, response = self.AT_QSSLCFG_SSLVERSION(ssl_context_id)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
     else:
       logging.error(f"{cmd} FAILED!")
       return False, None
 
-    status, cmd, response = self.AT_QSSLCFG_CIPHERSUITE()
+    status, cmd, response = self.AT_QSSLCFG_CIPHERSUITE(ssl_context_id)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
     else:
       logging.error(f"{cmd} FAILED!")
       return False, None
 
-    status, cmd, response = self.AT_QSSLCFG_SECLEVEL()
+    status, cmd, response = self.AT_QSSLCFG_SECLEVEL(ssl_context_id, self.SSL_SECLEVEL_NONE)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
     else:
@@ -366,93 +641,499 @@ class osi_layer(bg95_atcmds):
     
     return True
 
-  def HTTP_GET(self, url):
-    status, cmd, response = self.AT_QHTTPURL(url)
+  def _HTTP_SELECT_CONTEXT(self, url, context_id=None):
+    # point the HTTP(S) stack at the PDP context of url, only sends AT+QHTTPCFG when it changes
+    context_id = self.context_for_url(url) if context_id is None else context_id
+    if context_id == self._http_context_id:
+      return True
+    status, cmd, response = self.AT_QHTTPCFG_CONTEXTID(context_id)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      self._http_context_id = context_id
     else:
       logging.error(f"{cmd} FAILED!")
-      return False, None
+    return status
 
-    status, cmd, response = self.AT_QHTTPGET()
+  def _HTTP_REQUEST_HEADER_MODE(self, on):
+    # switch QHTTPCFG "requestheader", only sends the command when the mode changes
+    if self._http_request_header == on:
+      return True
+    status, cmd, response = self.AT_QHTTPCFG_REQUESTHEADER(on)
     if status:
       logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      self._http_request_header = on
     else:
       logging.error(f"{cmd} FAILED!")
-      return False, None
+      self._http_request_header = None
+    return status
+
+  def HTTP_REQUEST(self, request: http_request, context_id=None):
+    # send a request built with http_request, including its own headers, and return
+    # (status, http_response). a 304 answer to a conditional request has status True and an empty
+    # body. consecutive requests skip modem configuration that has not changed, such as TLS setup
+    # and the URL of a repeated request
+    with self.at_transaction(self.AT_PRIO_BULK):
+      context_id = self.context_for_url(request.url) if context_id is None else context_id
+      if request.is_https():
+        if not self._HTTPS_PREPARE(context_id):
+          return False, None
+      elif not self._http_response_header:
+        status, cmd, response = self.AT_QHTTPCFG_RESPONSEHEADER(True)
+        if not status:
+          logging.error(f"{cmd} FAILED!")
+          return False, None
+        self._http_response_header = True
+
+      if not (self._HTTP_SELECT_CONTEXT(request.url, context_id) and self._HTTP_REQUEST_HEADER_MODE(True)):
+        return False, None
 
-    status, cmd, response = self.AT_QHTTPREAD()
-    if status:
-      logging.debug(f"{cmd} PASSED!")
-    else:
-      logging.error(f"{cmd} FAILED!")
-      return False, None
+      # the request carries its own Host header, so plain HTTP may go to the cached address
+      url = self._dns_rewrite_url(request.url, context_id)
+      if url != self._http_url:
+        status, cmd, response = self.AT_QHTTPURL(url)
+        if status:
+          logging.debug(f"{cmd} PASSED! with response:\n{response}")
+          self._http_url = url
+        else:
+          logging.error(f"{cmd} FAILED!")
+          self._http_url = None
+          return False, None
+
+      if request.method == "GET":
+        status, cmd, response = self.AT_QHTTPGET(request.build(), accepted_codes=None)
+      else:
+        status, cmd, response = self.AT_QHTTPPOST(request.build(), accepted_codes=None)
+      if status and (response["result"] == "OK"):
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
+      status_code = response["httprspcode"]
 
-    logging.debug(f"HTTP_GET PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
-    return True, response
+      status, cmd, response = self.AT_QHTTPREAD(keep_empty_lines=True)
+      if status:
+        logging.debug(f"{cmd} PASSED!")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
 
-  def HTTP_POST(self, url, body):
-    status, cmd, response = self.AT_QHTTPURL(url)
-    if status:
-      logging.debug(f"{cmd} PASSED! with response:\n{response}")
-    else:
-      logging.error(f"{cmd} FAILED!")
+      http_result = http_response.parse(response["payload"], status_code)
+      logging.debug(f"HTTP_REQUEST PASSED! with response:\n{http_result.status_code} {http_result.reason}\n{http_result.headers}\n===payload start===\n{http_result.body}\n===payload end===")
+      return True, http_result
+
+  def set_http_cache(self, cache):
+    # the http_cache of HTTP_GET_CACHED, None disables caching
+    self._http_cache = cache
+
+  def HTTP_GET_CACHED(self, url, context_id=None):
+    # GET of a http:// or https:// url through the http_cache of set_http_cache(). fresh entries
+    # are served without touching the modem, stale ones are revalidated with a conditional request.
+    # unlike HTTP_GET the response is parsed: the payload is the body, plus "status_code",
+    # "headers" and "cached", which tells whether the body came from the cache. the status tells
+    # whether a response was received, as for HTTP_REQUEST, "result" whether it was a success
+    if self._http_cache is None:
+      status, response = self.HTTP_REQUEST(http_request("GET", url), context_id)
+      return status, ({**response.to_dict(), "cached": False} if status else None)
+    entry, fresh = self._http_cache.lookup(url)
+    if fresh:
+      logging.debug(f"HTTP cache hit for {url}")
+      return True, {"result": "OK", "status_code": entry["status_code"], "reason": "OK", "headers": entry["headers"], "payload": entry["body"], "cached": True}
+
+    request = http_request("GET", url)
+    if entry is not None:
+      request.if_none_match(entry["headers"].get("etag")).if_modified_since(entry["headers"].get("last-modified"))
+    status, response = self.HTTP_REQUEST(request, context_id)
+    if not status:
       return False, None
 
-    status, cmd, response = self.AT_QHTTPPOST(body)
-    if status:
-      logging.debug(f"{cmd} PASSED! with response:\n{response}")
-    else:
-      logging.error(f"{cmd} FAILED!")
-      return False, None
+    if response.not_modified and (entry is not None):
+      entry = self._http_cache.revalidated(url, response.headers) or entry
+      logging.debug(f"HTTP cache revalidated {url}")
+      return True, {"result": "OK", "status_code": entry["status_code"], "reason": "OK", "headers": entry["headers"], "payload": entry["body"], "cached": True}
 
-    status, cmd, response = self.AT_QHTTPREAD()
-    if status:
-      logging.debug(f"{cmd} PASSED!")
-    else:
-      logging.error(f"{cmd} FAILED!")
-      return False, None
+    self._http_cache.store(url, response.status_code, response.headers, response.body)
+    return True, {**response.to_dict(), "cached": False}
 
-    logging.debug(f"HTTP_POST PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
-    return True, response
+  def HTTP_GET(self, url, context_id=None):
+    with self.at_transaction(self.AT_PRIO_BULK):
+      if not (self._HTTP_SELECT_CONTEXT(url, context_id) and self._HTTP_REQUEST_HEADER_MODE(False)):
+        return False, None
 
-  def HTTPS_GET(self, url):
-    status, response = self.TLS_SETUP()
-    if status:
-      logging.debug(f"TLS_SETUP PASSED! with response:\n{response}")
-    else:
-      logging.error(f"TLS_SETUP FAILED!")
-      return False, None
+      status, cmd, response = self.AT_QHTTPURL(url)
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+        self._http_url = url
+      else:
+        logging.error(f"{cmd} FAILED!")
+        self._http_url = None
+        return False, None
 
-    status, response = self.HTTP_GET(url)
-    if status:
-      logging.debug(f"HTTP_GET PASSED! with response:\n{response}")
-    else:
-      logging.error(f"HTTP_GET FAILED!")
-      return False, None
+      status, cmd, response = self.AT_QHTTPGET()
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
 
-    logging.debug(f"HTTPS_GET PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
-    return status, response
+      status, cmd, response = self.AT_QHTTPREAD()
+      if status:
+        logging.debug(f"{cmd} PASSED!")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
 
-  def HTTPS_POST(self, url, body):
-    status, response = self.TLS_SETUP()
-    if status:
-      logging.debug(f"TLS_SETUP PASSED! with response:\n{response}")
-    else:
-      logging.error(f"TLS_SETUP FAILED!")
-      return False, None
+      logging.debug(f"HTTP_GET PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
+      return True, response
+
+  def HTTP_POST(self, url, body, context_id=None):
+    with self.at_transaction(self.AT_PRIO_BULK):
+      if not (self._HTTP_SELECT_CONTEXT(url, context_id) and self._HTTP_REQUEST_HEADER_MODE(False)):
+        return False, None
 
-    # run_modem_HTTP_commands()
+      status, cmd, response = self.AT_QHTTPURL(url)
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+        self._http_url = url
+      else:
+        logging.error(f"{cmd} FAILED!")
+        self._http_url = None
+        return False, None
+
+      status, cmd, response = self.AT_QHTTPPOST(body)
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
+
+      status, cmd, response = self.AT_QHTTPREAD()
+      if status:
+        logging.debug(f"{cmd} PASSED!")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
+
+      logging.debug(f"HTTP_POST PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
+      return True, response
+
+  def HTTPS_GET(self, url, context_id=None):
+    with self.at_transaction(self.AT_PRIO_BULK):
+      context_id = self.context_for_url(url) if context_id is None else context_id
+      if not self._HTTPS_PREPARE(context_id):
+        return False, None
+
+      start = time.monotonic()
+      status, response = self.HTTP_GET(url, context_id)
+      self._record_tls_timing("request", time.monotonic() - start)
+      if status:
+        logging.debug(f"HTTP_GET PASSED! with response:\n{response}")
+      else:
+        logging.error(f"HTTP_GET FAILED!")
+        return False, None
+
+      logging.debug(f"HTTPS_GET PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
+      return status, response
+
+  def HTTPS_POST(self, url, body, context_id=None):
+    with self.at_transaction(self.AT_PRIO_BULK):
+      context_id = self.context_for_url(url) if context_id is None else context_id
+      if not self._HTTPS_PREPARE(context_id):
+        return False, None
+
+      # run_modem_HTTP_commands()
+
+      start = time.monotonic()
+      status, response = self.HTTP_POST(url, body, context_id)
+      self._record_tls_timing("request", time.monotonic() - start)
+      if status:
+        logging.debug(f"HTTP_POST PASSED! with response:\n{response}")
+      else:
+        logging.error(f"HTTP_POST FAILED!")
+        return False, None
 
-    status, response = self.HTTP_POST(url, body)
+      logging.debug(f"HTTPS_POST PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
+      return status, response
+
+  def UFS_UPLOAD(self, name, data, chunk_size=_UFS_CHUNK_SIZE, resume=True, verify=True):
+    # store data in the modem file system. small files go in one checksummed QFUPL, larger ones in
+    # chunks, continuing after the part that is already on the modem when resume is set. with
+    # verify the stored file is read back once and its checksum compared with data. returns
+    # (status, {"size"}) with the size on the modem, so a failed upload can simply be called again
+    data = data.encode('utf-8') if isinstance(data, str) else data
+    with self.at_transaction(self.AT_PRIO_BULK):
+      status, cmd, response = self.AT_QFLST(name)
+      if not status:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
+      offset = response["files"].get(name, 0) if resume else 0
+      if offset > len(data):
+        offset = 0
+
+      if (offset == 0) and (len(data) <= chunk_size):
+        if name in response["files"]:
+          self.AT_QFDEL(name)
+        status, cmd, response = self.AT_QFUPL(name, data)
+        if status:
+          logging.debug(f"{cmd} PASSED! with response:\n{response}")
+          return True, {"size": response["size"]}
+        logging.error(f"{cmd} FAILED!")
+        return False, {"size": 0}
+
+      status, cmd, response = self.AT_QFOPEN(name, self.UFS_MODE_CREATE if offset else self.UFS_MODE_OVERWRITE)
+      if not status:
+        logging.error(f"{cmd} FAILED!")
+        return False, {"size": offset}
+      handle = response["handle"]
+      status, cmd, response = self.AT_QFSEEK(handle, offset)
+      while status and (offset < len(data)):
+        status, cmd, response = self.AT_QFWRITE(handle, data[offset:offset + chunk_size])
+        # no progress fails instead of writing the same chunk forever
+        status = status and (response["written"] > 0)
+        if status:
+          offset += response["written"]
+      if not status:
+        logging.error(f"{cmd} FAILED! after {offset} of {len(data)} bytes")
+      self.AT_QFCLOSE(handle)
+
+      # the modem must now hold exactly the data, anything else is resumed from scratch next time
+      list_status, cmd, response = self.AT_QFLST(name)
+      size = response["files"].get(name, 0)
+      if status and (size != len(data)):
+        logging.error(f"UFS_UPLOAD of {name} FAILED! size {size} instead of {len(data)}")
+        self.AT_QFDEL(name)
+        return False, {"size": 0}
+      # a corrupted chunk or a resume after a different file has the right size as well
+      if status and verify and not self._UFS_VERIFY(name, data):
+        self.AT_QFDEL(name)
+        return False, {"size": 0}
+      return status, {"size": size}
+
+  def UFS_DOWNLOAD(self, name, chunk_size=_UFS_CHUNK_SIZE, received=b'', verify=True):
+    # read a file from the modem file system. small files come in one checksummed QFDWL, larger
+    # ones in chunks. pass the data of an interrupted download as received to continue after it.
+    # with verify the checksum of the whole file is compared once all chunks are in, a mismatch
+    # returns no data so the download starts over. returns (status, data) with the data received so far
+    with self.at_transaction(self.AT_PRIO_BULK):
+      status, cmd, response = self.AT_QFLST(name)
+      if not status or (name not in response["files"]):
+        logging.error(f"{cmd} FAILED!")
+        return False, received
+      size = response["files"][name]
+
+      if (len(received) == 0) and (size <= chunk_size):
+        status, cmd, response = self.AT_QFDWL(name, size)
+        if status:
+          logging.debug(f"{cmd} PASSED!")
+          return True, response["payload"]
+        logging.error(f"{cmd} FAILED!")
+        return False, received
+
+      status, cmd, response = self.AT_QFOPEN(name, self.UFS_MODE_READ_ONLY)
+      if not status:
+        logging.error(f"{cmd} FAILED!")
+        return False, received
+      handle = response["handle"]
+      chunks = [received]
+      offset = len(received)
+      status, cmd, response = self.AT_QFSEEK(handle, offset)
+      while status and (offset < size):
+        status, cmd, response = self.AT_QFREAD(handle, min(chunk_size, size - offset))
+        if status and (len(response["payload"]) == 0):
+          break
+        if status:
+          chunks.append(response["payload"])
+          offset += len(response["payload"])
+      if not status:
+        logging.error(f"{cmd} FAILED! after {offset} of {size} bytes")
+      self.AT_QFCLOSE(handle)
+
+      data = b''.join(chunks)
+      status = status and (len(data) == size)
+      if status and verify and not self._UFS_VERIFY(name, data):
+        return False, b''
+    return status, data
+
+  def _UFS_VERIFY(self, name, data):
+    # UFS has no checksum command, QFDWL reads the file once more and reports the checksum the
+    # modem computed over it. costs a second transfer of the file over the UART
+    status, cmd, response = self.AT_QFDWL(name, len(data))
+    if status and (response["checksum"] == self.ufs_checksum(data)):
+      logging.debug(f"{cmd} PASSED! checksum {response['checksum']:04x}")
+      return True
+    logging.error(f"UFS verify of {name} FAILED! checksum {response['checksum']:04x} instead of {self.ufs_checksum(data):04x}")
+    return False
+
+  def HTTP_POST_FILE(self, url, name, context_id=None):
+    # POST the contents of a UFS file, e.g. staged with UFS_UPLOAD, so the transfer over the air
+    # does not depend on the UART speed
+    with self.at_transaction(self.AT_PRIO_BULK):
+      if url.lower().startswith("https://"):
+        context_id = self.context_for_url(url) if context_id is None else context_id
+        if not self._HTTPS_PREPARE(context_id):
+          return False, None
+
+      if not (self._HTTP_SELECT_CONTEXT(url, context_id) and self._HTTP_REQUEST_HEADER_MODE(False)):
+        return False, None
+
+      status, cmd, response = self.AT_QHTTPURL(url)
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+        self._http_url = url
+      else:
+        logging.error(f"{cmd} FAILED!")
+        self._http_url = None
+        return False, None
+
+      status, cmd, response = self.AT_QHTTPPOSTFILE(name)
+      if status and (response["result"] == "OK"):
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
+
+      status, cmd, response = self.AT_QHTTPREAD()
+      if status:
+        logging.debug(f"{cmd} PASSED!")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
+
+      logging.debug(f"HTTP_POST_FILE PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
+      return True, response
+
+  def HTTP_GET_TO_FILE(self, url, name, context_id=None):
+    # GET url and let the modem store the body in a UFS file, fetch it afterwards with UFS_DOWNLOAD.
+    # returns (status, {"result", "size"})
+    with self.at_transaction(self.AT_PRIO_BULK):
+      if url.lower().startswith("https://"):
+        context_id = self.context_for_url(url) if context_id is None else context_id
+        if not self._HTTPS_PREPARE(context_id):
+          return False, None
+
+      if not (self._HTTP_SELECT_CONTEXT(url, context_id) and self._HTTP_REQUEST_HEADER_MODE(False)):
+        return False, None
+
+      status, cmd, response = self.AT_QHTTPURL(url)
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+        self._http_url = url
+      else:
+        logging.error(f"{cmd} FAILED!")
+        self._http_url = None
+        return False, None
+
+      status, cmd, response = self.AT_QHTTPGET()
+      if status and (response["result"] == "OK"):
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
+
+      status, cmd, response = self.AT_QHTTPREADFILE(name)
+      if status:
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
+
+      status, cmd, response = self.AT_QFLST(name)
+      if status and (name in response["files"]):
+        logging.debug(f"{cmd} PASSED! with response:\n{response}")
+      else:
+        logging.error(f"{cmd} FAILED!")
+        return False, None
+      return True, {"result": "OK", "size": response["files"][name]}
+
+  def SOCKET_FAN_OUT(self, requests, timeout=_SOCKET_RESPONSE_TIMEOUT):
+    # send independent requests over TCP/UDP sockets that are all in flight at the same time, so
+    # the network round trips to different backends overlap. each request is a dict with "host",
+    # "port", "data" and optionally "service_type" ("TCP" or "UDP"), "context_id" and "timeout"
+    # [sec]. a TCP response is read until the peer closes the socket or the timeout expires, a UDP
+    # response is the first datagram. returns (status, responses) with one {"result", "payload"}
+    # per request, in order.
+    # the BG95 HTTP(S) stack has a single session, use this for uploads that must overlap
+    responses = [{"result": "ERROR", "payload": b''} for _ in requests]
+    with self.at_transaction(self.AT_PRIO_BULK):
+      # only connect ids no other socket, e.g. of a coap_client, is using
+      connect_ids = self._free_connect_ids(len(requests))
+      if connect_ids is None:
+        logging.error(f"SOCKET_FAN_OUT FAILED! not enough free connect ids for {len(requests)} requests")
+        return False, None
+      # open all sockets first, then wait for their '+QIOPEN' URCs together
+      opening = []
+      for index, connect_id in enumerate(connect_ids):
+        request = requests[index]
+        host = request["host"]
+        if self._dns_rewrite:
+          status, ips = self.resolve(host, request.get("context_id", self.PDP_CONTEXT_ID))
+          host = ips[0] if status else host
+        status, cmd, response = self.AT_QIOPEN(connect_id, request.get("service_type", "TCP"), host, request["port"],
+                                               request.get("context_id", self.PDP_CONTEXT_ID), wait=False)
+        if status:
+          logging.debug(f"{cmd} PASSED! with response:\n{response}")
+          opening.append(index)
+        else:
+          logging.error(f"{cmd} FAILED!")
+
+      opened = []
+      for index in opening:
+        status, cmd, response = self.AT_QIOPEN_WAIT(connect_ids[index])
+        if status:
+          opened.append(index)
+        else:
+          logging.error(f"{cmd} FAILED!")
+
+      sending = []
+      for index in opened:
+        status, cmd, response = self.AT_QISEND(connect_ids[index], requests[index]["data"])
+        if status:
+          logging.debug(f"{cmd} PASSED! with response:\n{response}")
+          sending.append(index)
+        else:
+          logging.error(f"{cmd} FAILED!")
+
+      # collect the responses in the order they arrive, a TCP response can come in several
+      # segments with a 'recv' URC each
+      start = time.monotonic()
+      deadlines = {index: start + requests[index].get("timeout", timeout) for index in sending}
+      payloads = {index: b'' for index in sending}
+      received = set()
+      while len(deadlines) > 0:
+        self._AT_poll_urcs(max(0, min(deadlines.values()) - time.monotonic()),
+                           lambda: any(self._socket_event(connect_ids[index], "recv") or self._socket_event(connect_ids[index], "closed")
+                                       for index in deadlines))
+        for index in list(deadlines):
+          connect_id = connect_ids[index]
+          done = self._socket_event(connect_id, "closed")
+          if done:
+            # data that arrived with the close may not have had a 'recv' URC of its own
+            self._socket_events[connect_id]["recv"] = True
+          while self._socket_event(connect_id, "recv"):
+            status, cmd, response = self.AT_QIRD(connect_id)
+            if not status:
+              logging.error(f"{cmd} FAILED!")
+              done = True
+              break
+            if response["length"] > 0:
+              received.add(index)
+              payloads[index] += response["payload"]
+          udp = requests[index].get("service_type", "TCP") == "UDP"
+          if done or (udp and (index in received)) or (time.monotonic() >= deadlines[index]):
+            del deadlines[index]
+      for index in received:
+        responses[index] = {"result": "OK", "payload": payloads[index]}
+
+      for index in opening:
+        status, cmd, response = self.AT_QICLOSE(connect_ids[index])
+        if not status:
+          logging.error(f"{cmd} FAILED!")
+
+    status = all(response["result"] == "OK" for response in responses)
     if status:
-      logging.debug(f"HTTP_POST PASSED! with response:\n{response}")
+      logging.debug(f"SOCKET_FAN_OUT PASSED! with {len(responses)} responses")
     else:
-      logging.error(f"HTTP_POST FAILED!")
-      return False, None
-
-    logging.debug(f"HTTPS_POST PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
-    return status, response
+      logging.error(f"SOCKET_FAN_OUT FAILED!")
+    return status, responses
 
 if __name__ == "__main__":
   # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
@@ -0,0 +1,173 @@
+import logging
+import time
+from bg95_osi_layer import osi_layer
+
+############################################################################################################
+# class power_scheduler: choose between staying connected, PSM and full detach
+############################################################################################################
+
+class power_scheduler:
+  POWER_MODE_CONNECTED = "CONNECTED"
+  POWER_MODE_PSM = "PSM"
+  POWER_MODE_DETACHED = "DETACHED"
+
+  # stay connected when at least this many messages are queued
+  _CONNECTED_QUEUE_THRESHOLD = 4
+  # idle periods in [sec] below which PSM resp. a full detach are not worth the wake-up cost
+  _PSM_MIN_IDLE = 30
+  _DETACH_MIN_IDLE = 3600
+  # requested PSM timers in [sec]
+  _PSM_TAU = 3600
+  _PSM_ACTIVE_TIME = 10
+  _WAKE_POLL_INTERVAL = .5
+  _WAKE_TIMEOUT = 180
+
+  _modem = None
+  _my_logger = None
+  _mode = None
+  _wake_latency = None
+  _ready_latency = None
+
+  def __init__(self, modem=None, logger=None, connected_queue_threshold=_CONNECTED_QUEUE_THRESHOLD,
+               psm_min_idle=_PSM_MIN_IDLE, detach_min_idle=_DETACH_MIN_IDLE, wake_pin=None):
+    # wake_pin() pulses PSM_EINT (or PWRKEY) of the module, e.g. through a GPIO of the host. a BG95
+    # in PSM does not answer on the UART until one of them is asserted, without wake_pin the
+    # module must be woken externally, e.g. by its own TAU timer or other hardware
+    self._modem = modem
+    self._wake_pin = wake_pin
+    self._my_logger = logger
+    self._connected_queue_threshold = connected_queue_threshold
+    self._psm_min_idle = psm_min_idle
+    self._detach_min_idle = detach_min_idle
+    self._mode = self.POWER_MODE_CONNECTED
+    # per power mode: time to the first AT answer, and time until the modem is registered again
+    self._wake_latency = {mode: [] for mode in [self.POWER_MODE_CONNECTED, self.POWER_MODE_PSM, self.POWER_MODE_DETACHED]}
+    self._ready_latency = {mode: [] for mode in [self.POWER_MODE_CONNECTED, self.POWER_MODE_PSM, self.POWER_MODE_DETACHED]}
+
+  def select_mode(self, queued=0, idle_time=0):
+    # pick the cheapest power mode that still serves the queued traffic
+    if (queued >= self._connected_queue_threshold) or (idle_time < self._psm_min_idle):
+      return self.POWER_MODE_CONNECTED
+    if idle_time < self._detach_min_idle:
+      return self.POWER_MODE_PSM
+    return self.POWER_MODE_DETACHED
+
+  def enter_mode(self, mode):
+    if mode == self._mode:
+      return True
+
+    if mode == self.POWER_MODE_CONNECTED:
+      status, cmd, response = self._modem.AT_CPSMS(psm_on=False)
+    elif mode == self.POWER_MODE_PSM:
+      status, cmd, response = self._modem.AT_CPSMS(psm_on=True, tau_sec=self._PSM_TAU, active_sec=self._PSM_ACTIVE_TIME)
+    else:
+      status, cmd, response = self._modem.AT_CFUN(0)
+
+    if status:
+      self._my_logger.debug(f"{cmd} PASSED! with response:\n{response}")
+      self._my_logger.info(f"power mode {self._mode} -> {mode}")
+      self._mode = mode
+    else:
+      self._my_logger.error(f"{cmd} FAILED!")
+    return status
+
+  def wake(self, timeout=_WAKE_TIMEOUT):
+    # bring the modem back to a state where the first payload byte can be sent, giving up after
+    # timeout [sec]. records the wake-to-first-AT-answer latency and the time until the modem is
+    # registered again for the mode the modem was in. returns (status, wake latency)
+    mode = self._mode
+    start = time.monotonic()
+    end = start + timeout
+    # the UART is unresponsive while in PSM, wake the module and poll until it answers. without
+    # wake_pin this waits for an external wake up
+    if (mode == self.POWER_MODE_PSM) and (self._wake_pin is not None):
+      self._wake_pin()
+    latency = None
+    while True:
+      if self._modem.AT()[0]:
+        latency = time.monotonic() - start
+        break
+      if time.monotonic() + self._WAKE_POLL_INTERVAL > end:
+        break
+      time.sleep(self._WAKE_POLL_INTERVAL)
+    if latency is None:
+      self._my_logger.error(f"wake from {mode} FAILED, no answer after {time.monotonic() - start:.3f} seconds")
+      return False, None
+    self._wake_latency[mode].append(latency)
+    self._my_logger.info(f"wake from {mode} took {latency:.3f} seconds")
+
+    if mode == self.POWER_MODE_DETACHED:
+      # attach and activate the PDP context again, so the next request can be sent right away
+      status = self._modem.connect_modem_to_network() and self._modem.resume_modem_network_connection()
+    else:
+      # still registered, or registered again, within what is left of timeout. the timeout is
+      # checked between commands, each of which can take up to its own AT timeout
+      while True:
+        status, cmd, response = self._modem.AT_CEREG()
+        status = status and (response["result"] == "OK")
+        if status or (time.monotonic() + self._WAKE_POLL_INTERVAL > end):
+          break
+        time.sleep(self._WAKE_POLL_INTERVAL)
+    ready = time.monotonic() - start
+
+    if status:
+      self._ready_latency[mode].append(ready)
+      self._my_logger.info(f"registered after wake from {mode} in {ready:.3f} seconds")
+      if mode == self.POWER_MODE_DETACHED:
+        self._mode = self.POWER_MODE_CONNECTED
+    else:
+      self._my_logger.error(f"registration after wake from {mode} FAILED after {ready:.3f} seconds")
+    return status, latency
+
+  def sleep(self, idle_time, queued=0, timeout=_WAKE_TIMEOUT):
+    # spend an idle period in the cheapest suitable mode, then wake up again within timeout [sec]
+    self.enter_mode(self.select_mode(queued, idle_time))
+    time.sleep(idle_time)
+    return self.wake(timeout)
+
+  def mode(self):
+    return self._mode
+
+  def wake_latency_stats(self):
+    # wake-to-first-AT-answer latency per power mode in [sec]
+    return self._latency_stats(self._wake_latency)
+
+  def ready_latency_stats(self):
+    # time from the start of a wake until the modem is registered again per power mode in [sec]
+    return self._latency_stats(self._ready_latency)
+
+  @staticmethod
+  def _latency_stats(latency):
+    stats = {}
+    for mode, latencies in latency.items():
+      if latencies:
+        stats[mode] = {"count": len(latencies),
+                       "mean": sum(latencies) / len(latencies),
+                       "min": min(latencies),
+                       "max": max(latencies)}
+      else:
+        stats[mode] = {"count": 0, "mean": 0, "min": 0, "max": 0}
+    return stats
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  my_bg95 = osi_layer(logging)
+  my_power = power_scheduler(my_bg95, logging)
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  my_bg95.connect_modem_to_network()
+
+  # measure the wake latency of each mode once
+  for idle_time in [10, 60, 3600]:
+    my_power.sleep(idle_time)
+
+  logging.info(f"wake latency per mode: {my_power.wake_latency_stats()}")
+  logging.info(f"time to registration per mode: {my_power.ready_latency_stats()}")
+
+  my_bg95.disconnect_modem_from_network()
+  my_bg95.close_usb()
@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from array import array
+from bg95_osi_layer import osi_layer
+
+# numpy is optional, the statistics fall back to plain python on the same ring buffers
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+############################################################################################################
+# class radio_sampler: background sampling of signal quality into fixed size ring buffers
+############################################################################################################
+
+class radio_sampler:
+  METRICS = ["rssi", "rsrp", "sinr", "rsrq"]
+  SYSMODES = ["NOSERVICE", "GSM", "eMTC", "NBIoT"]
+  _DEFAULT_INTERVAL = 10
+  _DEFAULT_CAPACITY = 8640
+  # stored for metrics the current RAT does not report, e.g. RSRP on GSM
+  _MISSING = -32768
+  _QCSQ_KEYS = {"rssi": ["lte_rssi", "gsm_rssi"], "rsrp": ["lte_rsrp"], "sinr": ["lte_sinr"], "rsrq": ["lte_rsrq"]}
+
+  _modem = None
+  _my_logger = None
+
+  def __init__(self, modem=None, logger=None, interval=_DEFAULT_INTERVAL, capacity=_DEFAULT_CAPACITY, clock=time.time):
+    # interval: seconds between samples, capacity: number of samples kept, one day at the defaults.
+    # clock() returns the timestamps, e.g. time_service.now
+    self._modem = modem
+    self._my_logger = logger
+    self._clock = clock
+    self._interval = interval
+    self._capacity = capacity
+    # one typed array per column, no per sample objects
+    self._time = array('d', bytes(8 * capacity))
+    self._sysmode = array('b', bytes(capacity))
+    self._metrics = {metric: array('h', bytes(2 * capacity)) for metric in self.METRICS}
+    self._next = 0
+    self._count = 0
+    self._lock = threading.Lock()
+    self._stop = threading.Event()
+    self._thread = None
+
+  def start(self):
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._run, name="radio-sampler", daemon=True)
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def sample(self) -> bool:
+    # take one sample now, at bulk priority so it never delays application traffic
+    with self._modem.at_transaction(self._modem.AT_PRIO_BULK, deadline=self._interval) as granted:
+      if not granted:
+        return False
+      status, cmd, response = self._modem.AT_QCSQ()
+    if not status:
+      self._my_logger.debug(f"{cmd} FAILED!")
+      return False
+    self.add(response, self._clock())
+    return True
+
+  def add(self, qcsq, timestamp):
+    # store an AT_QCSQ response
+    values = {metric: next((qcsq[key] for key in keys if key in qcsq), self._MISSING) for metric, keys in self._QCSQ_KEYS.items()}
+    sysmode = self.SYSMODES.index(qcsq["sysmode"]) if qcsq.get("sysmode") in self.SYSMODES else 0
+    with self._lock:
+      index = self._next
+      self._time[index] = timestamp
+      self._sysmode[index] = sysmode
+      for metric in self.METRICS:
+        self._metrics[metric][index] = values[metric]
+      self._next = (index + 1) % self._capacity
+      self._count = min(self._count + 1, self._capacity)
+
+  def __len__(self):
+    return self._count
+
+  def columns(self, window=None):
+    # chronological copy of all columns over the last window [sec], numpy arrays when available,
+    # e.g. for the coverage analytics upload
+    with self._lock:
+      order = self._order()
+      columns = {"time": self._take(self._time, order), "sysmode": self._take(self._sysmode, order)}
+      for metric in self.METRICS:
+        columns[metric] = self._take(self._metrics[metric], order)
+    if window is not None:
+      start = self._first_after(columns["time"], self._clock() - window)
+      columns = {name: column[start:] for name, column in columns.items()}
+    return columns
+
+  def stats(self, metric, window=None):
+    # rolling statistics of one metric over the last window [sec]. trend is the least squares
+    # slope in [dB/min], None when there are fewer than two samples
+    columns = self.columns(window)
+    if np is not None:
+      valid = columns[metric] != self._MISSING
+      values = columns[metric][valid].astype(np.float64)
+      times = columns["time"][valid]
+      if len(values) == 0:
+        return {"count": 0}
+      p10, p50, p90 = np.percentile(values, [10, 50, 90])
+      trend = None
+      if (len(values) > 1) and (np.ptp(times) > 0):
+        trend = float(np.polyfit(times - times[0], values, 1)[0]) * 60
+      return {"count": len(values), "mean": float(values.mean()), "min": float(values.min()), "max": float(values.max()),
+              "p10": float(p10), "p50": float(p50), "p90": float(p90), "trend": trend}
+
+    samples = [(t, v) for t, v in zip(columns["time"], columns[metric]) if v != self._MISSING]
+    if len(samples) == 0:
+      return {"count": 0}
+    values = sorted(v for t, v in samples)
+    mean = sum(values) / len(values)
+    return {"count": len(values), "mean": mean, "min": float(values[0]), "max": float(values[-1]),
+            "p10": self._percentile(values, 10), "p50": self._percentile(values, 50), "p90": self._percentile(values, 90),
+            "trend": self._slope(samples)}
+
+  def good_signal(self, rsrp_min=-105, sinr_min=0, window=60) -> bool:
+    # True when the median RSRP and SINR over the last window are good enough for an upload
+    rsrp = self.stats("rsrp", window)
+    sinr = self.stats("sinr", window)
+    if (rsrp["count"] == 0) or (sinr["count"] == 0):
+      return False
+    return (rsrp["p50"] >= rsrp_min) and (sinr["p50"] >= sinr_min)
+
+  def _run(self):
+    while not self._stop.is_set():
+      start = time.monotonic()
+      self.sample()
+      self._stop.wait(max(0, self._interval - (time.monotonic() - start)))
+
+  def _order(self):
+    # caller holds _lock, slices of the ring in chronological order
+    if self._count < self._capacity:
+      return [(0, self._count)]
+    return [(self._next, self._capacity), (0, self._next)]
+
+  def _take(self, column, order):
+    if np is not None:
+      view = np.frombuffer(column, dtype=column.typecode)
+      return np.concatenate([view[start:end] for start, end in order])
+    taken = array(column.typecode)
+    for start, end in order:
+      taken.extend(column[start:end])
+    return taken
+
+  @staticmethod
+  def _first_after(times, start_time):
+    # index of the first timestamp at or after start_time, times are sorted
+    if np is not None:
+      return int(np.searchsorted(times, start_time))
+    low, high = 0, len(times)
+    while low < high:
+      middle = (low + high) // 2
+      if times[middle] < start_time:
+        low = middle + 1
+      else:
+        high = middle
+    return low
+
+  @staticmethod
+  def _percentile(values, percent):
+    # linear interpolation between closest ranks, like numpy's default
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+  @staticmethod
+  def _slope(samples):
+    if len(samples) < 2:
+      return None
+    t0 = samples[0][0]
+    mean_t = sum(t - t0 for t, v in samples) / len(samples)
+    mean_v = sum(v for t, v in samples) / len(samples)
+    variance = sum((t - t0 - mean_t) ** 2 for t, v in samples)
+    if variance == 0:
+      return None
+    return sum((t - t0 - mean_t) * (v - mean_v) for t, v in samples) / variance * 60
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  my_bg95 = osi_layer(logging)
+  my_sampler = radio_sampler(my_bg95, logging, interval=2)
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  my_sampler.start()
+  time.sleep(60)
+  my_sampler.stop()
+  for metric in radio_sampler.METRICS:
+    logging.info(f"{metric}: {my_sampler.stats(metric)}")
+  logging.info(f"good signal for upload: {my_sampler.good_signal()}")
+
+  my_bg95.close_usb()
@@ -0,0 +1,100 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+############################################################################################################
+# class at_scheduler: owns the single AT channel, grants it by priority and in FIFO order per priority
+############################################################################################################
+
+class at_scheduler:
+  PRIO_HIGH = 0
+  PRIO_NORMAL = 1
+  PRIO_BULK = 2
+
+  _my_logger = None
+
+  def __init__(self, logger=None):
+    self._my_logger = logger
+    self._cond = threading.Condition()
+    self._queue = []
+    self._seq = itertools.count()
+    self._owner = None
+    self._owner_depth = 0
+    self._owner_since = 0
+    # metrics
+    self._max_queue_depth = 0
+    self._expired = 0
+    self._granted = {}
+    self._wait_total = {}
+    self._wait_max = {}
+    self._hold_max = 0
+
+  def acquire(self, priority=PRIO_NORMAL, deadline=None) -> bool:
+    # wait for the AT channel. deadline is the max time in [sec] to wait in the queue, None waits forever.
+    # returns False when the deadline expired. re-entrant for the thread that already owns the channel
+    me = threading.get_ident()
+    with self._cond:
+      if self._owner == me:
+        self._owner_depth += 1
+        return True
+
+      entry = (priority, next(self._seq), me)
+      heapq.heappush(self._queue, entry)
+      self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+      start = time.monotonic()
+      end = None if deadline is None else start + deadline
+      while (self._owner is not None) or (self._queue[0] is not entry):
+        remaining = None if end is None else end - time.monotonic()
+        if (remaining is not None) and (remaining <= 0):
+          self._queue.remove(entry)
+          heapq.heapify(self._queue)
+          self._expired += 1
+          # the head of the queue may have changed
+          self._cond.notify_all()
+          self._my_logger.error(f"AT channel deadline of {deadline} seconds expired (priority {priority})")
+          return False
+        self._cond.wait(remaining)
+
+      heapq.heappop(self._queue)
+      self._owner = me
+      self._owner_depth = 1
+      self._owner_since = time.monotonic()
+      wait = self._owner_since - start
+      self._granted[priority] = self._granted.get(priority, 0) + 1
+      self._wait_total[priority] = self._wait_total.get(priority, 0) + wait
+      self._wait_max[priority] = max(self._wait_max.get(priority, 0), wait)
+      return True
+
+  def release(self):
+    with self._cond:
+      if self._owner != threading.get_ident():
+        return
+      self._owner_depth -= 1
+      if self._owner_depth == 0:
+        self._hold_max = max(self._hold_max, time.monotonic() - self._owner_since)
+        self._owner = None
+        self._cond.notify_all()
+
+  @contextmanager
+  def transaction(self, priority=PRIO_NORMAL, deadline=None):
+    # hold the AT channel for a sequence of commands, e.g. QHTTPURL -> QHTTPGET -> QHTTPREAD.
+    # yields False (and holds nothing) when the deadline expired before the channel was granted
+    granted = self.acquire(priority, deadline)
+    try:
+      yield granted
+    finally:
+      if granted:
+        self.release()
+
+  def metrics(self):
+    with self._cond:
+      wait_mean = {priority: self._wait_total[priority] / count for priority, count in self._granted.items()}
+      return {"queue_depth": len(self._queue),
+              "max_queue_depth": self._max_queue_depth,
+              "granted": dict(self._granted),
+              "expired": self._expired,
+              "wait_mean": wait_mean,
+              "wait_max": dict(self._wait_max),
+              "hold_max": self._hold_max}
@@ -1,4 +1,5 @@
-import serial
+from bg95_transport import open_transport
+from bg95_framer import at_framer
 
 ############################################################################################################
 # class bg95_serial
@@ -7,26 +8,46 @@ import serial
 class bg95_serial:
   _port = None
   _baudrate = None
+  _rtscts = False
   _ser = None
   _connected = False
   _my_logger = None
   _default_timeout = 0
+  _external_ser = None
+  # receive buffer of the framer, grows for longer lines
+  _RX_BUFFER_SIZE = 4096
+  # encoded command lines are reused, only short lines (commands, not payloads) are kept
+  _LINE_CACHE_SIZE = 256
+  _LINE_CACHE_MAX_LENGTH = 64
 
-  def __init__(self, logger=None, port='COM11', baudrate=115200, default_timeout = 1):
+  def __init__(self, logger=None, port='COM11', baudrate=115200, default_timeout = 1, ser=None, rtscts=False):
+    # port: device name or URL, see open_transport(), e.g. 'COM11', 'socket://host:2000' or 'rfc2217://host:2217'
+    # ser: optional pyserial compatible port object to use instead of opening port, e.g. a CMUX channel
     self._my_logger = logger
     self._port = port
     self._baudrate = baudrate
+    self._rtscts = rtscts
     self._default_timeout = 0
+    self._external_ser = ser
+    self._framer = at_framer(self._RX_BUFFER_SIZE)
+    self._port_timeout = None
+    self._line_cache = {}
     pass
 
   def open_usb(self):
     try:
-      self._ser = serial.Serial(port=self._port, baudrate=self._baudrate, timeout=self._default_timeout)
+      if self._external_ser is None:
+        self._ser = open_transport(self._port, timeout=self._default_timeout, baudrate=self._baudrate, rtscts=self._rtscts)
+      else:
+        self._ser = self._external_ser
+        self._port = self._ser.name
     except Exception as e:
       self._my_logger.error(f"Error: {e}")
       return False
 
     if self._ser.is_open:
+      self._port_timeout = self._ser.timeout
+      self._framer.reset()
       self._my_logger.debug(f"Serial port {self._port} is open.")
       self._my_logger.debug(self._ser.name)
       self._connected = True
@@ -41,11 +62,83 @@ class bg95_serial:
     self._connected = False
     self._my_logger.debug(f"Serial port {self._port} is closed.")
 
+  def transport_stats(self):
+    # latency and throughput counters of the transport, None for ports without them
+    stats = getattr(self._ser, "stats", None)
+    return stats() if callable(stats) else None
+
+  def reset_input(self):
+    # discard everything received but not read yet, e.g. to re-sync after a garbled response
+    try:
+      self._ser.reset_input_buffer()
+    except Exception as e:
+      self._my_logger.error(f"Error: {e}")
+    self._framer.reset()
+
+  def set_baudrate(self, baudrate) -> bool:
+    # change the host side baud rate of the open port
+    try:
+      self._ser.baudrate = baudrate
+    except Exception as e:
+      self._my_logger.error(f"Error: {e}")
+      return False
+    self._baudrate = baudrate
+    self._my_logger.debug(f"Serial port {self._port} baud rate set to {baudrate}.")
+    return True
+
+  def set_flow_control(self, rtscts=False) -> bool:
+    # enable/disable RTS/CTS hardware flow control on the open port
+    try:
+      self._ser.rtscts = rtscts
+    except Exception as e:
+      self._my_logger.error(f"Error: {e}")
+      return False
+    self._rtscts = rtscts
+    self._my_logger.debug(f"Serial port {self._port} RTS/CTS flow control {'ON' if rtscts else 'OFF'}.")
+    return True
+
+  def _write_bytes(self, data) -> bool:
+    # write raw bytes, e.g. a binary payload after a CONNECT
+    if self._connected:
+        try:
+            self._ser.write(data)
+            return True
+        except Exception as e:
+            self._my_logger.error(f"Error: {e}")
+            return False
+    else:
+      self._my_logger.error(f"Serial port {self._port} is closed.")
+      return False
+
+  def _read_bytes(self, size, timeout=_default_timeout):
+    # read up to size raw bytes, fewer if the timeout expires. data already buffered by
+    # _read_line is returned first
+    if self._connected:
+        try:
+          data = self._framer.take_raw(size)
+          if len(data) < size:
+            self._set_timeout(timeout)
+            data += self._ser.read(size - len(data))
+          return True, data
+        except Exception as e:
+            self._my_logger.error(f"Error: {e}")
+            return False, None
+    else:
+      self._my_logger.error(f"Serial port {self._port} is closed.")
+      return False, None
+
   def _write_line(self, command) -> bool:
     if self._connected:
         try:
             # Write data to the serial port
-            self._ser.write(command.encode('utf-8') + b'\r')
+            line = self._line_cache.get(command)
+            if line is None:
+              line = (command if isinstance(command, bytes) else command.encode('utf-8')) + b'\r'
+              if len(command) <= self._LINE_CACHE_MAX_LENGTH:
+                if len(self._line_cache) >= self._LINE_CACHE_SIZE:
+                  self._line_cache.clear()
+                self._line_cache[command] = line
+            self._ser.write(line)
             return True 
         except Exception as e:
             self._my_logger.error(f"Error: {e}")
@@ -54,12 +147,47 @@ class bg95_serial:
       self._my_logger.error(f"Serial port {self._port} is closed.")
       return False
 
+  def _set_timeout(self, timeout):
+    # setting the port timeout is a system call on most platforms, skip it when unchanged
+    if timeout != self._port_timeout:
+      self._ser.timeout = timeout
+      self._port_timeout = timeout
+
+  def _fill_rx_buffer(self) -> int:
+    # read what is available (at least 1 byte or until the port timeout) into the framer
+    return self._framer.fill(self._ser.read, self._ser.in_waiting)
+
+  def _read_pending_lines(self):
+    # complete lines received so far, without waiting. a partial line stays in the buffer
+    lines = []
+    if not self._connected:
+      return lines
+    try:
+      self._set_timeout(0)
+      while (self._ser.in_waiting > 0) and (self._fill_rx_buffer() > 0):
+        pass
+      while True:
+        line = self._framer.next_line()
+        if line is None:
+          break
+        lines.append(line)
+    except Exception as e:
+      self._my_logger.error(f"Error: {e}")
+    return lines
+
   def _read_line(self, timeout=_default_timeout):
     if self._connected:
         try:
-          self._ser.timeout = timeout
-          # _read data from the serial port
-          response = self._ser.readline().decode().rstrip()
+          self._set_timeout(timeout)
+          # read complete lines from the serial port. when the timeout expires an empty line is
+          # returned and a partial line stays buffered, so it is not mistaken for a whole one
+          while True:
+            response = self._framer.next_line()
+            if response is not None:
+              break
+            if self._fill_rx_buffer() == 0:
+              response = ""
+              break
           # self._my_logger.debug(f"Received: {response}")
           return True, response
         except Exception as e:
@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from bg95_osi_layer import osi_layer
+
+############################################################################################################
+# class time_service: UTC timestamps from a host clock that is kept aligned with NTP, network or GNSS time
+############################################################################################################
+
+class time_service:
+  SOURCE_NTP = "NTP"
+  SOURCE_NETWORK = "NETWORK"
+  SOURCE_GNSS = "GNSS"
+
+  _DEFAULT_INTERVAL = 3600
+  # the CCLK and QNTP times have a resolution of one second
+  _CLOCK_RESOLUTION = 1.0
+  # offset samples kept for the drift estimate, the oldest is dropped first
+  _DRIFT_SAMPLES = 48
+  # the drift is only estimated over at least this long [sec], shorter spans are all resolution noise
+  _MIN_DRIFT_SPAN = 600
+  # a sync that disagrees with the current time by more than this [sec] restarts the drift estimate
+  _STEP_THRESHOLD = 5
+
+  _modem = None
+  _my_logger = None
+
+  def __init__(self, modem=None, logger=None, source=SOURCE_NTP, interval=_DEFAULT_INTERVAL, ntp_server=osi_layer.NTP_SERVER):
+    # source: SOURCE_NTP (AT+QNTP, sets the module clock as well) or SOURCE_NETWORK (module
+    # clock as set by the network with AT+CTZU), GNSS fixes can be added with add_reference()
+    self._modem = modem
+    self._my_logger = logger
+    self._source = source
+    self._interval = interval
+    self._ntp_server = ntp_server
+    # UTC = _utc + (monotonic - _monotonic) * (1 + _drift), None until the first sync
+    self._utc = None
+    self._monotonic = None
+    self._drift = 0.0
+    self._uncertainty = None
+    self._last_source = None
+    # (monotonic, UTC - monotonic) of every reference, for the drift of the host clock
+    self._samples = deque(maxlen=self._DRIFT_SAMPLES)
+    # timestamps never go backwards, after a reference that is behind they hold at the last result
+    # until the time caught up with it, i.e. for up to _STEP_THRESHOLD seconds
+    self._last_now = 0.0
+    self._lock = threading.Lock()
+    self._stop = threading.Event()
+    self._thread = None
+    self._stats = {"syncs": 0, "failures": 0, "steps": 0}
+    self._module_offset = None
+
+  def start(self):
+    self._stop.clear()
+    self._thread = threading.Thread(target=self._run, name="time-service", daemon=True)
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def synced(self) -> bool:
+    return self._utc is not None
+
+  def sync(self) -> bool:
+    # take a new reference from the modem, at bulk priority so it never delays application traffic
+    with self._modem.at_transaction(self._modem.AT_PRIO_BULK) as granted:
+      if not granted:
+        return False
+      before = time.monotonic()
+      if self._source == self.SOURCE_NTP:
+        status, cmd, response = self._modem.AT_QNTP(self._ntp_server)
+        status = status and (response["finresult"] == 0)
+        # the time in the URC is the time the NTP answer arrived, just before the URC was read
+        before = after = time.monotonic()
+      else:
+        status, cmd, response = self._modem.AT_CCLK_REQUEST()
+        after = time.monotonic()
+    if not (status and (response["datetime"] is not None)):
+      self._stats["failures"] += 1
+      self._my_logger.error(f"{cmd} FAILED! no time reference")
+      return False
+    # the clock was read somewhere between sending the command and receiving the answer
+    self.add_reference(response["datetime"].timestamp(), (before + after) / 2,
+                       self._source, (after - before) / 2 + self._CLOCK_RESOLUTION)
+    self._module_offset = self._measure_module_offset()
+    return True
+
+  def add_reference(self, utc, monotonic=None, source=SOURCE_GNSS, uncertainty=_CLOCK_RESOLUTION):
+    # UTC [sec since the epoch] that was valid at time.monotonic() value monotonic, e.g. the
+    # "time" of a GNSS fix and the monotonic time right after AT_QGPSLOC_REQUEST returned
+    if monotonic is None:
+      monotonic = time.monotonic()
+    with self._lock:
+      current = (time.time() - (time.monotonic() - monotonic)) if self._utc is None else self._at(monotonic)
+      if abs(utc - current) > self._STEP_THRESHOLD:
+        # e.g. the first sync of a host without RTC, or the host was suspended. the time steps
+        # instead of holding still until it caught up, and the old samples are useless
+        self._stats["steps"] += 1
+        self._samples.clear()
+        self._drift = 0.0
+        self._last_now = 0.0
+      self._samples.append((monotonic, utc - monotonic))
+      self._drift = self._estimate_drift()
+      self._utc, self._monotonic = utc, monotonic
+      self._uncertainty = uncertainty
+      self._last_source = source
+      self._stats["syncs"] += 1
+    self._my_logger.debug(f"time reference from {source}: {utc:.3f}, drift {self._drift * 1e6:.1f} ppm")
+
+  def now(self) -> float:
+    # UTC [sec since the epoch] without AT traffic, never smaller than an earlier result unless a
+    # reference stepped the time, see add_reference(). results repeat while a reference that was
+    # behind catches up with the last one. time.time() until the first sync
+    with self._lock:
+      now = time.time() if self._utc is None else self._at(time.monotonic())
+      if now < self._last_now:
+        now = self._last_now
+      self._last_now = now
+      return now
+
+  def now_datetime(self) -> datetime:
+    return datetime.fromtimestamp(self.now(), timezone.utc)
+
+  def stamp(self, monotonic) -> float:
+    # UTC of an earlier time.monotonic() value, e.g. for events recorded before the first sync
+    with self._lock:
+      if self._utc is None:
+        return time.time() - (time.monotonic() - monotonic)
+      return self._at(monotonic)
+
+  def host_offset(self):
+    # how far time.time() is ahead of UTC [sec], None before the first sync
+    if not self.synced():
+      return None
+    with self._lock:
+      return time.time() - self._at(time.monotonic())
+
+  def stats(self):
+    with self._lock:
+      stats = dict(self._stats)
+      stats.update({"source": self._last_source,
+                    "uncertainty_sec": self._uncertainty,
+                    "drift_ppm": self._drift * 1e6,
+                    "samples": len(self._samples)})
+    stats["host_offset_sec"] = self.host_offset()
+    # how far the module clock is ahead of UTC at the last sync, to the second
+    stats["module_offset_sec"] = self._module_offset
+    return stats
+
+  def _at(self, monotonic):
+    # caller holds _lock
+    return self._utc + (monotonic - self._monotonic) * (1 + self._drift)
+
+  def _estimate_drift(self):
+    # caller holds _lock. least squares slope of UTC - monotonic over monotonic, i.e. how much
+    # faster UTC runs than the host clock
+    samples = self._samples
+    if (len(samples) < 2) or (samples[-1][0] - samples[0][0] < self._MIN_DRIFT_SPAN):
+      return self._drift
+    t0 = samples[0][0]
+    mean_t = sum(t - t0 for t, offset in samples) / len(samples)
+    mean_offset = sum(offset for t, offset in samples) / len(samples)
+    variance = sum((t - t0 - mean_t) ** 2 for t, offset in samples)
+    return sum((t - t0 - mean_t) * (offset - mean_offset) for t, offset in samples) / variance
+
+  def _measure_module_offset(self):
+    # the module clock against the reference, e.g. after the network set it or when NTP is not used
+    status, cmd, response = self._modem.AT_CCLK_REQUEST()
+    if not (status and (response["datetime"] is not None)):
+      return None
+    return round(response["datetime"].timestamp() - self.now())
+
+  def _run(self):
+    if self._source == self.SOURCE_NETWORK:
+      self._modem.AT_CTZU(True)
+    while not self._stop.is_set():
+      start = time.monotonic()
+      self.sync()
+      self._stop.wait(max(0, self._interval - (time.monotonic() - start)))
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  my_bg95 = osi_layer(logging)
+  my_time = time_service(my_bg95, logging, interval=60)
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  my_bg95.resume_modem_network_connection()
+
+  my_time.start()
+  for i in range(10):
+    time.sleep(60)
+    logging.info(f"UTC {my_time.now_datetime().isoformat()}, {my_time.stats()}")
+  my_time.stop()
+
+  my_bg95.close_usb()
@@ -0,0 +1,215 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from bg95_osi_layer import osi_layer
+
+############################################################################################################
+# class transmit_scheduler: hold bulk uploads until the radio link is good, send urgent data right away
+############################################################################################################
+
+class transmit_scheduler:
+  PRIO_URGENT = 0
+  PRIO_NORMAL = 1
+  PRIO_BULK = 2
+
+  # bulk data waits until the link is at least this good
+  _DEFAULT_THRESHOLDS = {"rsrp": -105, "sinr": 3, "rsrq": -14}
+  _DEFAULT_DEADLINE = 3600
+  # messages this close to their deadline [sec] are sent whatever the link
+  _DEADLINE_MARGIN = 60
+  _MAX_ATTEMPTS = 3
+  _POLL_INTERVAL = 10
+  # link quality samples older than this [sec] are measured again
+  _LINK_TTL = 5
+
+  # energy model for the report: module current [mA] at good and at poor RSRP, at 3.8 V
+  _TX_CURRENT_GOOD = 100
+  _TX_CURRENT_POOR = 250
+  _RSRP_GOOD = -80
+  _RSRP_POOR = -120
+  _SUPPLY_VOLTAGE = 3.8
+
+  _modem = None
+  _my_logger = None
+
+  def __init__(self, modem=None, logger=None, sampler=None, thresholds=None, bulk_acts=None):
+    # sampler: optional radio_sampler, its recent medians are used instead of polling AT+QCSQ
+    # bulk_acts: access technologies bulk data may use, e.g. ["eMTC"], None allows all
+    self._modem = modem
+    self._my_logger = logger
+    self._sampler = sampler
+    self._thresholds = dict(self._DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+    self._bulk_acts = bulk_acts
+    self._queue = []
+    self._sequence = itertools.count()
+    self._lock = threading.Lock()
+    self._report = {"sent": 0, "failed": 0, "expired": 0, "retries": 0, "bytes": 0, "deferred_sec": 0.0,
+                    "airtime_sec": 0.0, "energy_mj": 0.0, "immediate_airtime_sec": 0.0, "immediate_energy_mj": 0.0}
+
+  def submit(self, url, body, priority=PRIO_BULK, deadline=_DEFAULT_DEADLINE):
+    # queue a POST, deadline in [sec] from now. returns the message, its "status" becomes
+    # "SENT", "FAILED" or "EXPIRED" and "response" holds the HTTP response once sent
+    message = {"url": url, "body": body, "priority": priority, "deadline": time.monotonic() + deadline,
+               "submitted": time.monotonic(), "link": self.link_quality(), "attempts": 0,
+               "status": "QUEUED", "response": None}
+    with self._lock:
+      heapq.heappush(self._queue, (priority, message["deadline"], next(self._sequence), message))
+    return message
+
+  def pending(self):
+    with self._lock:
+      return len(self._queue)
+
+  def poll(self):
+    # send every queued message the current link allows, returns the number sent
+    link = self.link_quality()
+    good = self.link_is_good(link)
+    with self._lock:
+      queued = [heapq.heappop(self._queue) for _ in range(len(self._queue))]
+
+    sent = 0
+    keep = []
+    now = time.monotonic()
+    for entry in queued:
+      priority, deadline, sequence, message = entry
+      if now > deadline:
+        message["status"] = "EXPIRED"
+        with self._lock:
+          self._report["expired"] += 1
+        self._my_logger.error(f"message to {message['url']} expired after {message['attempts']} attempts")
+        continue
+      urgent = (priority == self.PRIO_URGENT) or (deadline - now < self._DEADLINE_MARGIN)
+      if (link is None) and not urgent:
+        keep.append(entry)
+        continue
+      if (priority == self.PRIO_BULK) and not (good or urgent):
+        keep.append(entry)
+        continue
+      if self._send(message, link):
+        sent += 1
+      elif message["attempts"] < self._MAX_ATTEMPTS:
+        with self._lock:
+          self._report["retries"] += 1
+        keep.append(entry)
+      else:
+        message["status"] = "FAILED"
+        with self._lock:
+          self._report["failed"] += 1
+
+    with self._lock:
+      for entry in keep:
+        heapq.heappush(self._queue, entry)
+    return sent
+
+  def flush(self, max_wait=_DEFAULT_DEADLINE, interval=_POLL_INTERVAL) -> bool:
+    # poll until the queue is empty or max_wait [sec] has passed, returns True when empty
+    end = time.monotonic() + max_wait
+    while True:
+      self.poll()
+      if self.pending() == 0:
+        return True
+      if time.monotonic() + interval > end:
+        return False
+      time.sleep(interval)
+
+  def link_quality(self):
+    # current {"act", "band", "rsrp", "sinr", "rsrq"}, None without LTE service
+    status, cmd, nwinfo = self._modem.cached_request(self._modem.AT_QNWINFO)
+    if not status:
+      # e.g. '+QNWINFO: No Service', queued messages wait for coverage
+      return None
+    act = nwinfo["act"]
+    band = nwinfo["band"]
+    if (self._sampler is not None) and (len(self._sampler) > 0):
+      stats = {metric: self._sampler.stats(metric, self._LINK_TTL * 2) for metric in ["rsrp", "sinr", "rsrq"]}
+      if all(stat["count"] > 0 for stat in stats.values()):
+        return {"act": act, "band": band, **{metric: stat["p50"] for metric, stat in stats.items()}}
+    status, cmd, qcsq = self._modem.cached_request(self._modem.AT_QCSQ, self._LINK_TTL)
+    if not status or ("lte_rsrp" not in qcsq):
+      return None
+    return {"act": act, "band": band, "rsrp": qcsq["lte_rsrp"], "sinr": qcsq["lte_sinr"], "rsrq": qcsq["lte_rsrq"]}
+
+  def link_is_good(self, link) -> bool:
+    if link is None:
+      return False
+    if (self._bulk_acts is not None) and (link["act"] not in self._bulk_acts):
+      return False
+    return all(link[metric] >= threshold for metric, threshold in self._thresholds.items())
+
+  def report(self):
+    # what deferring gained over sending every message at the link of its submit time. airtime
+    # at submit time is estimated from the measured airtime, scaled by the Shannon capacity of
+    # both SINRs, energy from airtime and an RSRP dependent module current
+    with self._lock:
+      report = dict(self._report)
+    if report["airtime_sec"] > 0:
+      report["throughput_bytes_per_sec"] = report["bytes"] / report["airtime_sec"]
+    if report["immediate_airtime_sec"] > 0:
+      report["immediate_throughput_bytes_per_sec"] = report["bytes"] / report["immediate_airtime_sec"]
+    if report["immediate_energy_mj"] > 0:
+      report["energy_saved_pct"] = 100 * (1 - report["energy_mj"] / report["immediate_energy_mj"])
+    if report["sent"] > 0:
+      report["deferred_sec"] = report["deferred_sec"] / report["sent"]
+    return report
+
+  def _send(self, message, link) -> bool:
+    message["attempts"] += 1
+    start = time.monotonic()
+    if message["url"].lower().startswith("https://"):
+      status, response = self._modem.HTTPS_POST(message["url"], message["body"])
+    else:
+      status, response = self._modem.HTTP_POST(message["url"], message["body"])
+    airtime = time.monotonic() - start
+    if not status:
+      self._my_logger.error(f"POST to {message['url']} FAILED! attempt {message['attempts']}")
+      return False
+
+    message["status"] = "SENT"
+    message["response"] = response
+    immediate = message["link"] or link
+    with self._lock:
+      self._report["sent"] += 1
+      self._report["bytes"] += len(message["body"])
+      self._report["deferred_sec"] += start - message["submitted"]
+      self._report["airtime_sec"] += airtime
+      if (link is not None) and (immediate is not None):
+        immediate_airtime = airtime * self._capacity(link["sinr"]) / self._capacity(immediate["sinr"])
+        self._report["energy_mj"] += self._energy(airtime, link["rsrp"])
+        self._report["immediate_airtime_sec"] += immediate_airtime
+        self._report["immediate_energy_mj"] += self._energy(immediate_airtime, immediate["rsrp"])
+    return True
+
+  @staticmethod
+  def _capacity(sinr):
+    # Shannon capacity in bit/s/Hz for a SINR in [dB]
+    return math.log2(1 + 10 ** (sinr / 10))
+
+  def _energy(self, airtime, rsrp):
+    # [mJ], current interpolated linearly between good and poor RSRP
+    fraction = min(1, max(0, (self._RSRP_GOOD - rsrp) / (self._RSRP_GOOD - self._RSRP_POOR)))
+    current = self._TX_CURRENT_GOOD + fraction * (self._TX_CURRENT_POOR - self._TX_CURRENT_GOOD)
+    return airtime * current * self._SUPPLY_VOLTAGE
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  my_bg95 = osi_layer(logging)
+  my_transmitter = transmit_scheduler(my_bg95, logging)
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  my_bg95.resume_modem_network_connection()
+
+  my_transmitter.submit("http://postman-echo.com/post/", "alarm=1", transmit_scheduler.PRIO_URGENT)
+  for i in range(5):
+    my_transmitter.submit("http://postman-echo.com/post/", f"log={i}", transmit_scheduler.PRIO_BULK, deadline=600)
+  my_transmitter.flush(max_wait=600)
+  logging.info(f"transmit report: {my_transmitter.report()}")
+
+  my_bg95.close_usb()
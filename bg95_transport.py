@@ -0,0 +1,243 @@
+import os
+import select
+import threading
+import time
+import serial
+
+# pty support is unix only
+try:
+  import fcntl
+  import termios
+  import tty
+except ImportError:
+  fcntl = None
+
+############################################################################################################
+# class transport: pyserial compatible byte stream under bg95_serial, with latency/throughput counters
+############################################################################################################
+
+class transport:
+  # subclasses implement _write(data), _read(size, timeout) returning what arrived within timeout
+  # (b'' when nothing did, None waits forever), _available() and _close()
+
+  def __init__(self, name="", timeout=None, baudrate=115200, rtscts=False):
+    self.name = name
+    self.timeout = timeout
+    self.baudrate = baudrate
+    self.rtscts = rtscts
+    self.is_open = True
+    self._stats_lock = threading.Lock()
+    self._last_write = None
+    self.reset_stats()
+
+  @property
+  def in_waiting(self):
+    return self._available()
+
+  def write(self, data):
+    start = time.monotonic()
+    self._write(bytes(data))
+    end = time.monotonic()
+    with self._stats_lock:
+      self._stats["writes"] += 1
+      self._stats["bytes_written"] += len(data)
+      self._stats["write_sec"] += end - start
+      # the next received byte is counted as the answer to this write
+      self._last_write = end
+    return len(data)
+
+  def read_deadline(self, size, deadline):
+    # read up to size bytes, fewer when the time.monotonic() deadline passes first, inf waits forever
+    data = b''
+    start = time.monotonic()
+    while len(data) < size:
+      timeout = None if deadline == float("inf") else max(0, deadline - time.monotonic())
+      chunk = self._read(size - len(data), timeout)
+      if chunk:
+        self._count_read(chunk, start)
+        data += chunk
+      elif (time.monotonic() >= deadline) or not self.is_open:
+        break
+    return data
+
+  def read(self, size=1):
+    # same semantics as pyserial: block until size bytes arrived or the timeout expires
+    return self.read_deadline(size, float("inf") if self.timeout is None else time.monotonic() + self.timeout)
+
+  def readinto(self, buffer):
+    data = self.read(len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
+
+  def readline(self):
+    # returns a partial line when the timeout expires
+    deadline = float("inf") if self.timeout is None else time.monotonic() + self.timeout
+    line = b''
+    while not line.endswith(b'\n'):
+      data = self.read_deadline(1, deadline)
+      if not data:
+        break
+      line += data
+    return line
+
+  def reset_input_buffer(self):
+    while self._available() > 0:
+      self._read(self._available(), 0)
+
+  def close(self):
+    if self.is_open:
+      self.is_open = False
+      self._close()
+
+  def stats(self):
+    # latency: from a write to the first byte received after it, throughput: bytes per second of
+    # time spent in write() resp. in reads that returned data
+    with self._stats_lock:
+      stats = dict(self._stats)
+    if stats["latency_count"] > 0:
+      stats["latency_ms_avg"] = 1000 * stats["latency_sec"] / stats["latency_count"]
+    if stats["write_sec"] > 0:
+      stats["tx_bytes_per_sec"] = stats["bytes_written"] / stats["write_sec"]
+    if stats["read_sec"] > 0:
+      stats["rx_bytes_per_sec"] = stats["bytes_read"] / stats["read_sec"]
+    return stats
+
+  def reset_stats(self):
+    with self._stats_lock:
+      self._stats = {"writes": 0, "bytes_written": 0, "write_sec": 0.0, "reads": 0, "bytes_read": 0, "read_sec": 0.0,
+                     "latency_count": 0, "latency_sec": 0.0, "latency_ms_max": 0.0}
+
+  def _count_read(self, data, start):
+    now = time.monotonic()
+    with self._stats_lock:
+      self._stats["reads"] += 1
+      self._stats["bytes_read"] += len(data)
+      self._stats["read_sec"] += now - start
+      if self._last_write is not None:
+        latency = now - self._last_write
+        self._stats["latency_count"] += 1
+        self._stats["latency_sec"] += latency
+        self._stats["latency_ms_max"] = max(self._stats["latency_ms_max"], 1000 * latency)
+        self._last_write = None
+
+############################################################################################################
+# class serial_transport: pyserial port, a device name or any pyserial URL, e.g. socket:// or rfc2217://
+############################################################################################################
+
+class serial_transport(transport):
+  _port = None
+  # port timeout of a read that has to wait [sec], read_deadline() loops until its deadline. the
+  # fixed value keeps the port timeout, a system call on most platforms, from changing with the
+  # time left of every read
+  _READ_INTERVAL = 0.1
+
+  def __init__(self, url="COM11", timeout=None, baudrate=115200, rtscts=False):
+    # opens the port, raises serial.SerialException when that fails
+    self._port = serial.serial_for_url(url, baudrate=baudrate, rtscts=rtscts, timeout=0)
+    self._port_timeout = 0
+    super().__init__(url, timeout, baudrate, rtscts)
+
+  def __setattr__(self, name, value):
+    # baud rate and flow control go to the port, RFC 2217 forwards them to the remote UART
+    if (name in ["baudrate", "rtscts"]) and (self._port is not None):
+      setattr(self._port, name, value)
+    super().__setattr__(name, value)
+
+  def _write(self, data):
+    self._port.write(data)
+
+  def _read(self, size, timeout):
+    # the port timeout only matters when nothing is waiting. it only changes in the last
+    # _READ_INTERVAL before a deadline, and for reads that do not wait at all
+    available = self._port.in_waiting
+    if available == 0:
+      timeout = self._READ_INTERVAL if timeout is None else min(timeout, self._READ_INTERVAL)
+      if timeout != self._port_timeout:
+        self._port.timeout = timeout
+        self._port_timeout = timeout
+    return self._port.read(min(size, max(1, available)))
+
+  def _available(self):
+    return self._port.in_waiting
+
+  def _close(self):
+    self._port.close()
+
+############################################################################################################
+# class pty_transport: master side of a new pseudo terminal, a simulator or bridge opens peer_name
+############################################################################################################
+
+class pty_transport(transport):
+
+  def __init__(self, timeout=None, baudrate=115200, rtscts=False):
+    if fcntl is None:
+      raise OSError("pseudo terminals are not supported on this platform")
+    self._master, self._slave = os.openpty()
+    tty.setraw(self._slave)
+    self.peer_name = os.ttyname(self._slave)
+    super().__init__(self.peer_name, timeout, baudrate, rtscts)
+
+  def _write(self, data):
+    view = memoryview(data)
+    while len(view) > 0:
+      select.select([], [self._master], [])
+      view = view[os.write(self._master, view):]
+
+  def _read(self, size, timeout):
+    ready, _, _ = select.select([self._master], [], [], timeout)
+    return os.read(self._master, size) if ready else b''
+
+  def _available(self):
+    return int.from_bytes(fcntl.ioctl(self._master, termios.FIONREAD, bytes(4)), "little")
+
+  def _close(self):
+    os.close(self._master)
+    os.close(self._slave)
+
+############################################################################################################
+# class loopback_transport: in memory, for running the HAL against a simulated modem
+############################################################################################################
+
+class loopback_transport(transport):
+
+  def __init__(self, timeout=None, baudrate=115200, rtscts=False, responder=None):
+    # responder(data) returns the bytes the modem sends back for written data, without one the
+    # written data is echoed. feed() adds unsolicited data, e.g. URCs
+    self._rx = bytearray()
+    self._rx_cond = threading.Condition()
+    self._responder = responder
+    super().__init__("loopback://", timeout, baudrate, rtscts)
+
+  def feed(self, data):
+    with self._rx_cond:
+      self._rx += data
+      self._rx_cond.notify_all()
+
+  def _write(self, data):
+    response = data if self._responder is None else self._responder(data)
+    if response:
+      self.feed(response)
+
+  def _read(self, size, timeout):
+    with self._rx_cond:
+      self._rx_cond.wait_for(lambda: (len(self._rx) > 0) or not self.is_open, timeout)
+      data = bytes(self._rx[:size])
+      del self._rx[:size]
+      return data
+
+  def _available(self):
+    with self._rx_cond:
+      return len(self._rx)
+
+  def _close(self):
+    with self._rx_cond:
+      self._rx_cond.notify_all()
+
+def open_transport(url="COM11", timeout=None, baudrate=115200, rtscts=False) -> transport:
+  # "loopback://" and "pty://" are handled here, everything else is passed to pyserial, which
+  # supports device names as well as socket://host:port and rfc2217://host:port bridges
+  if url.startswith("loopback://"):
+    return loopback_transport(timeout, baudrate, rtscts)
+  if url.startswith("pty://"):
+    return pty_transport(timeout, baudrate, rtscts)
+  return serial_transport(url, timeout, baudrate, rtscts)
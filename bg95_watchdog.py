@@ -0,0 +1,195 @@
+import logging
+import time
+from collections import deque
+from bg95_osi_layer import osi_layer
+
+############################################################################################################
+# class health_watchdog: detect a wedged modem and recover it with the cheapest step that works
+############################################################################################################
+
+class health_watchdog:
+  STEP_RESYNC = "RESYNC"
+  STEP_ECHO = "ECHO"
+  STEP_PDP = "PDP"
+  STEP_CFUN = "CFUN"
+  STEP_POWERDOWN = "POWERDOWN"
+  # cheapest first, every step is verified before escalating to the next
+  LADDER = [STEP_RESYNC, STEP_ECHO, STEP_PDP, STEP_CFUN, STEP_POWERDOWN]
+
+  # recover after this many consecutive failed commands
+  _FAILURE_THRESHOLD = 3
+  # ... or when this many consecutive commands took longer than the latency threshold [sec]
+  _LATENCY_THRESHOLD = 10
+  _LATENCY_SAMPLES = 100
+  _RESYNC_ATTEMPTS = 3
+  _RESYNC_TIMEOUT = 1
+  # the module needs a while to shut down and come back on USB after AT+POWD
+  _POWERDOWN_WAIT = 10
+  _REOPEN_TIMEOUT = 60
+  _REOPEN_INTERVAL = 2
+  # no answer from the modem: nothing within the timeout, or the serial port failed
+  _LINK_ERRORS = {osi_layer._SERIAL_TIMEOUT_ERROR, osi_layer._SERIAL_READ_ERROR}
+  # commands that only succeed with an active PDP context, the context is verified after a
+  # recovery once the application used one
+  _PDP_COMMANDS = ("AT+QIACT=", "AT+QIOPEN", "AT+QHTTPGET", "AT+QHTTPPOST", "AT+QMTOPEN", "AT+QSSLOPEN")
+
+  _modem = None
+  _my_logger = None
+
+  def __init__(self, modem=None, logger=None, failure_threshold=_FAILURE_THRESHOLD, latency_threshold=_LATENCY_THRESHOLD, ladder=None):
+    # ladder: the recovery steps to use, in order, default LADDER
+    self._modem = modem
+    self._my_logger = logger
+    self._failure_threshold = failure_threshold
+    self._latency_threshold = latency_threshold
+    self._ladder = list(self.LADDER if ladder is None else ladder)
+    self._consecutive_failures = 0
+    self._consecutive_slow = 0
+    self._latencies = deque(maxlen=self._LATENCY_SAMPLES)
+    self._recovering = False
+    self._pdp_used = False
+    # per step: attempts, successes and the time to recover in [sec] when the step succeeded
+    self._recoveries = {step: {"attempts": 0, "successes": 0, "recover_sec": []} for step in self.LADDER}
+    self._failed_recoveries = 0
+    self._steps = {self.STEP_RESYNC: self._resync, self.STEP_ECHO: self._reset_echo, self.STEP_PDP: self._reactivate_pdp,
+                   self.STEP_CFUN: self._cycle_cfun, self.STEP_POWERDOWN: self._power_cycle}
+    self._modem.register_cmd_observer(self._on_command)
+
+  def healthy(self) -> bool:
+    return (self._consecutive_failures < self._failure_threshold) and (self._consecutive_slow < self._failure_threshold)
+
+  def check(self) -> bool:
+    # recover when needed, returns whether the modem is usable. call it e.g. once per main loop
+    if self.healthy():
+      return True
+    return self.recover()
+
+  def recover(self) -> bool:
+    # climb the ladder until a step brings the modem back, the time to recover of a step counts
+    # from the start of the recovery, so it includes the cheaper steps that failed before it
+    self._recovering = True
+    start = time.monotonic()
+    try:
+      for step in self._ladder:
+        self._recoveries[step]["attempts"] += 1
+        self._my_logger.info(f"watchdog: trying recovery step {step}")
+        if self._steps[step]() and self._verify():
+          recover_sec = time.monotonic() - start
+          self._recoveries[step]["successes"] += 1
+          self._recoveries[step]["recover_sec"].append(recover_sec)
+          self._my_logger.info(f"watchdog: recovered by {step} after {recover_sec:.3f} seconds")
+          self._consecutive_failures = 0
+          self._consecutive_slow = 0
+          return True
+    finally:
+      self._recovering = False
+    self._failed_recoveries += 1
+    self._my_logger.error(f"watchdog: recovery FAILED after {time.monotonic() - start:.3f} seconds")
+    return False
+
+  def stats(self):
+    # command latency in [sec] and time to recover per step, to tune the ladder
+    latencies = sorted(self._latencies)
+    stats = {"consecutive_failures": self._consecutive_failures,
+             "failed_recoveries": self._failed_recoveries,
+             "latency": {"count": len(latencies),
+                         "p50": latencies[len(latencies) // 2] if latencies else 0,
+                         "max": latencies[-1] if latencies else 0},
+             "steps": {}}
+    for step, recoveries in self._recoveries.items():
+      recover_sec = recoveries["recover_sec"]
+      stats["steps"][step] = {"attempts": recoveries["attempts"],
+                              "successes": recoveries["successes"],
+                              "mean": sum(recover_sec) / len(recover_sec) if recover_sec else 0,
+                              "max": max(recover_sec) if recover_sec else 0}
+    return stats
+
+  def _on_command(self, cmd, at_status, seconds, cmd_result):
+    if self._recovering:
+      return
+    self._latencies.append(seconds)
+    self._consecutive_slow = self._consecutive_slow + 1 if seconds > self._latency_threshold else 0
+    if at_status and cmd.startswith(self._PDP_COMMANDS):
+      self._pdp_used = True
+    elif at_status and cmd.startswith("AT+QIDEACT"):
+      self._pdp_used = False
+    if at_status or not self._is_link_failure(cmd_result):
+      self._consecutive_failures = 0
+    else:
+      self._consecutive_failures += 1
+
+  @classmethod
+  def _is_link_failure(cls, cmd_result):
+    # no answer from the modem, or a TCP/IP or HTTP(S) network error. an ERROR or another CME
+    # error is an answer to a bad request, and a command that did not get the AT channel in time
+    # was never sent, both say nothing about the health of the modem
+    codes = cmd_result.get("CME_ERROR_CODE", set())
+    return any((code in cls._LINK_ERRORS) or (550 <= code <= 564) or (701 <= code <= 730) for code in codes)
+
+  def _verify(self) -> bool:
+    # the modem answers, and has an active PDP context again when the application used one. a
+    # step that only brings back the AT channel escalates to the next one when the context was
+    # lost as well, without a context (e.g. GNSS only) the AT channel is enough
+    return self._modem.AT()[0] and ((not self._pdp_used) or self._pdp_active())
+
+  def _pdp_active(self) -> bool:
+    status, cmd, response = self._modem.AT_QIACT_REQUEST()
+    return status and (response["result"] == "OK") and (response["context_state"] == 1)
+
+  def _resync(self) -> bool:
+    # drop whatever is half received and see whether the modem answers a plain AT again
+    for attempt in range(self._RESYNC_ATTEMPTS):
+      self._modem.reset_input()
+      status, cmd, response = self._modem.AT()
+      if status:
+        return True
+      time.sleep(self._RESYNC_TIMEOUT)
+    return False
+
+  def _reset_echo(self) -> bool:
+    # back to the echo mode the application asked for, e.g. after the modem was reset by something else
+    status, cmd, response = self._modem.ATE(self._modem._echo_requested)
+    return status
+
+  def _reactivate_pdp(self) -> bool:
+    self._modem.AT_QIDEACT()
+    status, cmd, response = self._modem.AT_QIACT()
+    return status
+
+  def _cycle_cfun(self) -> bool:
+    # connect_modem_to_network() calls reset_state() after CFUN=1, the clients set up again
+    return self._modem.connect_modem_to_network() and self._modem.resume_modem_network_connection()
+
+  def _power_cycle(self) -> bool:
+    # power down, then reopen the serial port once the module is back on USB. open_usb() calls
+    # reset_state(), the clients set up again
+    self._modem.AT_POWERDOWN()
+    self._modem.close_usb()
+    time.sleep(self._POWERDOWN_WAIT)
+    end = time.monotonic() + self._REOPEN_TIMEOUT
+    while not self._modem.open_usb():
+      if time.monotonic() > end:
+        return False
+      time.sleep(self._REOPEN_INTERVAL)
+    return self._resync() and self._reset_echo() and self._modem.resume_modem_network_connection()
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  my_bg95 = osi_layer(logging)
+  my_watchdog = health_watchdog(my_bg95, logging)
+
+  if not my_bg95.open_usb():
+    print("FAILED TO OPEN USB CONNECTION")
+    exit()
+
+  my_bg95.resume_modem_network_connection()
+
+  for i in range(10):
+    if my_watchdog.check():
+      my_bg95.HTTP_GET("http://postman-echo.com/get/?foo1=bar1")
+    time.sleep(1)
+  logging.info(f"watchdog stats: {my_watchdog.stats()}")
+
+  my_bg95.close_usb()
@@ -0,0 +1,236 @@
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from bg95_osi_layer import osi_layer
+
+############################################################################################################
+# worker process: owns one or more modems and serves requests from its request queue
+############################################################################################################
+
+def _modem_worker(ports, requests, responses, log_level):
+  # runs in its own process, so regex parsing and payload handling do not share a GIL with other modems
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(processName)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=log_level)
+  modems = {}
+  for port in ports:
+    modem = osi_layer(logging, port=port)
+    if modem.open_usb() and modem.resume_modem_network_connection():
+      modems[port] = modem
+    else:
+      logging.error(f"worker could not bring up modem on {port}")
+  responses.put((None, "ready", list(modems)))
+
+  while True:
+    request = requests.get()
+    if request is None:
+      break
+    request_id, port, method, args = request
+    modem = modems.get(port)
+    if modem is None:
+      responses.put((request_id, False, None))
+      continue
+    try:
+      status, response = getattr(modem, method)(*args)
+    except Exception as e:
+      logging.error(f"{method} on {port} raised {e}")
+      status, response = False, None
+    responses.put((request_id, status, response))
+
+  for modem in modems.values():
+    modem.close_usb()
+
+############################################################################################################
+# class modem_supervisor: starts, watches and restarts the worker processes
+############################################################################################################
+
+class modem_supervisor:
+  # methods a client may call on a worker's osi_layer
+  _ALLOWED_METHODS = ["HTTP_GET", "HTTP_POST", "HTTPS_GET", "HTTPS_POST"]
+  _START_TIMEOUT = 300
+  _REQUEST_DEADLINE = 300
+  _WATCH_INTERVAL = 1
+
+  _my_logger = None
+
+  def __init__(self, logger=None, shards=(), request_deadline=_REQUEST_DEADLINE, log_level=logging.INFO):
+    # shards: list of port lists, each list is driven by one worker process
+    self._my_logger = logger
+    self._shards = [list(ports) for ports in shards]
+    self._request_deadline = request_deadline
+    self._log_level = log_level
+    self._context = multiprocessing.get_context("spawn")
+    self._workers = [None] * len(self._shards)
+    self._port_to_worker = {port: index for index, ports in enumerate(self._shards) for port in ports}
+    self._request_ids = itertools.count()
+    self._pending = {}
+    self._lock = threading.Lock()
+    self._worker_up = threading.Condition(self._lock)
+    self._running = False
+    self._restarts = 0
+
+  def start(self) -> bool:
+    self._running = True
+    status = all([self._start_worker(index) for index in range(len(self._shards))])
+    self._watchdog = threading.Thread(target=self._watch, name="modem-supervisor", daemon=True)
+    self._watchdog.start()
+    return status
+
+  def stop(self):
+    self._running = False
+    for index in range(len(self._workers)):
+      self._stop_worker(index, graceful=True)
+
+  def client(self, port):
+    return modem_client(self, port)
+
+  def stats(self):
+    with self._lock:
+      return {"workers": len(self._workers),
+              "alive": sum(1 for worker in self._workers if worker and worker["process"].is_alive()),
+              "pending": len(self._pending),
+              "restarts": self._restarts}
+
+  def request(self, port, method, args, deadline=None):
+    # run method(*args) on the modem behind port, returns (status, response) like osi_layer
+    if method not in self._ALLOWED_METHODS:
+      self._my_logger.error(f"{method} is not available through the supervisor")
+      return False, None
+    index = self._port_to_worker.get(port)
+    if index is None:
+      self._my_logger.error(f"no worker for port {port}")
+      return False, None
+
+    request_id = next(self._request_ids)
+    done = threading.Event()
+    deadline = self._request_deadline if deadline is None else deadline
+    with self._lock:
+      # a worker that is being restarted gets until the request deadline to come back
+      if not self._worker_up.wait_for(lambda: self._workers[index] is not None, deadline):
+        self._my_logger.error(f"worker for port {port} not available")
+        return False, None
+      worker = self._workers[index]
+      self._pending[request_id] = {"index": index, "deadline": time.monotonic() + deadline, "done": done, "result": (False, None)}
+      worker["requests"].put((request_id, port, method, args))
+    done.wait()
+    with self._lock:
+      return self._pending.pop(request_id)["result"]
+
+  def _start_worker(self, index) -> bool:
+    requests = self._context.Queue()
+    responses = self._context.Queue()
+    process = self._context.Process(target=_modem_worker, name=f"bg95-worker-{index}",
+                                    args=(self._shards[index], requests, responses, self._log_level), daemon=True)
+    process.start()
+    try:
+      request_id, ready, ports = responses.get(timeout=self._START_TIMEOUT)
+    except queue.Empty:
+      self._my_logger.error(f"worker {index} did not start within {self._START_TIMEOUT} seconds")
+      process.kill()
+      return False
+    worker = {"process": process, "requests": requests, "responses": responses}
+    worker["reader"] = threading.Thread(target=self._collect, args=(worker,), name=f"bg95-worker-{index}-reader", daemon=True)
+    worker["reader"].start()
+    with self._lock:
+      self._workers[index] = worker
+      self._worker_up.notify_all()
+    self._my_logger.info(f"worker {index} up with modems {ports}")
+    return True
+
+  def _stop_worker(self, index, graceful=False):
+    with self._lock:
+      worker = self._workers[index]
+      self._workers[index] = None
+    if worker is None:
+      return
+    if graceful:
+      worker["requests"].put(None)
+      worker["process"].join(timeout=10)
+    if worker["process"].is_alive():
+      worker["process"].kill()
+      worker["process"].join()
+    # stop the reader of this worker
+    worker["responses"].put(None)
+    self._fail_pending(index)
+
+  def _collect(self, worker):
+    while True:
+      try:
+        message = worker["responses"].get()
+      except (EOFError, OSError):
+        return
+      if message is None:
+        return
+      request_id, status, response = message
+      with self._lock:
+        pending = self._pending.get(request_id)
+        if pending is not None:
+          pending["result"] = (status, response)
+          pending["done"].set()
+
+  def _fail_pending(self, index):
+    with self._lock:
+      for pending in self._pending.values():
+        if (pending["index"] == index) and not pending["done"].is_set():
+          pending["done"].set()
+
+  def _watch(self):
+    # restart workers that died or hold a request past its deadline, e.g. in a wedged readline()
+    while self._running:
+      time.sleep(self._WATCH_INTERVAL)
+      now = time.monotonic()
+      for index in range(len(self._workers)):
+        with self._lock:
+          worker = self._workers[index]
+          overdue = any((pending["index"] == index) and not pending["done"].is_set() and (pending["deadline"] < now)
+                        for pending in self._pending.values())
+        if not self._running:
+          return
+        if (worker is not None) and worker["process"].is_alive() and not overdue:
+          continue
+        self._my_logger.error(f"worker {index} {'hangs past its deadline' if overdue else 'is not running'}, restarting")
+        self._stop_worker(index)
+        with self._lock:
+          self._restarts += 1
+        self._start_worker(index)
+
+############################################################################################################
+# class modem_client: the osi_layer HTTP API for one modem, executed in its worker process
+############################################################################################################
+
+class modem_client:
+  def __init__(self, supervisor, port):
+    self._supervisor = supervisor
+    self._port = port
+
+  def HTTP_GET(self, url, deadline=None):
+    return self._supervisor.request(self._port, "HTTP_GET", (url,), deadline)
+
+  def HTTP_POST(self, url, body, deadline=None):
+    return self._supervisor.request(self._port, "HTTP_POST", (url, body), deadline)
+
+  def HTTPS_GET(self, url, deadline=None):
+    return self._supervisor.request(self._port, "HTTPS_GET", (url,), deadline)
+
+  def HTTPS_POST(self, url, body, deadline=None):
+    return self._supervisor.request(self._port, "HTTPS_POST", (url, body), deadline)
+
+if __name__ == "__main__":
+  # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
+  logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
+
+  # one worker process per modem here, pass several ports per list to shard modems over fewer processes
+  my_supervisor = modem_supervisor(logging, shards=[["COM11"], ["COM12"]])
+  if not my_supervisor.start():
+    print("FAILED TO START ALL MODEM WORKERS")
+
+  for port in ["COM11", "COM12"]:
+    status, response = my_supervisor.client(port).HTTP_GET("http://postman-echo.com/get/?foo1=bar1")
+    if status:
+      logging.info(f"HTTP_GET via {port} PASSED! with response:\n{response["result"]}\n===payload start===\n{response["payload"]}\n===payload end===")
+    else:
+      logging.error(f"HTTP_GET via {port} FAILED!")
+
+  logging.info(f"supervisor stats: {my_supervisor.stats()}")
+  my_supervisor.stop()
@@ -2,6 +2,7 @@ import logging
 import time
 from timer import timer
 from bg95_osi_layer import osi_layer
+from bg95_watchdog import health_watchdog
 
 # https://realpython.com/python-logging/ ; levels are DEBUG, INFO, WARNING, ERROR, CRITICAL
 logging.basicConfig(format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S', level=logging.INFO)
@@ -58,6 +59,7 @@ def send_message_via_https_post():
 
 if __name__ == "__main__":
   my_timer = timer(logging)
+  my_watchdog = health_watchdog(my_bg95, logging)
 
   logging.debug("\n******************************")
 
@@ -65,11 +67,19 @@ if __name__ == "__main__":
     print("FAILED TO OPEN USB CONNECTION")
     exit()
 
-  my_bg95.connect_modem_to_network()
+  # echo off saves a received line per command
+  my_bg95.ATE(False)
+
+  my_bg95.resume_modem_network_connection()
 
   for i in range(365):
     logging.info(f"***** Loop {i}")
 
+    # recover a wedged modem instead of failing every request until the end of the run
+    if not my_watchdog.check():
+      time.sleep(10)
+      continue
+
     my_bg95.request_network_info()
 
     send_message_via_http_get()
@@ -81,6 +91,8 @@ if __name__ == "__main__":
     send_message_via_https_post()
     time.sleep(10) 
 
+  logging.info(f"Watchdog: {my_watchdog.stats()}")
+
   my_bg95.disconnect_modem_from_network()
 
   my_bg95.close_usb()
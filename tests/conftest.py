@@ -0,0 +1,160 @@
+import logging
+import os
+import re
+import sys
+
+# the modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from bg95_atcmds import bg95_atcmds
+from bg95_transport import loopback_transport
+
+############################################################################################################
+# class modem_sim: answers the AT commands written to a loopback_transport like a BG95
+############################################################################################################
+
+class modem_sim:
+  # (regex, response) pairs, the first regex that matches the whole command wins. a response is
+  # a string, bytes or callable(match) returning one, None sends nothing but the echo
+  RESPONSES = [
+    (r'AT', '\r\nOK\r\n'),
+  ]
+
+  def __init__(self):
+    self.responses = list(self.RESPONSES)
+    self.commands = []
+    # ATE1 after power on, ATE0/ATE1 switch it after their own echo
+    self.echo = True
+    self.respond(r'ATE([01])', lambda match: setattr(self, "echo", match.group(1) == "1") or '\r\nOK\r\n')
+    self._receive = None
+    self.port = loopback_transport(responder=self._respond)
+
+  def respond(self, regex, response):
+    # answer commands matching regex with response, before the earlier rules
+    self.responses.insert(0, (regex, response))
+
+  def urc(self, line):
+    self.port.feed(f'\r\n{line}\r\n'.encode())
+
+  def receive(self, size, handler):
+    # the next size bytes written are data after a CONNECT, not a command. handler(data) returns
+    # the response to them
+    self._receive = (size, bytearray(), handler)
+
+  def _respond(self, data):
+    if self._receive is not None:
+      size, received, handler = self._receive
+      received += data
+      if len(received) < size:
+        return b''
+      self._receive = None
+      response = handler(bytes(received))
+      return response if isinstance(response, bytes) else response.encode()
+    command = data.decode().rstrip('\r')
+    self.commands.append(command)
+    echo = (command + '\r\n').encode() if self.echo else b''
+    response = '\r\nERROR\r\n'
+    for regex, answer in self.responses:
+      match = re.fullmatch(regex, command)
+      if match:
+        response = answer(match) if callable(answer) else answer
+        break
+    response = response or ''
+    return echo + (response if isinstance(response, bytes) else response.encode())
+
+############################################################################################################
+# class ufs_sim: the UFS file system of a modem_sim
+############################################################################################################
+
+class ufs_sim:
+  # the modem file system behind the UFS commands of a modem_sim. corrupt(data) models what a bad
+  # UART does to the data of a QFWRITE
+  def __init__(self, sim):
+    self.files = {}
+    self.handles = {}
+    self.corrupt = lambda data: data
+    self.written = []
+    self._sim = sim
+    sim.respond(r'AT\+QFLST="(.+)"', self._list)
+    sim.respond(r'AT\+QFDEL="(.+)"', self._delete)
+    sim.respond(r'AT\+QFUPL="(.+)",(\d+),\d+', self._upload)
+    sim.respond(r'AT\+QFDWL="(.+)"', self._download)
+    sim.respond(r'AT\+QFOPEN="(.+)",(\d)', self._open)
+    sim.respond(r'AT\+QFSEEK=(\d+),(\d+),0', self._seek)
+    sim.respond(r'AT\+QFWRITE=(\d+),(\d+),\d+', self._write)
+    sim.respond(r'AT\+QFREAD=(\d+),(\d+)', self._read)
+    sim.respond(r'AT\+QFCLOSE=(\d+)', lambda match: self.handles.pop(int(match.group(1))) and '\r\nOK\r\n')
+
+  def _list(self, match):
+    name = match.group(1)
+    if name not in self.files:
+      return '\r\n+CME ERROR: 405\r\n'
+    return f'\r\n+QFLST: "{name}",{len(self.files[name])}\r\n\r\nOK\r\n'
+
+  def _delete(self, match):
+    if self.files.pop(match.group(1), None) is None:
+      return '\r\n+CME ERROR: 405\r\n'
+    return '\r\nOK\r\n'
+
+  def _upload(self, match):
+    name = match.group(1)
+
+    def store(data):
+      self.files[name] = bytearray(data)
+      return f'\r\n+QFUPL: {len(data)},{bg95_atcmds.ufs_checksum(data):x}\r\n\r\nOK\r\n'
+
+    self._sim.receive(int(match.group(2)), store)
+    return '\r\nCONNECT\r\n'
+
+  def _download(self, match):
+    data = bytes(self.files[match.group(1)])
+    return b'\r\nCONNECT\r\n' + data + f'\r\n+QFDWL: {len(data)},{bg95_atcmds.ufs_checksum(data):x}\r\n\r\nOK\r\n'.encode()
+
+  def _open(self, match):
+    name, mode = match.group(1), int(match.group(2))
+    if (mode == 1) or (name not in self.files):
+      self.files[name] = bytearray()
+    handle = 100 + len(self.handles)
+    self.handles[handle] = [name, 0]
+    return f'\r\n+QFOPEN: {handle}\r\n\r\nOK\r\n'
+
+  def _seek(self, match):
+    self.handles[int(match.group(1))][1] = int(match.group(2))
+    return '\r\nOK\r\n'
+
+  def _write(self, match):
+    handle = self.handles[int(match.group(1))]
+
+    def write(data):
+      data = self.corrupt(data)
+      self.written.append(len(data))
+      file = self.files[handle[0]]
+      file[handle[1]:handle[1] + len(data)] = data
+      handle[1] += len(data)
+      return f'\r\n+QFWRITE: {len(data)},{len(file)}\r\n\r\nOK\r\n'
+
+    self._sim.receive(int(match.group(2)), write)
+    return '\r\nCONNECT\r\n'
+
+  def _read(self, match):
+    handle = self.handles[int(match.group(1))]
+    data = bytes(self.files[handle[0]][handle[1]:handle[1] + int(match.group(2))])
+    handle[1] += len(data)
+    return f'\r\nCONNECT {len(data)}\r\n'.encode() + data + b'\r\nOK\r\n'
+
+@pytest.fixture
+def sim():
+  return modem_sim()
+
+@pytest.fixture
+def modem(sim):
+  from bg95_osi_layer import osi_layer
+  my_bg95 = osi_layer(logging, ser=sim.port)
+  assert my_bg95.open_usb()
+  yield my_bg95
+  my_bg95.close_usb()
+
+@pytest.fixture
+def files(sim):
+  return ufs_sim(sim)
@@ -0,0 +1,69 @@
+import json
+import logging
+import time
+import pytest
+from bg95_autotune import uart_autotuner
+
+IMEI = "866349041234567"
+
+@pytest.fixture
+def uart(sim, files):
+  # a UART whose downloads take longer at lower baud rates and that does not work at 921600
+  uart = {"baudrate": 115200}
+  sim.respond(r'AT\+GSN', f'\r\n{IMEI}\r\n\r\nOK\r\n')
+  sim.respond(r'AT\+IFC=2,2', '\r\nOK\r\n')
+  sim.respond(r'AT\+IPR=(\d+)', lambda match: '\r\nERROR\r\n' if match.group(1) == "921600" else
+                                              uart.update(baudrate=int(match.group(1))) or '\r\nOK\r\n')
+  download = files._download
+
+  def slow_download(match):
+    data = download(match)
+    # 20 times faster than a real UART
+    time.sleep(len(data) * 10 / uart["baudrate"] / 20)
+    return data
+
+  sim.respond(r'AT\+QFDWL="(.+)"', slow_download)
+  return uart
+
+def test_ufs_throughput(modem, sim, files):
+  tuner = uart_autotuner(modem, logging)
+  assert tuner.measure_ufs_throughput(block_size=1000, rounds=3) > 0
+  assert [command.split("=")[0] for command in sim.commands if command.startswith("AT+QF")] == ["AT+QFUPL", "AT+QFDWL", "AT+QFDEL"] * 3
+  assert files.files == {}
+
+def test_failed_transfer_measures_nothing(modem, sim, files):
+  sim.respond(r'AT\+QFDWL=.*', '\r\n+CME ERROR: 409\r\n')
+  tuner = uart_autotuner(modem, logging)
+  assert tuner.measure_ufs_throughput(block_size=1000) == 0
+  assert files.files == {}
+
+def test_autotune_keeps_the_fastest_setting(modem, sim, uart, tmp_path):
+  settings_file = str(tmp_path / "uart.json")
+  tuner = uart_autotuner(modem, logging, settings_file=settings_file)
+  status, results = tuner.autotune()
+  assert status
+  assert results[921600] == 0
+  assert max(results, key=results.get) == 460800
+  assert uart["baudrate"] == 460800
+  settings = json.load(open(settings_file))
+  assert list(settings) == [IMEI]
+  assert (settings[IMEI]["baudrate"], settings[IMEI]["rtscts"]) == (460800, True)
+
+def test_device_id_is_the_imei_only(modem, sim, uart, tmp_path):
+  # before CFUN=1 the SIM identity is not available, the modem_sim answers AT+CIMI with ERROR
+  tuner = uart_autotuner(modem, logging, settings_file=str(tmp_path / "uart.json"))
+  assert tuner._device_id() == IMEI
+  assert not any(command in ["AT+CIMI", "AT+QCCID"] for command in sim.commands)
+
+def test_apply_stored(modem, sim, uart, tmp_path):
+  settings_file = tmp_path / "uart.json"
+  settings_file.write_text(json.dumps({IMEI: {"baudrate": 230400, "rtscts": True, "throughput": 20000},
+                                       "other": {"baudrate": 921600, "rtscts": False, "throughput": 80000}}))
+  tuner = uart_autotuner(modem, logging, settings_file=str(settings_file))
+  assert tuner.apply_stored()
+  assert uart["baudrate"] == 230400
+  assert modem._baudrate == 230400
+
+def test_apply_stored_without_setting(modem, uart, tmp_path):
+  tuner = uart_autotuner(modem, logging, settings_file=str(tmp_path / "missing.json"))
+  assert not tuner.apply_stored()
@@ -0,0 +1,112 @@
+import logging
+import pytest
+import bg95_cmux
+from bg95_cmux import cmux, _cmux_fcs, _cmux_fcs_ok
+from bg95_transport import loopback_transport
+
+def frame(dlci, control, info=b'', cr=True):
+  address = (dlci << 2) | (0x02 if cr else 0) | 0x01
+  if len(info) <= 127:
+    header = bytes([address, control, (len(info) << 1) | 0x01])
+  else:
+    header = bytes([address, control, (len(info) & 0x7F) << 1, len(info) >> 7])
+  return b'\xf9' + header + info + bytes([_cmux_fcs(header)]) + b'\xf9'
+
+class mux_peer:
+  # modem side of the multiplexer: accepts every DLCI and echoes UIH data in upper case
+  def __init__(self):
+    self.frames = []
+    self.port = loopback_transport(responder=self._respond)
+    self._parser = cmux(self.port, logging)
+    self._parser._dispatch = self._dispatch
+
+  def _respond(self, data):
+    self._replies = b''
+    self._parser._parse_frames(bytearray(data))
+    return self._replies
+
+  def _dispatch(self, dlci, control, info):
+    self.frames.append((dlci, control, info))
+    if control == bg95_cmux._CMUX_SABM:
+      self._replies += frame(dlci, bg95_cmux._CMUX_UA | bg95_cmux._CMUX_PF)
+    elif (control == bg95_cmux._CMUX_UIH) and (dlci > 0):
+      self._replies += frame(dlci, bg95_cmux._CMUX_UIH, info.upper())
+
+def test_fcs_of_the_27010_sabm_example():
+  # SABM on DLCI 0: F9 03 3F 01 1C F9
+  assert _cmux_fcs(b'\x03\x3f\x01') == 0x1C
+  assert _cmux_fcs_ok(b'\x03\x3f\x01', 0x1C)
+  assert not _cmux_fcs_ok(b'\x03\x3f\x01', 0x1D)
+  assert frame(0, bg95_cmux._CMUX_SABM | bg95_cmux._CMUX_PF) == bytes.fromhex("f9033f011cf9")
+
+def test_fcs_of_the_ua_response():
+  # UA on DLCI 0: F9 03 73 01 D7 F9
+  assert _cmux_fcs(b'\x03\x73\x01') == 0xD7
+
+def parsed(data):
+  frames = []
+  mux = cmux(loopback_transport(), logging)
+  mux._dispatch = lambda dlci, control, info: frames.append((dlci, control, info))
+  buffer = bytearray(data)
+  mux._parse_frames(buffer)
+  return frames, buffer, mux.stats()
+
+def test_parse_skips_noise_and_repeated_flags():
+  data = b'garbage\xf9\xf9' + frame(1, bg95_cmux._CMUX_UIH, b'AT\r') + frame(2, bg95_cmux._CMUX_UIH, b'OK')
+  frames, buffer, stats = parsed(data)
+  assert frames == [(1, bg95_cmux._CMUX_UIH, b'AT\r'), (2, bg95_cmux._CMUX_UIH, b'OK')]
+  assert stats["fcs_errors"] == 0
+
+def test_parse_keeps_a_partial_frame():
+  data = frame(1, bg95_cmux._CMUX_UIH, b'hello')
+  frames, buffer, stats = parsed(data[:-3])
+  assert frames == []
+  frames, buffer, stats = parsed(bytes(buffer) + data[-3:])
+  assert frames == [(1, bg95_cmux._CMUX_UIH, b'hello')]
+
+def test_parse_drops_a_frame_with_bad_fcs():
+  bad = bytearray(frame(1, bg95_cmux._CMUX_UIH, b'hello'))
+  bad[-2] ^= 0xFF
+  frames, buffer, stats = parsed(bytes(bad) + frame(1, bg95_cmux._CMUX_UIH, b'next'))
+  assert frames == [(1, bg95_cmux._CMUX_UIH, b'next')]
+  assert stats["fcs_errors"] == 1
+
+def test_parse_two_byte_length():
+  info = bytes(range(256)) * 2
+  frames, buffer, stats = parsed(frame(3, bg95_cmux._CMUX_UIH, info))
+  assert frames == [(3, bg95_cmux._CMUX_UIH, info)]
+
+def test_parse_strips_the_poll_bit():
+  frames, buffer, stats = parsed(frame(0, bg95_cmux._CMUX_UA | bg95_cmux._CMUX_PF))
+  assert frames == [(0, bg95_cmux._CMUX_UA, b'')]
+
+@pytest.fixture
+def mux():
+  peer = mux_peer()
+  my_mux = cmux(peer.port, logging, frame_size=16)
+  assert my_mux.start()
+  my_mux.peer = peer
+  yield my_mux
+  my_mux.stop()
+
+def test_channels_over_one_port(mux):
+  one = mux.open_channel(1)
+  two = mux.open_channel(2)
+  one.timeout = two.timeout = 1
+  one.write(b'at+csq\r\n')
+  two.write(b'ati\r\n')
+  assert two.readline() == b'ATI\r\n'
+  assert one.readline() == b'AT+CSQ\r\n'
+
+def test_data_is_split_by_frame_size(mux):
+  channel = mux.open_channel(1)
+  channel.timeout = 1
+  data = b'x' * 40
+  channel.write(data)
+  assert channel.read(40) == data.upper()
+  sizes = [len(info) for dlci, control, info in mux.peer.frames if (dlci == 1) and (control == bg95_cmux._CMUX_UIH)]
+  assert sizes == [16, 16, 8]
+
+def test_open_channel_rejects_out_of_range(mux):
+  assert mux.open_channel(0) is None
+  assert mux.open_channel(cmux.MAX_DLCI + 1) is None
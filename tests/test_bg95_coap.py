@@ -0,0 +1,89 @@
+import logging
+import pytest
+from bg95_coap import coap_client
+
+@pytest.fixture
+def client():
+  return coap_client(None, logging)
+
+def test_header_of_the_rfc7252_example(client):
+  # CON GET, message id 0x7d34, no token
+  assert client._header(client.TYPE_CON, client.METHOD_GET, 0x7d34, b'') == bytes.fromhex("40017d34")
+  # ACK 2.05 Content with a 2 byte token
+  assert client._header(client.TYPE_ACK, 205, 0x7d34, b'\x12\x34') == bytes.fromhex("62457d341234")
+
+def test_uri_options(client):
+  options = client._options("coap://example.com/sensors/temp?unit=c&raw", content_format=client.CONTENT_FORMAT_JSON)
+  assert options == [(3, b'example.com'), (11, b'sensors'), (11, b'temp'), (12, b'\x32'), (15, b'unit=c'), (15, b'raw')]
+  # no Uri-Host for an IP address
+  assert client._options("coap://1.2.3.4/a") == [(11, b'a')]
+
+def test_message_round_trip(client):
+  options = client._options("coap://example.com/up", content_format=client.CONTENT_FORMAT_TEXT)
+  options.append((client._OPTION_BLOCK1, client._encode_uint((2 << 4) | 0x8 | 5)))
+  options.append((client._OPTION_SIZE1, client._encode_uint(1300)))
+  data = client._message(client.TYPE_CON, client.METHOD_POST, b'\xaa\xbb', options, b'payload')
+  message = client._parse(data)
+  assert message["type"] == client.TYPE_CON
+  assert message["code"] == client.METHOD_POST
+  assert message["message_id"] == client._message_id
+  assert message["token"] == b'\xaa\xbb'
+  assert message["options"] == {3: [b'example.com'], 11: [b'up'], 12: [b''], 27: [b'\x2d'], 60: [b'\x05\x14']}
+  assert message["payload"] == b'payload'
+
+def test_options_are_sorted_and_delta_encoded(client):
+  data = client._message(client.TYPE_NON, client.METHOD_GET, b'', [(60, b'\x01'), (11, b'a')])
+  # Uri-Path delta 11, then Size1 delta 49 = 13 + 36
+  assert data[4:] == bytes([0xB1]) + b'a' + bytes([0xD1, 36, 0x01])
+
+def test_extended_option_length(client):
+  value = b'x' * 300
+  data = client._message(client.TYPE_CON, client.METHOD_GET, b'', [(11, value)])
+  assert data[4] == 0xBE
+  assert data[5:7] == (300 - 269).to_bytes(2, "big")
+  assert client._parse(data)["options"][11] == [value]
+
+@pytest.mark.parametrize("data", [b'', b'\x40\x01\x00', b'\x80\x01\x00\x01', b'\x40\x01\x00\x01\xf1'])
+def test_parse_rejects_invalid_datagrams(client, data):
+  assert client._parse(data) is None
+
+def test_uint_encoding(client):
+  assert client._encode_uint(0) == b''
+  assert client._encode_uint(0x1234) == b'\x12\x34'
+  assert client._decode_uint(b'') == 0
+  assert client._decode_uint(b'\x12\x34') == 0x1234
+
+@pytest.mark.parametrize("block_size, szx", [(16, 0), (64, 2), (512, 5), (1024, 6), (4096, 6)])
+def test_block_size_exponent(block_size, szx):
+  assert coap_client(None, logging, block_size=block_size)._block_szx == szx
+
+def test_to_dict(client):
+  assert client._to_dict({"code": 205, "payload": b'22.5'}) == {"result": "OK", "status_code": 205, "payload": "22.5"}
+  assert client._to_dict({"code": 404, "payload": b''})["result"] == "ERROR"
+
+def block1_client(modem, codes):
+  # client whose server answers the blocks of an upload with codes, in order
+  client = coap_client(modem, logging, block_size=16)
+  client._open = lambda url, context_id: True
+  blocks = []
+
+  def exchange(message, confirmable):
+    request = client._parse(message)
+    blocks.append(request["payload"])
+    return True, {"type": client.TYPE_ACK, "code": codes[len(blocks) - 1], "message_id": request["message_id"],
+                  "token": request["token"], "options": {}, "payload": b''}
+
+  client._exchange = exchange
+  return client, blocks
+
+def test_block1_upload(modem):
+  client, blocks = block1_client(modem, [231, 231, 204])
+  status, response = client.post("coap://1.2.3.4/up", b'x' * 40)
+  assert status
+  assert response["status_code"] == 204
+  assert [len(block) for block in blocks] == [16, 16, 8]
+
+def test_block1_upload_stopped_by_the_server(modem):
+  client, blocks = block1_client(modem, [231, 413, 204])
+  assert client.post("coap://1.2.3.4/up", b'x' * 40) == (False, None)
+  assert len(blocks) == 2
@@ -0,0 +1,65 @@
+import time
+import pytest
+
+@pytest.fixture
+def dns(sim):
+  # a DNS server behind a modem_sim, {host: (addresses, ttl)}, unknown hosts fail with error 565
+  records = {"example.com": (["93.184.216.34", "93.184.216.35"], 600), "v6.example.com": (["2001:db8::1"], 600)}
+
+  def lookup(match):
+    if match.group(2) not in records:
+      return '\r\nOK\r\n\r\n+QIURC: "dnsgip",565\r\n'
+    ips, ttl = records[match.group(2)]
+    return f'\r\nOK\r\n\r\n+QIURC: "dnsgip",0,{len(ips)},{ttl}\r\n' + "".join(f'\r\n+QIURC: "dnsgip","{ip}"\r\n' for ip in ips)
+
+  sim.respond(r'AT\+QIDNSGIP=(\d+),"(.+)"', lookup)
+  sim.respond(r'AT\+QIDNSCFG=\d+,".+"', '\r\nOK\r\n')
+  return records
+
+def lookups(sim):
+  return [command for command in sim.commands if command.startswith("AT+QIDNSGIP")]
+
+def test_resolve_is_cached(modem, sim, dns):
+  assert modem.resolve("example.com") == (True, ["93.184.216.34", "93.184.216.35"])
+  assert modem.resolve("example.com") == (True, ["93.184.216.34", "93.184.216.35"])
+  assert lookups(sim) == ['AT+QIDNSGIP=1,"example.com"']
+
+@pytest.mark.parametrize("ttl, expected", [(0, 30), (5, 30), (600, 600), (86400, 3600)])
+def test_ttl_is_bounded(modem, dns, ttl, expected):
+  dns["example.com"] = (["93.184.216.34"], ttl)
+  modem.resolve("example.com")
+  assert modem._dns_cache["example.com"][1] - time.monotonic() == pytest.approx(expected, abs=1)
+
+def test_address_literals_are_not_looked_up(modem, sim, dns):
+  assert modem.resolve("10.0.0.1") == (True, ["10.0.0.1"])
+  assert modem.resolve("2001:db8::2") == (True, ["2001:db8::2"])
+  assert lookups(sim) == []
+
+def test_expired_entry_is_looked_up_again(modem, sim, dns):
+  modem.resolve("example.com")
+  dns["example.com"] = (["93.184.216.36"], 600)
+  modem._dns_cache["example.com"] = (modem._dns_cache["example.com"][0], time.monotonic() - 1)
+  assert modem.resolve("example.com") == (True, ["93.184.216.36"])
+  assert len(lookups(sim)) == 2
+
+def test_failed_lookup(modem, dns):
+  assert modem.resolve("missing.example.com") == (False, [])
+  # a stale address is used when the lookup fails
+  modem._dns_cache["missing.example.com"] = (["10.0.0.2"], time.monotonic() - 1)
+  assert modem.resolve("missing.example.com") == (True, ["10.0.0.2"])
+
+def test_new_dns_servers_clear_the_cache(modem, sim, dns):
+  modem.resolve("example.com")
+  assert modem.set_dns_servers("8.8.8.8", "1.1.1.1")
+  assert 'AT+QIDNSCFG=1,"8.8.8.8","1.1.1.1"' in sim.commands
+  modem.resolve("example.com")
+  assert len(lookups(sim)) == 2
+
+def test_rewrite_url(modem, dns):
+  assert modem._dns_rewrite_url("http://example.com/data") == "http://example.com/data"
+  modem.set_dns_rewrite(True)
+  assert modem._dns_rewrite_url("http://example.com:8080/data?x=1") == "http://93.184.216.34:8080/data?x=1"
+  assert modem._dns_rewrite_url("http://v6.example.com/") == "http://[2001:db8::1]/"
+  # HTTPS needs the host name for SNI and certificate checks
+  assert modem._dns_rewrite_url("https://example.com/") == "https://example.com/"
+  assert modem._dns_rewrite_url("http://missing.example.com/") == "http://missing.example.com/"
@@ -0,0 +1,67 @@
+import logging
+import pytest
+from bg95_osi_layer import osi_layer
+from bg95_watchdog import health_watchdog
+
+@pytest.fixture
+def csq(sim):
+  sim.respond(r'AT\+CSQ', '\r\n+CSQ: 20,99\r\n\r\nOK\r\n')
+
+@pytest.mark.parametrize("echo_on", [True, False])
+def test_response_with_and_without_echo(modem, sim, csq, echo_on):
+  assert modem.ATE(echo_on)[0]
+  assert sim.echo == echo_on
+  assert modem.echo() == echo_on
+  status, cmd, response = modem.AT_CSQ()
+  assert status
+  assert response == {"result": "OK", "rssi": 20}
+
+def test_echo_state_is_learned_at_session_start(sim):
+  # left in ATE0 by an earlier session
+  sim.echo = False
+  modem = osi_layer(logging, ser=sim.port)
+  assert modem.echo() is None
+  assert modem.open_usb()
+  assert modem.echo() is False
+  modem.close_usb()
+
+def test_echo_state_is_learned_from_answers(modem, sim, csq):
+  assert modem.echo() is True
+  # e.g. the module restarted in ATE0 behind our back
+  sim.echo = False
+  assert modem.AT_CSQ()[0]
+  assert modem.echo() is False
+  sim.echo = True
+  assert modem.AT()[0]
+  assert modem.echo() is True
+
+def test_late_result_is_not_taken_for_the_answer(modem, sim, csq):
+  modem.ATE(False)
+  sim.respond(r'AT\+SLOW', None)
+  assert not modem._AT_send_cmd("AT+SLOW", 0.05)[0]
+  # the result of AT+SLOW and a URC arrive before the next command is sent
+  urcs = []
+  modem.register_urc_handler("+QIURC:", urcs.append)
+  sim.port.feed(b'\r\n+CME ERROR: 3\r\n\r\n+QIURC: "pdpdeact",1\r\n')
+  status, cmd, response = modem.AT_CSQ()
+  assert status
+  assert response["rssi"] == 20
+  assert urcs == ['+QIURC: "pdpdeact",1']
+
+def test_urc_between_echo_and_answer_is_dispatched(modem, sim):
+  urcs = []
+  modem.register_urc_handler("+QIURC:", urcs.append)
+  sim.respond(r'AT\+CSQ', '\r\n+QIURC: "closed",2\r\n\r\n+CSQ: 18,99\r\n\r\nOK\r\n')
+  status, response, result = modem._AT_send_cmd("AT+CSQ")
+  assert status
+  assert response == "+CSQ: 18,99\nOK\n"
+  assert urcs == ['+QIURC: "closed",2']
+
+def test_watchdog_restores_the_requested_echo_mode(modem, sim):
+  modem.ATE(False)
+  # the modem came back from a reset in ATE1
+  sim.echo = True
+  watchdog = health_watchdog(modem, logging)
+  assert watchdog._reset_echo()
+  assert sim.commands[-1] == "ATE0"
+  assert (sim.echo, modem.echo()) == (False, False)
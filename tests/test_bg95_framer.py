@@ -0,0 +1,90 @@
+import pytest
+from bg95_framer import at_framer
+
+def lines(framer):
+  result = []
+  while True:
+    line = framer.next_line()
+    if line is None:
+      return result
+    result.append(line)
+
+def test_lines_without_trailing_whitespace():
+  framer = at_framer()
+  framer.feed(b'AT+CSQ\r\r\n+CSQ: 20,99 \r\n\r\nOK\r\n')
+  assert lines(framer) == ["AT+CSQ", "+CSQ: 20,99", "", "OK"]
+  assert len(framer) == 0
+
+def test_partial_line_stays_buffered():
+  framer = at_framer()
+  framer.feed(b'+CSQ: 2')
+  assert framer.next_line() is None
+  framer.feed(b'0,99\r\n')
+  assert framer.next_line() == "+CSQ: 20,99"
+
+def test_prompt_only_while_expected():
+  framer = at_framer()
+  framer.feed(b'\r\n> ')
+  assert framer.next_line() == ""
+  assert framer.next_line() is None
+  framer.expect_prompt = True
+  assert framer.next_line() == ">"
+  assert len(framer) == 0
+
+def test_take_raw_after_header():
+  framer = at_framer()
+  framer.feed(b'+QIRD: 5\r\nab\r\ncOK\r\n')
+  assert framer.next_line() == "+QIRD: 5"
+  assert framer.take_raw(5) == b'ab\r\nc'
+  assert framer.next_line() == "OK"
+
+def test_long_line_grows_the_buffer():
+  framer = at_framer(size=64)
+  payload = b'x' * 1000
+  framer.feed(payload + b'\r\n')
+  assert framer.next_line() == payload.decode()
+
+def test_invalid_utf8_is_replaced():
+  framer = at_framer()
+  framer.feed(b'+X: \xff\r\n')
+  assert framer.next_line() == "+X: �"
+
+def test_reset_drops_buffered_data():
+  framer = at_framer()
+  framer.feed(b'half a line')
+  framer.reset()
+  assert len(framer) == 0
+  assert framer.next_line() is None
+
+@pytest.mark.parametrize("line, kind", [
+  ("", at_framer.LINE_EMPTY),
+  (">", at_framer.LINE_PROMPT),
+  ("CONNECT", at_framer.LINE_PROMPT),
+  ("OK", at_framer.LINE_FINAL),
+  ("ERROR", at_framer.LINE_FINAL),
+  ("+CME ERROR: 516", at_framer.LINE_FINAL),
+  ("SEND OK", at_framer.LINE_FINAL),
+  ("AT+CSQ", at_framer.LINE_ECHO),
+  ("+CSQ: 20,99", at_framer.LINE_INTERMEDIATE),
+  ('+QIURC: "recv",1', at_framer.LINE_URC),
+  ("RDY", at_framer.LINE_URC),
+  ("APP RDY", at_framer.LINE_URC),
+  ("867730051234567", at_framer.LINE_INTERMEDIATE),
+])
+def test_classify_during_command(line, kind):
+  framer = at_framer()
+  framer.command = "AT+CSQ"
+  assert framer.classify(line) == kind
+
+def test_classify_without_command():
+  framer = at_framer()
+  assert framer.classify("+CSQ: 20,99") == at_framer.LINE_URC
+  assert framer.classify("Quectel") == at_framer.LINE_URC
+  assert framer.classify("OK") == at_framer.LINE_FINAL
+
+def test_classify_query_and_set_forms():
+  framer = at_framer()
+  framer.command = "AT+QIACT?"
+  assert framer.classify("+QIACT: 1,1,1,\"10.0.0.1\"") == at_framer.LINE_INTERMEDIATE
+  framer.command = 'AT+QCFG="band"'
+  assert framer.classify('+QCFG: "band",0xf,0x80084') == at_framer.LINE_INTERMEDIATE
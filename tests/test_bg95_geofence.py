@@ -0,0 +1,114 @@
+import logging
+import random
+import pytest
+from bg95_geofence import geofence_engine
+
+@pytest.fixture
+def engine(modem, sim):
+  sim.respond(r'AT\+QCFGEXT="(addgeo|deletegeo)",.*', '\r\nOK\r\n')
+  sim.respond(r'AT\+QCFGEXT="querygeo",(\d+)', lambda match: f'\r\n+QCFGEXT: "querygeo",{match.group(1)},1\r\n\r\nOK\r\n')
+  events = []
+  my_engine = geofence_engine(modem, logging, on_event=lambda fence_id, event, fix: events.append((fence_id, event)))
+  my_engine.events = events
+  return my_engine
+
+def brute_force(engine, latitude, longitude):
+  return {fence_id for fence_id, fence in engine._fences.items() if engine._contains(fence, latitude, longitude)}
+
+def test_grid_matches_brute_force(modem):
+  engine = geofence_engine(modem, logging, cell_size=0.01, hardware=False)
+  random.seed(7)
+  for index in range(300):
+    latitude, longitude = random.uniform(52.0, 52.2), random.uniform(5.0, 5.2)
+    if index % 3:
+      engine.add_circle(index, latitude, longitude, random.uniform(50, 3000))
+    else:
+      corners = [(latitude + random.uniform(-0.02, 0.02), longitude + random.uniform(-0.02, 0.02)) for _ in range(random.randint(3, 7))]
+      engine.add_polygon(index, corners)
+  # larger than _MAX_CELLS, checked for every position
+  engine.add_circle("large", 52.1, 5.1, 50000)
+  assert engine.stats()["large"] == 1
+  for _ in range(2000):
+    latitude, longitude = random.uniform(51.95, 52.25), random.uniform(4.95, 5.25)
+    assert engine.locate(latitude, longitude) == brute_force(engine, latitude, longitude)
+
+def test_circle_radius(modem):
+  engine = geofence_engine(modem, logging, hardware=False)
+  engine.add_circle("c", 52.0, 5.0, 1000)
+  # 1 degree latitude is 111.32 km, 1 degree longitude cos(52) times that
+  assert engine.locate(52.0 + 990 / 111320, 5.0) == {"c"}
+  assert engine.locate(52.0 + 1010 / 111320, 5.0) == set()
+  assert engine.locate(52.0, 5.0 + 990 / 111320 / 0.6157) == {"c"}
+  assert engine.locate(52.0, 5.0 + 1010 / 111320 / 0.6157) == set()
+
+def test_concave_polygon(modem):
+  engine = geofence_engine(modem, logging, hardware=False)
+  # a U shape open to the north
+  engine.add_polygon("u", [(0, 0), (0, 3), (3, 3), (3, 2), (1, 2), (1, 1), (3, 1), (3, 0)])
+  assert engine.locate(0.5, 1.5) == {"u"}
+  assert engine.locate(2, 1.5) == set()
+  assert engine.locate(2, 0.5) == {"u"}
+
+def test_remove_unindexes(modem):
+  engine = geofence_engine(modem, logging, hardware=False)
+  engine.add_circle("a", 10, 10, 1000)
+  engine.add_circle("a", 20, 20, 1000)
+  assert engine.locate(10, 10) == set()
+  assert engine.locate(20, 20) == {"a"}
+  assert engine.remove("a")
+  assert not engine.remove("a")
+  assert engine.stats()["cells"] == 0
+
+def test_host_events(modem):
+  events = []
+  engine = geofence_engine(modem, logging, hardware=False, on_event=lambda fence_id, event, fix: events.append((fence_id, event)))
+  engine.add_circle("home", 52.0, 5.0, 100)
+  assert engine.update({"latitude": 52.1, "longitude": 5.0}) == []
+  assert engine.update({"latitude": 52.0, "longitude": 5.0}) == [("home", geofence_engine.EVENT_ENTER)]
+  assert engine.update({"latitude": 52.0, "longitude": 5.0}) == []
+  assert engine.update({"latitude": 52.1, "longitude": 5.0}) == [("home", geofence_engine.EVENT_LEAVE)]
+  assert events == [("home", geofence_engine.EVENT_ENTER), ("home", geofence_engine.EVENT_LEAVE)]
+
+def test_hardware_fences(engine, sim):
+  engine.add_circle("c", 52.0, 5.0, 200)
+  engine.add_polygon("tri", [(0, 0), (0, 1), (1, 1)])
+  engine.add_polygon("penta", [(0, 0), (0, 1), (1, 2), (2, 1), (1, 0)])
+  assert engine.hardware_fences() == ["c", "tri"]
+  assert 'AT+QCFGEXT="addgeo",0,3,0,52.0,5.0,200' in sim.commands
+  assert engine.query("c") == 1
+  assert engine.query("penta") is None
+  # hardware fences are not checked on the host, the GNSS engine reports them
+  assert engine.update({"latitude": 52.0, "longitude": 5.0}) == []
+  assert engine.locate(52.0, 5.0) == {"c"}
+
+def test_hardware_event_urc(engine, sim, modem):
+  engine.add_circle("c", 52.0, 5.0, 200)
+  sim.urc('+QIND: "GEOFENCE",0,1')
+  sim.urc('+QIND: "GEOFENCE",0,2')
+  sim.urc('+QIND: "GEOFENCE",5,1')
+  assert modem.AT()[0]
+  assert engine.events == [("c", geofence_engine.EVENT_ENTER), ("c", geofence_engine.EVENT_LEAVE)]
+  assert engine.stats()["hardware_events"] == 2
+
+def test_refused_fence_is_checked_on_the_host(engine, sim):
+  sim.respond(r'AT\+QCFGEXT="addgeo",0,.*', '\r\n+CME ERROR: 516\r\n')
+  engine.add_circle("c", 52.0, 5.0, 200)
+  assert engine.hardware_fences() == []
+  assert engine.update({"latitude": 52.0, "longitude": 5.0}) == [("c", geofence_engine.EVENT_ENTER)]
+
+def test_slots_are_reused(engine, sim):
+  engine.add_circle("a", 1, 1, 100)
+  engine.add_circle("b", 2, 2, 100)
+  engine.remove("a")
+  assert 'AT+QCFGEXT="deletegeo",0' in sim.commands
+  engine.add_circle("c", 3, 3, 100)
+  assert engine.hardware_fences() == ["c", "b"]
+
+def test_reset_programs_the_fences_again(engine, sim, modem):
+  engine.add_circle("a", 1, 1, 100)
+  engine.add_circle("b", 2, 2, 100)
+  del sim.commands[:]
+  modem.reset_state()
+  assert [command for command in sim.commands if "addgeo" in command] == ['AT+QCFGEXT="addgeo",0,3,0,1,1,100',
+                                                                          'AT+QCFGEXT="addgeo",1,3,0,2,2,100']
+  assert engine.hardware_fences() == ["a", "b"]
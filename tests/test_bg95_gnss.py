@@ -0,0 +1,109 @@
+import calendar
+import math
+import pytest
+from bg95_gnss import FIX_FIELDS, decode_qgpsloc, decode_nmea, nmea_checksum_ok, gnss_track
+
+# 2013-05-11 06:19:51 UTC, the example fix of the BG95 GNSS application note
+EPOCH = calendar.timegm((2013, 5, 11, 6, 19, 51))
+
+def nmea(body):
+  checksum = 0
+  for char in body.encode():
+    checksum ^= char
+  return f"${body}*{checksum:02X}"
+
+@pytest.mark.parametrize("line", [
+  "+QGPSLOC: 061951.000,3150.7223N,11711.9293E,0.7,62.2,2,0.00,0.0,0.0,110513,09",
+  "+QGPSLOC: 061951.000,3150.722300,N,11711.929300,E,0.7,62.2,2,0.00,0.0,0.0,110513,09",
+  "+QGPSLOC: 061951.000,31.845372,117.198822,0.7,62.2,2,0.00,0.0,0.0,110513,09",
+])
+def test_decode_qgpsloc_modes(line):
+  fix = decode_qgpsloc(line)
+  assert set(fix) == set(FIX_FIELDS)
+  assert fix["time"] == EPOCH
+  assert fix["latitude"] == pytest.approx(31.845372, abs=1e-6)
+  assert fix["longitude"] == pytest.approx(117.198822, abs=1e-6)
+  assert (fix["hdop"], fix["altitude"], fix["fix"], fix["nsat"]) == (0.7, 62.2, 2, 9)
+
+def test_decode_qgpsloc_southern_and_western_hemisphere():
+  fix = decode_qgpsloc("+QGPSLOC: 000000.000,3350.0000S,07030.0000W,1.0,10.0,3,,,,010124,05")
+  assert fix["latitude"] == pytest.approx(-33.833333, abs=1e-6)
+  assert fix["longitude"] == pytest.approx(-70.5)
+  assert math.isnan(fix["cog"])
+  assert fix["time"] == calendar.timegm((2024, 1, 1, 0, 0, 0))
+
+@pytest.mark.parametrize("line", ["+CME ERROR: 516", "+QGPSLOC: 1,2,3", "+QGPSLOC: 061951.000,31x0.7223N,11711.9293E,0.7,62.2,2,0.00,0.0,0.0,110513,09"])
+def test_decode_qgpsloc_rejects(line):
+  assert decode_qgpsloc(line) is None
+
+def test_nmea_checksum():
+  assert nmea_checksum_ok("$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47")
+  assert not nmea_checksum_ok("$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*48")
+  assert not nmea_checksum_ok("GPGGA,123519*47")
+  assert not nmea_checksum_ok("$GPGGA,123519")
+
+def test_decode_rmc():
+  sentence = decode_nmea("$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A")
+  assert sentence["type"] == "RMC"
+  assert sentence["valid"]
+  assert sentence["latitude"] == pytest.approx(48.1173)
+  assert sentence["longitude"] == pytest.approx(11.516667, abs=1e-6)
+  assert sentence["speed_kmh"] == pytest.approx(22.4 * 1.852)
+  assert sentence["cog"] == 84.4
+
+def test_decode_gga():
+  sentence = decode_nmea("$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47")
+  assert (sentence["type"], sentence["utc_time"]) == ("GGA", "123519")
+  assert (sentence["quality"], sentence["nsat"], sentence["hdop"], sentence["altitude"]) == (1, 8, 0.9, 545.4)
+
+def test_decode_gsv():
+  sentence = decode_nmea("$GPGSV,2,1,08,01,40,083,46,02,17,308,41,12,07,344,39,14,22,228,45*75")
+  assert (sentence["talker"], sentence["messages"], sentence["message"], sentence["in_view"]) == ("GP", 2, 1, 8)
+  assert [satellite["prn"] for satellite in sentence["satellites"]] == [1, 2, 12, 14]
+  assert sentence["satellites"][0] == {"prn": 1, "elevation": 40, "azimuth": 83, "snr": 46}
+
+def test_decode_nmea_other_talkers_and_sentences():
+  assert decode_nmea(nmea("GNGGA,061951.000,3150.7223,N,11711.9293,E,1,09,0.7,62.2,M,,M,,"))["type"] == "GGA"
+  assert decode_nmea(nmea("GPVTG,084.4,T,,M,022.4,N,041.5,K,A")) is None
+  assert decode_nmea("$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*00") is None
+  assert decode_nmea("$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*00", check=False)["nsat"] == 8
+
+def test_track_merges_rmc_and_gga_of_one_fix():
+  track = gnss_track()
+  added = track.extend_log([
+    nmea("GPRMC,061951.000,A,3150.7223,N,11711.9293,E,0.0,0.0,110513,,"),
+    nmea("GPGGA,061951.000,3150.7223,N,11711.9293,E,1,09,0.7,62.2,M,,M,,"),
+    nmea("GPGSV,1,1,01,01,40,083,46"),
+    nmea("GPGGA,061952.000,3150.7224,N,11711.9294,E,1,08,0.8,,M,,M,,"),
+    "some other line",
+    "+QGPSLOC: 061953.000,31.845372,117.198822,0.7,62.2,3,0.00,0.0,0.0,110513,09",
+  ])
+  assert added == 3
+  columns = track.columns()
+  assert list(columns["time"]) == [EPOCH, EPOCH + 1, EPOCH + 2]
+  assert list(columns["nsat"]) == [9, 8, 9]
+  # GGA without altitude is a 2D fix
+  assert list(columns["fix"]) == [3, 2, 3]
+  assert columns["cog"][0] == 0.0
+  assert math.isnan(columns["cog"][1])
+
+def test_track_repeated_sentence_starts_a_new_fix():
+  track = gnss_track()
+  gga = nmea("GPGGA,061951.000,3150.7223,N,11711.9293,E,1,09,0.7,62.2,M,,M,,")
+  assert track.extend_log([gga, gga]) == 2
+
+def test_track_skips_invalid_fixes():
+  track = gnss_track()
+  assert track.extend_log([nmea("GPRMC,061951.000,V,,,,,,,110513,,"),
+                           nmea("GPGGA,061951.000,,,,,0,00,,,M,,M,,")]) == 0
+
+def test_track_records_and_clear():
+  track = gnss_track()
+  track.append(decode_qgpsloc("+QGPSLOC: 061951.000,31.845372,117.198822,0.7,62.2,2,0.00,0.0,0.0,110513,09"))
+  track.append({"time": EPOCH + 1, "latitude": 1.0, "longitude": 2.0})
+  records = track.records()
+  assert len(records) == 2
+  assert records[0][0] == EPOCH
+  assert records[1][-1] == 0
+  track.clear()
+  assert len(track) == 0
@@ -0,0 +1,103 @@
+import pytest
+from bg95_http import http_request, http_response
+
+def test_get_request():
+  request = http_request("get", "http://example.com/data?id=1&x=2")
+  assert request.build() == ("GET /data?id=1&x=2 HTTP/1.1\r\n"
+                             "Host: example.com\r\n"
+                             "Accept: */*\r\n"
+                             "User-Agent: QUECTEL_MODULE\r\n"
+                             "Connection: keep-alive\r\n"
+                             "\r\n")
+  assert not request.is_https()
+
+def test_post_request_counts_bytes():
+  request = http_request("POST", "https://example.com", body="grüße", content_type="text/plain", keep_alive=False)
+  assert request.is_https()
+  assert request.build().startswith("POST / HTTP/1.1\r\n")
+  assert request.get_header("connection") == "close"
+  assert "Content-Type: text/plain\r\n" in request.build()
+  assert "Content-Length: 7\r\n" in request.build()
+  assert request.build().endswith("\r\n\r\ngrüße")
+
+def test_headers_are_replaced_case_insensitively():
+  request = http_request("GET", "http://example.com/").header("user-agent", "sensor/1.0")
+  assert request.build().lower().count("user-agent:") == 1
+  assert request.get_header("USER-AGENT") == "sensor/1.0"
+  assert request.get_header("X-Missing", "none") == "none"
+
+def test_conditional_request():
+  request = http_request("GET", "http://example.com/").if_none_match('"v1"').if_modified_since(None)
+  assert request.get_header("If-None-Match") == '"v1"'
+  assert request.get_header("If-Modified-Since") is None
+
+def test_parse_response():
+  payload = ("HTTP/1.1 200 OK\n"
+             "Content-Type: text/plain\n"
+             "ETag: \"v1\"\n"
+             "Set-Cookie: a=1\n"
+             "set-cookie: b=2\n"
+             "Last-Modified: Mon, 01 Jan 2024 00:00:00 GMT\n"
+             "\n"
+             "line one\n"
+             "\n"
+             "line two\n"
+             "OK\n")
+  response = http_response.parse(payload)
+  assert (response.status_code, response.reason) == (200, "OK")
+  assert response.header("content-type") == "text/plain"
+  assert response.header("Set-Cookie") == "a=1, b=2"
+  assert response.etag == '"v1"'
+  assert response.last_modified == "Mon, 01 Jan 2024 00:00:00 GMT"
+  # blank lines of the body are kept
+  assert response.body == "line one\n\nline two"
+  assert response.to_dict()["result"] == "OK"
+
+def test_parse_not_modified():
+  response = http_response.parse("HTTP/1.1 304 Not Modified\nETag: \"v1\"\n\nOK\n", status_code=304)
+  assert response.not_modified
+  assert (response.reason, response.body) == ("Not Modified", "")
+
+def test_parse_error_status():
+  response = http_response.parse("HTTP/1.1 404 Not Found\n\nmissing\nOK\n", status_code=200)
+  assert response.status_code == 404
+  assert response.to_dict() == {"result": "ERROR", "status_code": 404, "reason": "Not Found", "headers": {}, "payload": "missing"}
+
+def test_parse_without_response_header():
+  response = http_response.parse("just the body\nOK\n", status_code=200)
+  assert (response.status_code, response.headers, response.body) == (200, {}, "just the body")
+
+@pytest.fixture
+def http_server(sim):
+  # a modem_sim whose QHTTP stack answers every request with a fixed response
+  server = {"requests": [], "response": "HTTP/1.1 200 OK\r\nETag: \"v1\"\r\n\r\nhello"}
+  sim.respond(r'AT\+QHTTPCFG=".+",\d+', '\r\nOK\r\n')
+
+  def url(match):
+    sim.receive(int(match.group(1)) + 1, lambda data: server.update(url=data.decode().rstrip("\r")) or '\r\nOK\r\n')
+    return '\r\nCONNECT\r\n'
+
+  def get(match):
+    def request(data):
+      server["requests"].append(data.decode())
+      return f'\r\nOK\r\n\r\n+QHTTPGET: 0,200,{len(server["response"])}\r\n'
+    sim.receive(int(match.group(1)), request)
+    return '\r\nCONNECT\r\n'
+
+  sim.respond(r'AT\+QHTTPURL=(\d+)', url)
+  sim.respond(r'AT\+QHTTPGET=\d+,(\d+)', get)
+  sim.respond(r'AT\+QHTTPREAD=\d+', lambda match: f'\r\nCONNECT\r\n{server["response"]}\r\nOK\r\n\r\n+QHTTPREAD: 0\r\n')
+  return server
+
+def test_http_request(modem, sim, http_server):
+  status, response = modem.HTTP_REQUEST(http_request("GET", "http://example.com/data").header("Accept", "text/plain"))
+  assert status
+  assert http_server["url"] == "http://example.com/data"
+  assert http_server["requests"][0].startswith("GET /data HTTP/1.1\r\nHost: example.com\r\nAccept: text/plain\r\n")
+  assert (response.status_code, response.etag, response.body) == (200, '"v1"', "hello")
+
+def test_repeated_request_skips_the_configuration(modem, sim, http_server):
+  assert modem.HTTP_REQUEST(http_request("GET", "http://example.com/data"))[0]
+  del sim.commands[:]
+  assert modem.HTTP_REQUEST(http_request("GET", "http://example.com/data"))[0]
+  assert [command.split("=")[0] for command in sim.commands] == ["AT+QHTTPGET", "AT+QHTTPREAD"]
@@ -0,0 +1,137 @@
+import logging
+import pytest
+import bg95_http_cache
+from bg95_http_cache import http_cache
+
+URL = "http://example.com/data"
+
+@pytest.fixture
+def clock(monkeypatch):
+  # the time.time() the cache sees, in [sec]
+  now = [1_700_000_000.0]
+  monkeypatch.setattr(bg95_http_cache.time, "time", lambda: now[0])
+  return now
+
+@pytest.fixture
+def cache(clock):
+  return http_cache(logging, cache_file=None)
+
+def test_miss_then_fresh_hit(cache, clock):
+  assert cache.lookup(URL) == (None, False)
+  assert cache.store(URL, 200, {"cache-control": "max-age=60"}, "body")
+  entry, fresh = cache.lookup(URL)
+  assert fresh
+  assert (entry["status_code"], entry["body"]) == (200, "body")
+  clock[0] += 61
+  entry, fresh = cache.lookup(URL)
+  assert not fresh
+  assert entry["body"] == "body"
+  assert cache.stats()["hits"] == 1
+  assert cache.stats()["misses"] == 1
+  assert cache.stats()["bytes_saved"] == 4
+
+def test_age_counts_against_max_age(cache, clock):
+  cache.store(URL, 200, {"cache-control": "max-age=60", "age": "50"}, "body")
+  clock[0] += 11
+  assert not cache.lookup(URL)[1]
+
+def test_expires_relative_to_date(cache, clock):
+  # a server clock that is off does not matter, only Expires - Date
+  cache.store(URL, 200, {"date": "Mon, 01 Jan 2024 00:00:00 GMT", "expires": "Mon, 01 Jan 2024 00:01:00 GMT"}, "body")
+  clock[0] += 59
+  assert cache.lookup(URL)[1]
+  clock[0] += 2
+  assert not cache.lookup(URL)[1]
+
+def test_invalid_expires_is_stale(cache):
+  cache.store(URL, 200, {"expires": "0", "etag": '"v1"'}, "body")
+  entry, fresh = cache.lookup(URL)
+  assert not fresh
+  assert entry["headers"]["etag"] == '"v1"'
+
+def test_no_cache_always_revalidates(cache):
+  assert cache.store(URL, 200, {"cache-control": "no-cache, max-age=60", "etag": '"v1"'}, "body")
+  assert not cache.lookup(URL)[1]
+
+@pytest.mark.parametrize("status_code, headers", [
+  (200, {"cache-control": "no-store", "etag": '"v1"'}),
+  (200, {}),
+  (200, {"cache-control": "max-age=0"}),
+  (404, {"cache-control": "max-age=60"}),
+])
+def test_not_stored(cache, status_code, headers):
+  cache.store(URL, 200, {"cache-control": "max-age=60"}, "old")
+  assert not cache.store(URL, status_code, headers, "new")
+  # an uncacheable response replaces what was cached
+  assert cache.lookup(URL) == (None, False)
+
+def test_revalidated_extends_the_lifetime(cache, clock):
+  cache.store(URL, 200, {"etag": '"v1"', "content-type": "text/plain"}, "body")
+  assert not cache.lookup(URL)[1]
+  entry = cache.revalidated(URL, {"cache-control": "max-age=30"})
+  assert entry["headers"] == {"etag": '"v1"', "content-type": "text/plain", "cache-control": "max-age=30"}
+  assert cache.lookup(URL)[1]
+  assert cache.stats()["revalidated"] == 1
+  assert cache.revalidated("http://example.com/other", {}) is None
+
+def test_lru_by_entries(clock):
+  cache = http_cache(logging, cache_file=None, max_entries=2)
+  headers = {"cache-control": "max-age=60"}
+  cache.store("a", 200, headers, "1")
+  cache.store("b", 200, headers, "2")
+  # a is used again, so b is the least recently used
+  cache.lookup("a")
+  cache.store("c", 200, headers, "3")
+  assert cache.lookup("b") == (None, False)
+  assert cache.lookup("a")[1] and cache.lookup("c")[1]
+  assert cache.stats()["evictions"] == 1
+
+def test_lru_by_bytes(clock):
+  headers = {"cache-control": "max-age=60"}
+  # one entry: url + body + header names and values
+  size = len("a") + 100 + len("cache-control") + len("max-age=60")
+  cache = http_cache(logging, cache_file=None, max_bytes=2 * size)
+  cache.store("a", 200, headers, "x" * 100)
+  cache.store("b", 200, headers, "x" * 100)
+  assert cache.stats()["bytes"] == 2 * size
+  cache.store("c", 200, headers, "x" * 100)
+  assert cache.stats()["entries"] == 2
+  assert cache.lookup("a") == (None, False)
+  # larger than the whole cache
+  assert not cache.store("d", 200, headers, "x" * 1000)
+  assert cache.stats()["bytes"] == 2 * size
+
+def test_store_replaces_and_keeps_the_size(cache):
+  cache.store(URL, 200, {"cache-control": "max-age=60"}, "first")
+  cache.store(URL, 200, {"cache-control": "max-age=60"}, "second")
+  assert cache.stats()["entries"] == 1
+  assert cache.stats()["bytes"] == len(URL) + len("second") + len("cache-control") + len("max-age=60")
+
+def test_invalidate(cache):
+  cache.store("a", 200, {"cache-control": "max-age=60"}, "1")
+  cache.store("b", 200, {"cache-control": "max-age=60"}, "2")
+  cache.invalidate("a")
+  assert cache.stats()["entries"] == 1
+  cache.invalidate()
+  assert (cache.stats()["entries"], cache.stats()["bytes"]) == (0, 0)
+
+def test_persisted_in_lru_order(tmp_path, clock):
+  cache_file = str(tmp_path / "cache.json")
+  headers = {"cache-control": "max-age=60"}
+  cache = http_cache(logging, cache_file=cache_file, max_entries=2)
+  cache.store("a", 200, headers, "1")
+  cache.store("b", 200, headers, "2")
+  cache.lookup("a")
+  cache.revalidated("a", {})
+  loaded = http_cache(logging, cache_file=cache_file, max_entries=2)
+  assert loaded.stats()["bytes"] == cache.stats()["bytes"]
+  # b was the least recently used before the restart as well
+  loaded.store("c", 200, headers, "3")
+  assert loaded.lookup("b") == (None, False)
+  assert loaded.lookup("a")[0]["body"] == "1"
+
+def test_corrupt_file_starts_empty(tmp_path):
+  cache_file = tmp_path / "cache.json"
+  cache_file.write_text("{not json")
+  cache = http_cache(logging, cache_file=str(cache_file))
+  assert cache.stats()["entries"] == 0
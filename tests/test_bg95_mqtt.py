@@ -0,0 +1,123 @@
+import logging
+import pytest
+from bg95_mqtt import mqtt_client
+
+class broker:
+  # the MQTT broker behind the QMT commands of a modem_sim. publish results are sent right away
+  # unless ack is False, conn is the return code of the CONNACK
+  def __init__(self, sim):
+    self.published = []
+    self.subscribed = []
+    self.ack = True
+    self.conn = 0
+    self._sim = sim
+    sim.respond(r'AT\+QMTCFG=.*', '\r\nOK\r\n')
+    sim.respond(r'AT\+QMTOPEN=(\d+),.*', lambda match: f'\r\nOK\r\n\r\n+QMTOPEN: {match.group(1)},0\r\n')
+    sim.respond(r'AT\+QMTCONN=(\d+),.*', lambda match: f'\r\nOK\r\n\r\n+QMTCONN: {match.group(1)},0,{self.conn}\r\n')
+    sim.respond(r'AT\+QMTSUB=(\d+),(\d+),"(.+)",(\d)', self._subscribe)
+    sim.respond(r'AT\+QMTPUB=(\d+),(\d+),(\d),[01],"(.+)",(\d+)', self._publish)
+    sim.respond(r'AT\+QMTDISC=(\d+)', lambda match: f'\r\nOK\r\n\r\n+QMTDISC: {match.group(1)},0\r\n')
+    sim.respond(r'AT\+QMTCLOSE=(\d+)', '\r\nOK\r\n')
+
+  def _subscribe(self, match):
+    self.subscribed.append(match.group(3))
+    return f'\r\nOK\r\n\r\n+QMTSUB: {match.group(1)},{match.group(2)},0,{match.group(4)}\r\n'
+
+  def _publish(self, match):
+    idx, msg_id = match.group(1), match.group(2)
+
+    def publish(data):
+      self.published.append((match.group(4), data))
+      return '\r\nOK\r\n' + (f'\r\n+QMTPUB: {idx},{msg_id},0\r\n' if self.ack and (msg_id != "0") else '')
+
+    self._sim.receive(int(match.group(5)), publish)
+    return '\r\n> '
+
+@pytest.fixture
+def mqtt(modem, sim):
+  received = []
+  client = mqtt_client(modem, logging, host="broker.example.com", on_message=lambda topic, payload: received.append((topic, payload)))
+  client.broker = broker(sim)
+  client.received = received
+  return client
+
+def test_recv_urc(mqtt):
+  mqtt._on_recv('+QMTRECV: 0,1,"sensors/a",5,"hello"')
+  mqtt._on_recv('+QMTRECV: 0,0,"sensors/b","without length"')
+  mqtt._on_recv('+QMTRECV: 0,2,"sensors/c",9,"a,"b", c"')
+  # another client index
+  mqtt._on_recv('+QMTRECV: 1,1,"sensors/d",5,"other"')
+  assert mqtt.received == [("sensors/a", "hello"), ("sensors/b", "without length"), ("sensors/c", 'a,"b", c')]
+  assert mqtt.stats()["received"] == 3
+
+def test_pub_urc(mqtt):
+  mqtt._inflight = {1: ("t", "a", 1, False), 2: ("t", "b", 1, False), 3: ("t", "c", 2, False)}
+  mqtt._on_pub('+QMTPUB: 0,1,0')
+  # the modem retransmits, still in flight
+  mqtt._on_pub('+QMTPUB: 0,2,1,1')
+  mqtt._on_pub('+QMTPUB: 0,3,2')
+  mqtt._on_pub('+QMTPUB: 1,2,0')
+  assert list(mqtt._inflight) == [2]
+  stats = mqtt.stats()
+  assert (stats["acknowledged"], stats["failed"], stats["inflight"]) == (1, 1, 1)
+
+def test_conn_and_stat_urcs(mqtt):
+  mqtt._on_conn('+QMTCONN: 0,0,5')
+  mqtt._on_conn('+QMTCONN: 1,0,0')
+  assert mqtt._results == {"conn": 5}
+  mqtt._state = mqtt.STATE_CONNECTED
+  mqtt._on_stat('+QMTSTAT: 1,1')
+  assert mqtt.is_connected()
+  mqtt._on_stat('+QMTSTAT: 0,1')
+  assert not mqtt.is_connected()
+
+def test_connect_subscribe_publish(mqtt, sim):
+  assert mqtt.connect()
+  assert 'AT+QMTCFG="recv/mode",0,0,1' in sim.commands
+  assert mqtt.subscribe("commands/#", qos=1)
+  assert mqtt.broker.subscribed == ["commands/#"]
+  assert mqtt.publish("telemetry", "one", qos=1)
+  assert mqtt.publish("telemetry", b'two')
+  assert mqtt.flush(timeout=1)
+  assert mqtt.broker.published == [("telemetry", b'one'), ("telemetry", b'two')]
+  sim.urc('+QMTRECV: 0,3,"commands/reboot",2,"no"')
+  mqtt.loop(0.1)
+  assert mqtt.received == [("commands/reboot", "no")]
+  stats = mqtt.stats()
+  assert (stats["published"], stats["acknowledged"], stats["inflight"]) == (2, 1, 0)
+
+def test_refused_connection(mqtt, sim):
+  mqtt.broker.conn = 5
+  assert not mqtt.connect()
+  assert not mqtt.is_connected()
+  assert "AT+QMTCLOSE=0" in sim.commands
+
+def test_reconnect_restores_subscriptions_and_inflight(mqtt, sim):
+  assert mqtt.connect()
+  assert mqtt.subscribe("commands/#")
+  mqtt.broker.ack = False
+  assert mqtt.publish("telemetry", "lost", qos=1)
+  sim.urc('+QMTSTAT: 0,1')
+  mqtt.loop(0.1)
+  assert not mqtt.is_connected()
+  mqtt.broker.ack = True
+  del sim.commands[:]
+  assert mqtt.flush(timeout=1)
+  assert mqtt.is_connected()
+  assert mqtt.broker.subscribed == ["commands/#", "commands/#"]
+  assert mqtt.broker.published == [("telemetry", b'lost')] * 2
+  assert any(command.startswith("AT+QMTOPEN") for command in sim.commands)
+  assert mqtt.stats()["reconnects"] == 1
+
+def test_inflight_window(modem, sim):
+  client = mqtt_client(modem, logging, host="broker.example.com", max_inflight=2)
+  client.broker = broker(sim)
+  client.broker.ack = False
+  assert client.connect()
+  assert client.publish("telemetry", "1", qos=1)
+  assert client.publish("telemetry", "2", qos=1)
+  assert not client.publish("telemetry", "3", qos=1, timeout=0.1)
+  assert len(client.broker.published) == 2
+  sim.urc('+QMTPUB: 0,1,0')
+  assert client.publish("telemetry", "3", qos=1, timeout=1)
+  assert client.stats()["inflight"] == 2
@@ -0,0 +1,36 @@
+import pytest
+
+@pytest.fixture
+def network(sim):
+  # registration, PS attach and PDP context state of a modem_sim
+  state = {"eps": 1, "attached": 1, "context": 1}
+  sim.respond(r'AT\+CEREG\?', lambda match: f'\r\n+CEREG: 0,{state["eps"]}\r\n\r\nOK\r\n')
+  sim.respond(r'AT\+CGATT\?', lambda match: f'\r\n+CGATT: {state["attached"]}\r\n\r\nOK\r\n')
+  sim.respond(r'AT\+QIACT\?', lambda match: f'\r\n+QIACT: 1,{state["context"]},1,"10.0.0.1"\r\n\r\nOK\r\n' if state["context"] else '\r\nOK\r\n')
+  sim.respond(r'AT\+QIACT=1', lambda match: state.update(context=1) or '\r\nOK\r\n')
+  sim.respond(r'AT\+CFUN=0', lambda match: state.update(eps=0, attached=0, context=0) or '\r\nOK\r\n')
+  sim.respond(r'AT\+CFUN=1', lambda match: state.update(eps=1, attached=1) or
+                                           '\r\nOK\r\n\r\n+CPIN: READY\r\n\r\n+QUSIM: 1\r\n\r\n+QIND: SMS DONE\r\n')
+  sim.respond(r'AT\+CSQ', '\r\n+CSQ: 20,99\r\n\r\nOK\r\n')
+  return state
+
+def test_resume_reuses_registration_and_context(modem, sim, network):
+  assert modem.resume_modem_network_connection()
+  assert sim.commands[-3:] == ["AT+CEREG?", "AT+CGATT?", "AT+QIACT?"]
+
+def test_resume_only_activates_the_context(modem, sim, network):
+  network["context"] = 0
+  assert modem.resume_modem_network_connection()
+  assert sim.commands[-2:] == ["AT+QIACT?", "AT+QIACT=1"]
+  assert not any(command.startswith("AT+CFUN") for command in sim.commands)
+
+@pytest.mark.parametrize("lost", ["eps", "attached"])
+def test_resume_falls_back_to_a_full_connect(modem, sim, network, lost):
+  network[lost] = 0
+  assert modem.resume_modem_network_connection()
+  assert ["AT+CFUN=0", "AT+CFUN=1", "AT+CSQ"] == [command for command in sim.commands if command.startswith(("AT+CFUN", "AT+CSQ"))]
+
+def test_resume_fails_when_the_context_cannot_be_activated(modem, sim, network):
+  network["context"] = 0
+  sim.respond(r'AT\+QIACT=1', '\r\n+CME ERROR: 30\r\n')
+  assert not modem.resume_modem_network_connection()
@@ -0,0 +1,62 @@
+import logging
+import time
+import pytest
+from bg95_power import power_scheduler
+
+@pytest.fixture
+def psm(modem, sim, monkeypatch):
+  # a modem in PSM that answers once its wake pin was pulsed, and is registered again after
+  # registration_polls AT+CEREG?. a module in PSM does not answer at all, which would cost the AT
+  # timeout per poll here, it answers ERROR instead
+  monkeypatch.setattr(power_scheduler, "_WAKE_POLL_INTERVAL", 0.01)
+  state = {"awake": False, "registration_polls": 2}
+  sim.respond(r'AT', lambda match: '\r\nOK\r\n' if state["awake"] else '\r\nERROR\r\n')
+
+  def cereg(match):
+    state["registration_polls"] -= 1
+    return f'\r\n+CEREG: 0,{1 if state["registration_polls"] <= 0 else 2}\r\n\r\nOK\r\n'
+
+  sim.respond(r'AT\+CEREG\?', cereg)
+  sim.respond(r'AT\+CPSMS=.*', '\r\nOK\r\n')
+  state["wake_pin"] = lambda: state.update(awake=True)
+  return state
+
+def test_select_mode():
+  scheduler = power_scheduler(None, logging)
+  assert scheduler.select_mode(queued=10, idle_time=100000) == power_scheduler.POWER_MODE_CONNECTED
+  assert scheduler.select_mode(idle_time=10) == power_scheduler.POWER_MODE_CONNECTED
+  assert scheduler.select_mode(idle_time=60) == power_scheduler.POWER_MODE_PSM
+  assert scheduler.select_mode(idle_time=7200) == power_scheduler.POWER_MODE_DETACHED
+
+def test_wake_from_psm(modem, psm):
+  scheduler = power_scheduler(modem, logging, wake_pin=psm["wake_pin"])
+  assert scheduler.enter_mode(power_scheduler.POWER_MODE_PSM)
+  status, latency = scheduler.wake(timeout=5)
+  assert status
+  wake = scheduler.wake_latency_stats()[power_scheduler.POWER_MODE_PSM]
+  ready = scheduler.ready_latency_stats()[power_scheduler.POWER_MODE_PSM]
+  assert (wake["count"], ready["count"]) == (1, 1)
+  assert wake["max"] == latency
+  # the first AT answer comes before the registration
+  assert ready["max"] > latency
+
+def test_registration_wait_is_bounded(modem, psm):
+  psm["registration_polls"] = 1000
+  scheduler = power_scheduler(modem, logging, wake_pin=psm["wake_pin"])
+  scheduler.enter_mode(power_scheduler.POWER_MODE_PSM)
+  start = time.monotonic()
+  status, latency = scheduler.wake(timeout=0.3)
+  assert time.monotonic() - start < 1
+  assert not status
+  # the modem did answer
+  assert latency is not None
+  assert scheduler.wake_latency_stats()[power_scheduler.POWER_MODE_PSM]["count"] == 1
+  assert scheduler.ready_latency_stats()[power_scheduler.POWER_MODE_PSM]["count"] == 0
+
+def test_no_answer_without_wake_pin(modem, psm):
+  scheduler = power_scheduler(modem, logging)
+  scheduler.enter_mode(power_scheduler.POWER_MODE_PSM)
+  start = time.monotonic()
+  assert scheduler.wake(timeout=0.3) == (False, None)
+  assert time.monotonic() - start < 1
+  assert scheduler.wake_latency_stats()[power_scheduler.POWER_MODE_PSM]["count"] == 0
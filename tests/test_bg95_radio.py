@@ -0,0 +1,70 @@
+import logging
+import pytest
+import bg95_radio
+from bg95_radio import radio_sampler
+
+def lte(rsrp, sinr, sysmode="eMTC"):
+  return {"result": "OK", "sysmode": sysmode, "lte_rssi": rsrp + 20, "lte_rsrp": rsrp, "lte_sinr": sinr, "lte_rsrq": -10}
+
+@pytest.fixture(params=["numpy", "python"])
+def sampler(request, monkeypatch):
+  # a sampler of 5 samples whose clock is the time of the last sample, with and without numpy
+  if request.param == "python":
+    monkeypatch.setattr(bg95_radio, "np", None)
+  now = [0.0]
+  sampler = radio_sampler(None, logging, capacity=5, clock=lambda: now[0])
+  sampler.now = now
+  return sampler
+
+def add(sampler, samples):
+  for qcsq in samples:
+    sampler.now[0] += 60
+    sampler.add(qcsq, sampler.now[0])
+
+def test_ring_buffer_keeps_the_latest(sampler):
+  add(sampler, [lte(-100 - index, index) for index in range(8)])
+  assert len(sampler) == 5
+  columns = sampler.columns()
+  assert list(columns["time"]) == [240, 300, 360, 420, 480]
+  assert list(columns["rsrp"]) == [-103, -104, -105, -106, -107]
+  assert list(columns["sysmode"]) == [radio_sampler.SYSMODES.index("eMTC")] * 5
+
+def test_stats(sampler):
+  add(sampler, [lte(-100 - index, index) for index in range(5)])
+  stats = sampler.stats("rsrp")
+  assert stats["count"] == 5
+  assert (stats["mean"], stats["min"], stats["max"]) == (-102, -104, -100)
+  assert (stats["p10"], stats["p50"], stats["p90"]) == pytest.approx((-103.6, -102, -100.4))
+  # one dB less per minute
+  assert stats["trend"] == pytest.approx(-1)
+
+def test_window(sampler):
+  add(sampler, [lte(-100 - index, index) for index in range(5)])
+  assert sampler.stats("rsrp", window=120)["count"] == 3
+  assert list(sampler.columns(window=60)["sinr"]) == [3, 4]
+
+def test_missing_metrics_are_skipped(sampler):
+  add(sampler, [{"result": "OK", "sysmode": "GSM", "gsm_rssi": -70}, lte(-90, 5)])
+  assert sampler.stats("rsrp")["count"] == 1
+  assert sampler.stats("rssi")["count"] == 2
+  stats = sampler.stats("sinr")
+  assert (stats["count"], stats["trend"]) == (1, None)
+  assert radio_sampler(capacity=5).stats("rsrq") == {"count": 0}
+
+def test_good_signal(sampler):
+  assert not sampler.good_signal()
+  add(sampler, [lte(-110, 5), lte(-100, 5), lte(-100, 5)])
+  assert sampler.good_signal(window=300)
+  assert not sampler.good_signal(rsrp_min=-95, window=300)
+  add(sampler, [lte(-100, -3)] * 3)
+  assert not sampler.good_signal(window=300)
+
+def test_sample(modem, sim):
+  sim.respond(r'AT\+QCSQ', '\r\n+QCSQ: "NBIoT",-80,-98,12,-9\r\n\r\nOK\r\n')
+  sampler = radio_sampler(modem, logging, clock=lambda: 1000.0)
+  assert sampler.sample()
+  columns = sampler.columns()
+  assert (list(columns["time"]), list(columns["rsrp"]), list(columns["sinr"])) == ([1000.0], [-98], [12])
+  sim.respond(r'AT\+QCSQ', '\r\nERROR\r\n')
+  assert not sampler.sample()
+  assert len(sampler) == 1
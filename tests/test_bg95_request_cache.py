@@ -0,0 +1,78 @@
+import pytest
+
+@pytest.fixture
+def sim_card(sim):
+  # a module with a SIM that can be swapped
+  card = {"IMSI": "262011234567890", "CCID": "89490200001234567890"}
+  sim.respond(r'ATI', '\r\nQuectel\r\nBG95-M3\r\nRevision: BG95M3LAR02A03\r\n\r\nOK\r\n')
+  sim.respond(r'AT\+GSN', '\r\n866349041234567\r\n\r\nOK\r\n')
+  sim.respond(r'AT\+CIMI', lambda match: f'\r\n{card["IMSI"]}\r\n\r\nOK\r\n')
+  sim.respond(r'AT\+QCCID', lambda match: f'\r\n+QCCID: {card["CCID"]}\r\n\r\nOK\r\n')
+  return card
+
+def requests(sim):
+  return [command for command in sim.commands if command in ["ATI", "AT+GSN", "AT+CIMI", "AT+QCCID"]]
+
+def swap(sim_card):
+  sim_card.update(IMSI="262019876543210", CCID="89490200009876543210")
+
+def test_identity_is_queried_once(modem, sim, sim_card):
+  status, identity = modem.identity()
+  assert status
+  assert identity == {"Manufacturer": "Quectel", "Model": "BG95-M3", "Revision": "BG95M3LAR02A03",
+                      "IMEI": "866349041234567", "IMSI": sim_card["IMSI"], "CCID": sim_card["CCID"]}
+  assert modem.identity() == (True, identity)
+  assert requests(sim) == ["ATI", "AT+GSN", "AT+CIMI", "AT+QCCID"]
+
+@pytest.mark.parametrize("urc", ["+QUSIM: 1", "+CPIN: READY"])
+def test_sim_change_urc_invalidates_the_sim_identity(modem, sim, sim_card, urc):
+  modem.identity()
+  swap(sim_card)
+  sim.urc(urc)
+  modem._AT_poll_urcs(timeout=0.1)
+  status, identity = modem.identity()
+  assert (identity["IMSI"], identity["CCID"]) == ("262019876543210", "89490200009876543210")
+  # the module identity is still served from the cache
+  assert requests(sim) == ["ATI", "AT+GSN", "AT+CIMI", "AT+QCCID", "AT+CIMI", "AT+QCCID"]
+
+def test_sim_change_urc_ahead_of_an_answer(modem, sim, sim_card):
+  modem.identity()
+  swap(sim_card)
+  sim.respond(r'AT\+CFUN=1', '\r\n+CPIN: READY\r\n\r\nOK\r\n')
+  modem._AT_send_cmd("AT+CFUN=1")
+  assert modem.identity()[1]["IMSI"] == "262019876543210"
+
+def test_other_urcs_keep_the_cache(modem, sim, sim_card):
+  modem.identity()
+  sim.urc("+QIURC: \"pdpdeact\",1")
+  modem._AT_poll_urcs(timeout=0.1)
+  modem.identity()
+  assert len(requests(sim)) == 4
+
+def test_power_down_invalidates_everything(modem, sim, sim_card):
+  sim.respond(r'AT\+POWD=1', '\r\nOK\r\n')
+  modem.identity()
+  assert modem.AT_POWERDOWN()[0]
+  modem.identity()
+  assert requests(sim) == ["ATI", "AT+GSN", "AT+CIMI", "AT+QCCID"] * 2
+
+def test_failed_request_is_not_cached(modem, sim, sim_card):
+  sim.respond(r'AT\+CIMI', '\r\n+CME ERROR: 10\r\n')
+  assert modem.identity()[0] is False
+  sim.responses.pop(0)
+  assert modem.identity()[0]
+  assert requests(sim) == ["ATI", "AT+GSN", "AT+CIMI", "AT+CIMI", "AT+QCCID"]
+
+def test_status_requests_expire(modem, sim, monkeypatch):
+  sim.respond(r'AT\+CSQ', '\r\n+CSQ: 20,99\r\n\r\nOK\r\n')
+  modem.cached_request(modem.AT_CSQ)
+  modem.cached_request(modem.AT_CSQ)
+  assert sim.commands.count("AT+CSQ") == 1
+  monkeypatch.setitem(modem._STATUS_CACHE_TTL, "AT_CSQ", 0)
+  modem.cached_request(modem.AT_CSQ)
+  assert sim.commands.count("AT+CSQ") == 2
+  # requests without a ttl are not cached
+  sim.respond(r'AT\+CEREG\?', '\r\n+CEREG: 0,1\r\n\r\nOK\r\n')
+  modem.cached_request(modem.AT_CEREG)
+  modem.cached_request(modem.AT_CEREG)
+  assert sim.commands.count("AT+CEREG?") == 2
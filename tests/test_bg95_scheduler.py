@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from bg95_scheduler import at_scheduler
+
+def wait_queued(scheduler, depth):
+  end = time.monotonic() + 2
+  while scheduler.metrics()["queue_depth"] < depth:
+    assert time.monotonic() < end
+    time.sleep(0.001)
+
+def test_grants_by_priority_then_fifo():
+  scheduler = at_scheduler(logging)
+  order = []
+
+  def waiter(name, priority):
+    with scheduler.transaction(priority) as granted:
+      assert granted
+      order.append(name)
+
+  assert scheduler.acquire()
+  threads = []
+  for name, priority in [("bulk", at_scheduler.PRIO_BULK), ("normal 1", at_scheduler.PRIO_NORMAL),
+                         ("high", at_scheduler.PRIO_HIGH), ("normal 2", at_scheduler.PRIO_NORMAL)]:
+    thread = threading.Thread(target=waiter, args=(name, priority))
+    thread.start()
+    threads.append(thread)
+    wait_queued(scheduler, len(threads))
+  scheduler.release()
+  for thread in threads:
+    thread.join()
+  assert order == ["high", "normal 1", "normal 2", "bulk"]
+  assert scheduler.metrics()["max_queue_depth"] == 4
+
+def test_reentrant_for_the_owner():
+  scheduler = at_scheduler(logging)
+  with scheduler.transaction() as outer:
+    with scheduler.transaction(at_scheduler.PRIO_BULK, deadline=0) as inner:
+      assert outer and inner
+    # the inner release keeps the channel
+    other = []
+    thread = threading.Thread(target=lambda: other.append(scheduler.acquire(deadline=0.05)))
+    thread.start()
+    thread.join()
+    assert other == [False]
+  assert scheduler.acquire(deadline=0)
+  scheduler.release()
+
+def test_deadline_expires_in_the_queue():
+  scheduler = at_scheduler(logging)
+  assert scheduler.acquire()
+  result = []
+  thread = threading.Thread(target=lambda: result.append(scheduler.acquire(deadline=0.05)))
+  start = time.monotonic()
+  thread.start()
+  thread.join()
+  assert result == [False]
+  assert time.monotonic() - start >= 0.05
+  metrics = scheduler.metrics()
+  assert metrics["expired"] == 1
+  assert metrics["queue_depth"] == 0
+  scheduler.release()
+
+def test_expired_waiter_does_not_block_the_next():
+  scheduler = at_scheduler(logging)
+  assert scheduler.acquire()
+  results = {}
+
+  def waiter(name, priority, deadline):
+    results[name] = scheduler.acquire(priority, deadline)
+    if results[name]:
+      scheduler.release()
+
+  early = threading.Thread(target=waiter, args=("high", at_scheduler.PRIO_HIGH, 0.05))
+  late = threading.Thread(target=waiter, args=("normal", at_scheduler.PRIO_NORMAL, None))
+  early.start()
+  wait_queued(scheduler, 1)
+  late.start()
+  early.join()
+  scheduler.release()
+  late.join(2)
+  assert results == {"high": False, "normal": True}
+
+def test_transaction_holds_nothing_when_not_granted():
+  scheduler = at_scheduler(logging)
+  assert scheduler.acquire()
+  result = []
+
+  def waiter():
+    with scheduler.transaction(deadline=0) as granted:
+      result.append(granted)
+
+  thread = threading.Thread(target=waiter)
+  thread.start()
+  thread.join()
+  assert result == [False]
+  scheduler.release()
+  assert scheduler.metrics()["granted"] == {at_scheduler.PRIO_NORMAL: 1}
+
+def test_release_by_other_thread_is_ignored():
+  scheduler = at_scheduler(logging)
+  assert scheduler.acquire()
+  thread = threading.Thread(target=scheduler.release)
+  thread.start()
+  thread.join()
+  result = []
+  thread = threading.Thread(target=lambda: result.append(scheduler.acquire(deadline=0)))
+  thread.start()
+  thread.join()
+  assert result == [False]
+  scheduler.release()
@@ -0,0 +1,118 @@
+import time
+
+class servers:
+  # the peers of the sockets of a modem_sim. reply(host, data) returns the segments of the response
+  # and whether the peer closes the connection after them, a new segment arrives after the previous
+  # one was read
+  def __init__(self, sim, reply):
+    self.sockets = {}
+    self._sim = sim
+    self._reply = reply
+    sim.respond(r'AT\+QIOPEN=1,(\d+),"(TCP|UDP)","([^"]+)",(\d+),0,0', self._open)
+    sim.respond(r'AT\+QISEND=(\d+),(\d+)', self._send)
+    sim.respond(r'AT\+QIRD=(\d+),(\d+)', self._read)
+    sim.respond(r'AT\+QICLOSE=(\d+),\d+', lambda match: self.sockets.pop(int(match.group(1))) and '\r\nOK\r\n')
+
+  def _open(self, match):
+    connect_id = int(match.group(1))
+    self.sockets[connect_id] = {"host": match.group(3), "buffer": b'', "segments": []}
+    return f'\r\nOK\r\n\r\n+QIOPEN: {connect_id},0\r\n'
+
+  def _send(self, match):
+    connect_id = int(match.group(1))
+    socket = self.sockets[connect_id]
+
+    def send(data):
+      segments, close = self._reply(socket["host"], data)
+      socket["segments"] = list(segments) + (["closed"] if close else [])
+      return '\r\nSEND OK\r\n' + self._next_segment(connect_id)
+
+    self._sim.receive(int(match.group(2)), send)
+    return '\r\n> '
+
+  def _next_segment(self, connect_id):
+    socket = self.sockets[connect_id]
+    if len(socket["segments"]) == 0:
+      return ''
+    segment = socket["segments"].pop(0)
+    if segment == "closed":
+      return f'\r\n+QIURC: "closed",{connect_id}\r\n'
+    socket["buffer"] += segment
+    if socket["segments"][:1] == ["closed"]:
+      # the last segment comes with the close, without a 'recv' URC of its own
+      return self._next_segment(connect_id)
+    return f'\r\n+QIURC: "recv",{connect_id}\r\n'
+
+  def _read(self, match):
+    connect_id, length = int(match.group(1)), int(match.group(2))
+    socket = self.sockets[connect_id]
+    data, socket["buffer"] = socket["buffer"][:length], socket["buffer"][length:]
+    response = f'\r\n+QIRD: {len(data)}\r\n'.encode() + data + b'\r\n\r\nOK\r\n'
+    if (len(data) < length) or (len(socket["buffer"]) == 0):
+      response += self._next_segment(connect_id).encode()
+    return response
+
+def echo(host, data):
+  # answers in two segments and closes
+  return [host.encode() + b':', data], True
+
+def test_fan_out(modem, sim):
+  servers(sim, echo)
+  status, responses = modem.SOCKET_FAN_OUT([{"host": "a.example.com", "port": 80, "data": b'one'},
+                                            {"host": "b.example.com", "port": 80, "data": b'two'}])
+  assert status
+  assert responses == [{"result": "OK", "payload": b'a.example.com:one'}, {"result": "OK", "payload": b'b.example.com:two'}]
+  # both are opened before the data goes out
+  opens = [index for index, command in enumerate(sim.commands) if command.startswith("AT+QIOPEN")]
+  sends = [index for index, command in enumerate(sim.commands) if command.startswith("AT+QISEND")]
+  assert max(opens) < min(sends)
+  assert not modem._socket_events
+
+def test_long_response_is_read_completely(modem, sim):
+  body = bytes(range(256)) * 20
+  servers(sim, lambda host, data: ([body[:1000], body[1000:4000], body[4000:]], True))
+  status, responses = modem.SOCKET_FAN_OUT([{"host": "a.example.com", "port": 80, "data": b'GET'}])
+  assert status
+  assert responses[0]["payload"] == body
+
+def test_connect_ids_in_use_are_skipped(modem, sim):
+  servers(sim, echo)
+  sim.respond(r'AT\+QIOPEN=1,10,"UDP","1.2.3.4",5683,0,0', '\r\nOK\r\n\r\n+QIOPEN: 10,0\r\n')
+  sim.respond(r'AT\+QSSLOPEN=1,1,0,"c.example.com",443,0', '\r\nOK\r\n\r\n+QSSLOPEN: 0,0\r\n')
+  # e.g. the socket of a coap_client and a TLS connection
+  assert modem.AT_QIOPEN(10, "UDP", "1.2.3.4", 5683)[0]
+  assert modem.AT_QSSLOPEN(1, 0, "c.example.com")[0]
+  status, responses = modem.SOCKET_FAN_OUT([{"host": "a.example.com", "port": 80, "data": b'one'},
+                                            {"host": "b.example.com", "port": 80, "data": b'two'}])
+  assert status
+  assert [int(command.split(",")[1]) for command in sim.commands if command.startswith("AT+QIOPEN=")] == [10, 1, 2]
+  assert sorted(modem._socket_events) == [0, 10]
+
+def test_more_requests_than_free_connect_ids(modem, sim):
+  servers(sim, echo)
+  modem._socket_events[5] = {}
+  requests = [{"host": "a.example.com", "port": 80, "data": b'x'}] * 12
+  assert modem.SOCKET_FAN_OUT(requests) == (False, None)
+  assert not any(command.startswith("AT+QIOPEN") for command in sim.commands)
+  assert modem._free_connect_ids(11) == [0, 1, 2, 3, 4, 6, 7, 8, 9, 10, 11]
+
+def test_udp_response_is_one_datagram(modem, sim):
+  servers(sim, lambda host, data: ([b'pong'], False))
+  start = time.monotonic()
+  status, responses = modem.SOCKET_FAN_OUT([{"host": "1.2.3.4", "port": 7, "data": b'ping', "service_type": "UDP"}], timeout=5)
+  assert status
+  assert responses[0]["payload"] == b'pong'
+  assert time.monotonic() - start < 1
+
+def test_tcp_peer_that_stays_open_until_the_deadline(modem, sim):
+  servers(sim, lambda host, data: ([b'partial'], False))
+  start = time.monotonic()
+  status, responses = modem.SOCKET_FAN_OUT([{"host": "a.example.com", "port": 80, "data": b'x', "timeout": 0.3}])
+  assert time.monotonic() - start >= 0.3
+  assert responses[0] == {"result": "OK", "payload": b'partial'}
+
+def test_no_response(modem, sim):
+  servers(sim, lambda host, data: ([], False))
+  status, responses = modem.SOCKET_FAN_OUT([{"host": "a.example.com", "port": 80, "data": b'x'}], timeout=0.2)
+  assert not status
+  assert responses == [{"result": "ERROR", "payload": b''}]
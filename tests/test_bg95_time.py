@@ -0,0 +1,109 @@
+import logging
+from datetime import datetime, timezone
+import pytest
+import bg95_time
+from bg95_atcmds import bg95_atcmds
+from bg95_time import time_service
+
+def utc(*args):
+  return datetime(*args, tzinfo=timezone.utc)
+
+@pytest.mark.parametrize("date, clock, expected", [
+  ("24/05/01", "12:34:56+08", utc(2024, 5, 1, 10, 34, 56)),
+  ("24/05/01", "01:00:00+08", utc(2024, 4, 30, 23, 0, 0)),
+  ("24/12/31", "22:00:00-20", utc(2025, 1, 1, 3, 0, 0)),
+  ("2024/05/01", "12:34:56+00", utc(2024, 5, 1, 12, 34, 56)),
+  ("2024/05/01", "12:34:56", utc(2024, 5, 1, 12, 34, 56)),
+  ("24/02/29", "00:00:00+01", utc(2024, 2, 28, 23, 45, 0)),
+])
+def test_parse_clock(date, clock, expected):
+  assert bg95_atcmds.parse_clock(date, clock) == expected
+
+@pytest.mark.parametrize("date, clock", [
+  ("00/00/00", "00:00:00+0"),
+  ("23/02/29", "00:00:00+00"),
+  ("24/05/01", "25:00:00+00"),
+  ("24-05-01", "12:34:56+00"),
+  ("24/05/01", "12:34"),
+  ("", ""),
+])
+def test_parse_clock_malformed(date, clock):
+  assert bg95_atcmds.parse_clock(date, clock) is None
+
+def test_cclk_request(modem, sim):
+  sim.respond(r'AT\+CCLK\?', '\r\n+CCLK: "24/05/01,12:34:56+08"\r\n\r\nOK\r\n')
+  status, cmd, response = modem.AT_CCLK_REQUEST()
+  assert status
+  assert response["datetime"] == utc(2024, 5, 1, 10, 34, 56)
+
+def test_qntp(modem, sim):
+  sim.respond(r'AT\+QNTP=1,"nl.pool.ntp.org",123', '\r\nOK\r\n\r\n+QNTP: 0,"2024/05/01,12:34:56+00"\r\n')
+  status, cmd, response = modem.AT_QNTP()
+  assert status
+  assert response["finresult"] == 0
+  assert response["datetime"] == utc(2024, 5, 1, 12, 34, 56)
+
+@pytest.fixture
+def monotonic(monkeypatch):
+  # the host clock is right at 1_700_000_000 when time.monotonic() is 1000
+  now = [1000.0]
+  monkeypatch.setattr(bg95_time.time, "monotonic", lambda: now[0])
+  monkeypatch.setattr(bg95_time.time, "time", lambda: 1_699_999_000.0 + now[0])
+  return now
+
+def test_now_follows_the_reference(monotonic):
+  service = time_service(None, logging)
+  assert not service.synced()
+  service.add_reference(1_700_000_000.0)
+  monotonic[0] += 10
+  assert service.now() == 1_700_000_010.0
+  assert service.stamp(1005.0) == 1_700_000_005.0
+
+def test_now_holds_after_a_reference_that_is_behind(monotonic):
+  service = time_service(None, logging)
+  service.add_reference(1_700_000_000.0)
+  monotonic[0] += 10
+  assert service.now() == 1_700_000_010.0
+  # 2 seconds behind, below the step threshold
+  service.add_reference(1_700_000_008.0)
+  monotonic[0] += 1
+  assert service.now() == 1_700_000_010.0
+  monotonic[0] += 2
+  assert service.now() == 1_700_000_011.0
+  assert service.stats()["steps"] == 0
+
+def test_large_difference_steps_the_time(monotonic):
+  service = time_service(None, logging)
+  service.add_reference(1_700_000_000.0)
+  assert service.now() == 1_700_000_000.0
+  service.add_reference(1_600_000_000.0)
+  assert service.now() == 1_600_000_000.0
+  assert service.stats()["steps"] == 1
+  assert service.host_offset() == 100_000_000.0
+
+def test_drift_estimate(monotonic):
+  service = time_service(None, logging)
+  start = monotonic[0]
+  for elapsed in [0, 300, 700, 1200]:
+    monotonic[0] = start + elapsed
+    # UTC runs 100 ppm faster than the host clock
+    service.add_reference(1_700_000_000.0 + elapsed * (1 + 100e-6))
+  assert service.stats()["drift_ppm"] == pytest.approx(100, abs=0.01)
+  monotonic[0] = start + 2200
+  assert service.now() == pytest.approx(1_700_000_000.0 + 2200 * (1 + 100e-6), abs=1e-6)
+
+def test_sync_from_ntp(modem, sim):
+  sim.respond(r'AT\+QNTP=1,"nl.pool.ntp.org",123', '\r\nOK\r\n\r\n+QNTP: 0,"2024/05/01,12:34:56+00"\r\n')
+  sim.respond(r'AT\+CCLK\?', '\r\n+CCLK: "24/05/01,14:34:58+08"\r\n\r\nOK\r\n')
+  service = time_service(modem, logging)
+  assert service.sync()
+  assert abs(service.now() - utc(2024, 5, 1, 12, 34, 56).timestamp()) < 1
+  stats = service.stats()
+  assert (stats["source"], stats["syncs"], stats["module_offset_sec"]) == (time_service.SOURCE_NTP, 1, 2)
+
+def test_sync_failure(modem, sim):
+  sim.respond(r'AT\+CCLK\?', '\r\n+CME ERROR: 3\r\n')
+  service = time_service(modem, logging, source=time_service.SOURCE_NETWORK)
+  assert not service.sync()
+  assert not service.synced()
+  assert service.stats()["failures"] == 1
@@ -0,0 +1,106 @@
+import logging
+import time
+import pytest
+from bg95_radio import radio_sampler
+from bg95_transmit import transmit_scheduler
+
+GOOD = '+QCSQ: "eMTC",-70,-90,15,-8'
+POOR = '+QCSQ: "eMTC",-90,-115,-2,-16'
+
+@pytest.fixture
+def radio(modem, sim):
+  # the serving cell and signal of a modem_sim, and the POSTs it sent. invalidate the request
+  # cache of the modem after changing them
+  radio = {"nwinfo": '+QNWINFO: "eMTC","26201","LTE BAND 8",3740', "qcsq": POOR, "posts": [], "post_status": True}
+  sim.respond(r'AT\+QNWINFO', lambda match: f'\r\n{radio["nwinfo"]}\r\n\r\nOK\r\n')
+  sim.respond(r'AT\+QCSQ', lambda match: f'\r\n{radio["qcsq"]}\r\n\r\nOK\r\n')
+
+  def post(url, body):
+    radio["posts"].append(body)
+    # some airtime for the report
+    time.sleep(0.001)
+    return radio["post_status"], {"result": "OK" if radio["post_status"] else "ERROR"}
+
+  modem.HTTP_POST = post
+  modem.HTTPS_POST = post
+  return radio
+
+def change(modem, radio, **kwargs):
+  radio.update(kwargs)
+  modem.invalidate_request_cache()
+
+def test_bulk_waits_for_a_good_link(modem, radio):
+  scheduler = transmit_scheduler(modem, logging)
+  bulk = scheduler.submit("http://example.com", "bulk")
+  urgent = scheduler.submit("http://example.com", "urgent", transmit_scheduler.PRIO_URGENT)
+  normal = scheduler.submit("https://example.com", "normal", transmit_scheduler.PRIO_NORMAL)
+  assert scheduler.poll() == 2
+  assert radio["posts"] == ["urgent", "normal"]
+  assert (bulk["status"], urgent["status"], normal["status"]) == ("QUEUED", "SENT", "SENT")
+  change(modem, radio, qcsq=GOOD)
+  assert scheduler.poll() == 1
+  assert bulk["status"] == "SENT"
+  assert scheduler.pending() == 0
+
+def test_no_service(modem, radio):
+  change(modem, radio, nwinfo="+QNWINFO: No Service", qcsq=GOOD)
+  scheduler = transmit_scheduler(modem, logging)
+  assert scheduler.link_quality() is None
+  normal = scheduler.submit("http://example.com", "normal", transmit_scheduler.PRIO_NORMAL)
+  scheduler.submit("http://example.com", "urgent", transmit_scheduler.PRIO_URGENT)
+  assert scheduler.poll() == 1
+  assert radio["posts"] == ["urgent"]
+  assert normal["status"] == "QUEUED"
+
+def test_bulk_close_to_its_deadline_is_sent_on_a_poor_link(modem, radio):
+  scheduler = transmit_scheduler(modem, logging)
+  scheduler.submit("http://example.com", "late", deadline=30)
+  scheduler.submit("http://example.com", "early", deadline=600)
+  assert scheduler.poll() == 1
+  assert radio["posts"] == ["late"]
+
+def test_bulk_acts(modem, radio):
+  change(modem, radio, nwinfo='+QNWINFO: "NBIoT","26201","LTE BAND 8",3740', qcsq='+QCSQ: "NBIoT",-70,-90,15,-8')
+  scheduler = transmit_scheduler(modem, logging, bulk_acts=["eMTC"])
+  link = scheduler.link_quality()
+  assert link == {"act": "NBIoT", "band": "LTE BAND 8", "rsrp": -90, "sinr": 15, "rsrq": -8}
+  assert not scheduler.link_is_good(link)
+  assert transmit_scheduler(modem, logging).link_is_good(link)
+
+def test_failed_post_is_retried_then_failed(modem, radio):
+  radio["post_status"] = False
+  scheduler = transmit_scheduler(modem, logging)
+  message = scheduler.submit("http://example.com", "urgent", transmit_scheduler.PRIO_URGENT)
+  for _ in range(transmit_scheduler._MAX_ATTEMPTS):
+    assert scheduler.poll() == 0
+  assert (message["status"], message["attempts"]) == ("FAILED", 3)
+  report = scheduler.report()
+  assert (report["retries"], report["failed"], report["sent"]) == (2, 1, 0)
+
+def test_expired(modem, radio):
+  scheduler = transmit_scheduler(modem, logging)
+  message = scheduler.submit("http://example.com", "bulk", deadline=-1)
+  assert scheduler.poll() == 0
+  assert message["status"] == "EXPIRED"
+  assert (scheduler.pending(), scheduler.report()["expired"]) == (0, 1)
+
+def test_report_of_a_deferred_upload(modem, radio):
+  scheduler = transmit_scheduler(modem, logging)
+  scheduler.submit("http://example.com", "x" * 100)
+  change(modem, radio, qcsq=GOOD)
+  assert scheduler.flush(max_wait=0)
+  report = scheduler.report()
+  assert (report["sent"], report["bytes"]) == (1, 100)
+  # sent at 15 dB SINR and -90 dBm instead of -2 dB and -115 dBm
+  assert report["immediate_airtime_sec"] > report["airtime_sec"]
+  assert report["energy_saved_pct"] > 0
+
+def test_link_from_the_sampler(modem, sim, radio):
+  sampler = radio_sampler(modem, logging)
+  for qcsq in [GOOD, POOR, GOOD]:
+    change(modem, radio, qcsq=qcsq)
+    sampler.sample()
+  scheduler = transmit_scheduler(modem, logging, sampler=sampler)
+  del sim.commands[:]
+  assert scheduler.link_quality()["rsrp"] == -90
+  assert "AT+QCSQ" not in sim.commands
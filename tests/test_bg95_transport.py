@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from bg95_serial import bg95_serial
+from bg95_transport import loopback_transport, open_transport, serial_transport
+
+def test_open_transport_loopback():
+  port = open_transport("loopback://", timeout=0)
+  assert isinstance(port, loopback_transport)
+  assert port.name == "loopback://"
+  assert port.is_open
+
+def test_loopback_echoes_without_responder():
+  port = loopback_transport(timeout=0)
+  port.write(b'AT\r')
+  assert port.in_waiting == 3
+  assert port.read(10) == b'AT\r'
+  assert port.in_waiting == 0
+
+def test_loopback_responder_and_feed():
+  port = loopback_transport(timeout=0, responder=lambda data: b'\r\nOK\r\n' if data == b'AT\r' else None)
+  port.write(b'AT\r')
+  port.write(b'ignored')
+  port.feed(b'+URC\r\n')
+  assert port.readline() == b'\r\n'
+  assert port.readline() == b'OK\r\n'
+  assert port.readline() == b'+URC\r\n'
+
+def test_read_returns_what_arrived_within_timeout():
+  port = loopback_transport(timeout=0.05)
+  port.feed(b'abc')
+  start = time.monotonic()
+  assert port.read(10) == b'abc'
+  assert time.monotonic() - start >= 0.05
+  # a partial line stays a partial line
+  port.feed(b'no line end')
+  assert port.readline() == b'no line end'
+
+def test_readinto():
+  port = loopback_transport(timeout=0)
+  port.feed(b'12345')
+  buffer = bytearray(3)
+  assert port.readinto(buffer) == 3
+  assert buffer == b'123'
+  assert port.read(5) == b'45'
+
+def test_reset_input_buffer_and_close():
+  port = loopback_transport(timeout=None)
+  port.feed(b'stale')
+  port.reset_input_buffer()
+  assert port.in_waiting == 0
+  port.close()
+  # a closed port does not block a reader without timeout
+  assert port.read(1) == b''
+
+def test_stats_count_bytes_and_latency():
+  port = loopback_transport(timeout=0)
+  port.write(b'AT\r')
+  port.read(3)
+  stats = port.stats()
+  assert stats["writes"] == 1
+  assert stats["bytes_written"] == 3
+  assert stats["bytes_read"] == 3
+  assert stats["latency_count"] == 1
+  port.reset_stats()
+  assert port.stats()["writes"] == 0
+
+def count_timeout_updates(port):
+  # the pyserial port reconfigures itself, a termios ioctl on a real port, when its timeout is set
+  calls = [0]
+  reconfigure = port._port._reconfigure_port
+
+  def counting():
+    calls[0] += 1
+    reconfigure()
+
+  port._port._reconfigure_port = counting
+  return calls
+
+def test_serial_transport_keeps_the_port_timeout():
+  my_serial = bg95_serial(logging, port="loop://")
+  assert my_serial.open_usb()
+  assert isinstance(my_serial._ser, serial_transport)
+  calls = count_timeout_updates(my_serial._ser)
+  for index in range(20):
+    # the line arrives while the read waits for it, loop:// sends back what is written
+    writer = threading.Timer(0.005, my_serial._ser.write, [f"+CSQ: {index},99\r\n".encode()])
+    writer.start()
+    assert my_serial._read_line(5) == (True, f"+CSQ: {index},99")
+    writer.join()
+  assert calls[0] <= 1
+  # a read that times out only changes it close to the deadline
+  assert my_serial._read_line(0.3) == (True, "")
+  assert calls[0] <= 3
+  my_serial.close_usb()
+
+def test_at_command_over_loopback(modem, sim):
+  sim.respond(r'AT\+CSQ', '\r\n+CSQ: 20,99\r\n\r\nOK\r\n')
+  status, cmd, response = modem.AT_CSQ()
+  assert status
+  assert response["rssi"] == 20
+  assert sim.commands[-1] == "AT+CSQ"
+
+def test_urc_reaches_its_handler(modem, sim):
+  lines = []
+  modem.register_urc_handler("+QIND:", lines.append)
+  sim.urc('+QIND: "csq",20,99')
+  assert modem.AT()[0]
+  assert lines == ['+QIND: "csq",20,99']
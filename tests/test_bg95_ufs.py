@@ -0,0 +1,70 @@
+import random
+from bg95_atcmds import bg95_atcmds
+
+DATA = random.Random(7).randbytes(10243)
+
+def test_checksum():
+  assert bg95_atcmds.ufs_checksum(b'\x12\x34\x56\x78') == 0x1234 ^ 0x5678
+  assert bg95_atcmds.ufs_checksum(b'\x12\x34\x56') == 0x1234 ^ 0x5600
+  assert bg95_atcmds.ufs_checksum(b'') == 0
+
+def test_small_file_in_one_upload(modem, sim, files):
+  assert modem.UFS_UPLOAD("small.txt", "hello") == (True, {"size": 5})
+  assert files.files["small.txt"] == b'hello'
+  assert not any(command.startswith("AT+QFWRITE") for command in sim.commands)
+  assert modem.UFS_DOWNLOAD("small.txt") == (True, b'hello')
+
+def test_chunked_upload_is_verified(modem, sim, files):
+  assert modem.UFS_UPLOAD("big.bin", DATA) == (True, {"size": len(DATA)})
+  assert files.written == [4096, 4096, 2051]
+  assert files.files["big.bin"] == DATA
+  assert 'AT+QFDWL="big.bin"' in sim.commands
+
+def test_upload_resumes_after_what_is_on_the_modem(modem, sim, files):
+  files.files["big.bin"] = bytearray(DATA[:5000])
+  assert modem.UFS_UPLOAD("big.bin", DATA) == (True, {"size": len(DATA)})
+  assert 'AT+QFSEEK=100,5000,0' in sim.commands
+  assert files.written == [4096, 1147]
+  assert files.files["big.bin"] == DATA
+
+def test_resume_after_a_different_file_is_detected(modem, files):
+  files.files["big.bin"] = bytearray(b'x' * 5000)
+  assert modem.UFS_UPLOAD("big.bin", DATA) == (False, {"size": 0})
+  assert "big.bin" not in files.files
+  # the next attempt starts from scratch
+  assert modem.UFS_UPLOAD("big.bin", DATA) == (True, {"size": len(DATA)})
+  assert files.files["big.bin"] == DATA
+
+def test_corrupted_chunk_is_detected(modem, files):
+  # one flipped bit in the second chunk
+  files.corrupt = lambda data: (data[:10] + bytes([data[10] ^ 1]) + data[11:]) if len(files.written) == 1 else data
+  assert modem.UFS_UPLOAD("big.bin", DATA) == (False, {"size": 0})
+  assert "big.bin" not in files.files
+
+def test_no_progress_fails(modem, files):
+  files.corrupt = lambda data: b''
+  assert modem.UFS_UPLOAD("big.bin", DATA)[0] is False
+  assert files.written == [0]
+
+def test_upload_without_verify(modem, sim, files):
+  assert modem.UFS_UPLOAD("big.bin", DATA, verify=False)[0]
+  assert not any(command.startswith("AT+QFDWL") for command in sim.commands)
+
+def test_chunked_download(modem, sim, files):
+  files.files["big.bin"] = bytearray(DATA)
+  assert modem.UFS_DOWNLOAD("big.bin") == (True, DATA)
+  assert [command for command in sim.commands if command.startswith("AT+QFREAD")] == ['AT+QFREAD=100,4096', 'AT+QFREAD=100,4096',
+                                                                                     'AT+QFREAD=100,2051']
+
+def test_download_resumes_after_received(modem, sim, files):
+  files.files["big.bin"] = bytearray(DATA)
+  assert modem.UFS_DOWNLOAD("big.bin", received=DATA[:9000]) == (True, DATA)
+  assert 'AT+QFSEEK=100,9000,0' in sim.commands
+
+def test_download_resumed_after_a_different_file_starts_over(modem, files):
+  files.files["big.bin"] = bytearray(DATA)
+  assert modem.UFS_DOWNLOAD("big.bin", received=b'x' * 9000) == (False, b'')
+  assert modem.UFS_DOWNLOAD("big.bin") == (True, DATA)
+
+def test_download_of_a_missing_file(modem, files):
+  assert modem.UFS_DOWNLOAD("missing.bin", received=b'abc') == (False, b'abc')
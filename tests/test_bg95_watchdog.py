@@ -0,0 +1,85 @@
+import logging
+import pytest
+from bg95_watchdog import health_watchdog
+
+@pytest.fixture
+def watchdog(modem):
+  return health_watchdog(modem, logging, ladder=[health_watchdog.STEP_RESYNC, health_watchdog.STEP_ECHO, health_watchdog.STEP_PDP])
+
+def silent(modem, sim, count):
+  # commands the modem does not answer
+  sim.respond(r'AT\+SILENT', None)
+  for _ in range(count):
+    assert not modem._AT_send_cmd("AT+SILENT", 0.05)[0]
+
+def test_error_answers_are_not_link_failures(watchdog, modem):
+  for _ in range(3):
+    status, response, result = modem._AT_send_cmd("AT+BOGUS")
+    assert not status
+    assert result["CME_ERROR_CODE"] == {modem._SERIAL_UNDEFINED}
+  assert watchdog.healthy()
+
+def test_cme_errors(watchdog, modem, sim):
+  sim.respond(r'AT\+QIOPEN=.*', '\r\n+CME ERROR: 3\r\n')
+  sim.respond(r'AT\+QHTTPGET=.*', '\r\n+CME ERROR: 702\r\n')
+  for _ in range(3):
+    modem._AT_send_cmd("AT+QIOPEN=1")
+  assert watchdog.healthy()
+  for _ in range(3):
+    modem._AT_send_cmd("AT+QHTTPGET=1")
+  assert not watchdog.healthy()
+
+@pytest.mark.parametrize("code, link_failure", [
+  ({-2}, True),
+  ({-6}, True),
+  ({-4}, False),
+  ({-5}, False),
+  ({550}, True),
+  ({564}, True),
+  ({565}, False),
+  ({730}, True),
+  ({10}, False),
+])
+def test_is_link_failure(code, link_failure):
+  assert health_watchdog._is_link_failure({"CME_ERROR_CODE": code}) == link_failure
+
+def test_timeouts_and_an_answer_in_between(watchdog, modem, sim):
+  silent(modem, sim, 2)
+  assert modem.AT()[0]
+  silent(modem, sim, 2)
+  assert watchdog.healthy()
+  silent(modem, sim, 1)
+  assert not watchdog.healthy()
+
+def test_resync_recovers_without_a_pdp_context(watchdog, modem, sim):
+  # e.g. GNSS only, AT+QIACT? is not asked
+  silent(modem, sim, 3)
+  del sim.commands[:]
+  assert watchdog.check()
+  assert watchdog.healthy()
+  assert "AT+QIACT?" not in sim.commands
+  stats = watchdog.stats()
+  assert (stats["steps"]["RESYNC"]["attempts"], stats["steps"]["RESYNC"]["successes"]) == (1, 1)
+  assert stats["steps"]["ECHO"]["attempts"] == 0
+
+def test_lost_pdp_context_climbs_the_ladder(watchdog, modem, sim):
+  context = {"state": 1}
+  sim.respond(r'AT\+QIACT=1', lambda match: context.update(state=1) or '\r\nOK\r\n')
+  sim.respond(r'AT\+QIDEACT=1', lambda match: context.update(state=0) or '\r\nOK\r\n')
+  sim.respond(r'AT\+QIACT\?', lambda match: f'\r\n+QIACT: 1,{context["state"]},1,"10.0.0.1"\r\n\r\nOK\r\n')
+  assert modem.AT_QIACT()[0]
+  context["state"] = 0
+  silent(modem, sim, 3)
+  assert watchdog.check()
+  stats = watchdog.stats()["steps"]
+  assert [(stats[step]["attempts"], stats[step]["successes"]) for step in ["RESYNC", "ECHO", "PDP"]] == [(1, 0), (1, 0), (1, 1)]
+  assert context["state"] == 1
+
+def test_failed_recovery(watchdog, modem, sim):
+  silent(modem, sim, 3)
+  sim.responses = []
+  watchdog._RESYNC_ATTEMPTS = 1
+  watchdog._RESYNC_TIMEOUT = 0
+  assert not watchdog.check()
+  assert watchdog.stats()["failed_recoveries"] == 1
+  assert not watchdog.healthy()
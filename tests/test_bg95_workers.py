@@ -0,0 +1,104 @@
+import logging
+import queue
+import threading
+import time
+import pytest
+from bg95_workers import modem_supervisor
+
+class thread_process:
+  # stands in for a worker process, serves requests with handler(method, args) in a thread
+  def __init__(self, ports, requests, responses, handler):
+    self._ports = ports
+    self._requests = requests
+    self._responses = responses
+    self._handler = handler
+    self._killed = False
+    self._thread = threading.Thread(target=self._run, daemon=True)
+
+  def start(self):
+    self._thread.start()
+
+  def _run(self):
+    self._responses.put((None, "ready", self._ports))
+    while True:
+      request = self._requests.get()
+      if request is None:
+        return
+      request_id, port, method, args = request
+      status, response = self._handler(method, args)
+      if not self._killed:
+        self._responses.put((request_id, status, response))
+
+  def is_alive(self):
+    return self._thread.is_alive() and not self._killed
+
+  def kill(self):
+    self._killed = True
+
+  def join(self, timeout=None):
+    # a killed worker is gone at once, even when its thread still hangs in the handler
+    if not self._killed:
+      self._thread.join(timeout)
+
+class thread_context:
+  Queue = queue.Queue
+
+  def __init__(self, handler):
+    self.handler = handler
+    self.processes = []
+
+  def Process(self, target, name, args, daemon):
+    ports, requests, responses, log_level = args
+    process = thread_process(ports, requests, responses, self.handler)
+    self.processes.append(process)
+    return process
+
+@pytest.fixture
+def workers():
+  # a supervisor of two workers with one modem each, whose requests hang while hang is set
+  hang = threading.Event()
+
+  def handler(method, args):
+    if hang.is_set():
+      time.sleep(2)
+    return True, {"result": "OK", "payload": f"{method} {args[0]}"}
+
+  supervisor = modem_supervisor(logging, shards=[["COM11"], ["COM12"]])
+  supervisor._context = thread_context(handler)
+  supervisor._WATCH_INTERVAL = 0.05
+  supervisor.hang = hang
+  assert supervisor.start()
+  yield supervisor
+  hang.clear()
+  supervisor.stop()
+
+def test_requests_go_to_the_worker_of_the_port(workers):
+  assert workers.client("COM12").HTTP_GET("http://example.com") == (True, {"result": "OK", "payload": "HTTP_GET http://example.com"})
+  assert workers.client("COM11").HTTPS_POST("https://example.com", "body")[0]
+  assert workers.stats() == {"workers": 2, "alive": 2, "pending": 0, "restarts": 0}
+
+def test_unknown_port_and_method(workers):
+  assert workers.request("COM13", "HTTP_GET", ("http://example.com",)) == (False, None)
+  assert workers.request("COM11", "close_usb", ()) == (False, None)
+  assert len(workers._context.processes) == 2
+
+def test_hanging_worker_is_restarted_at_the_deadline(workers):
+  workers.hang.set()
+  start = time.monotonic()
+  assert workers.client("COM11").HTTP_GET("http://example.com", deadline=0.2) == (False, None)
+  assert time.monotonic() - start < 1
+  stats = workers.stats()
+  assert (stats["restarts"], stats["pending"]) == (1, 0)
+  # the restarted worker serves again, the other worker was left alone
+  workers.hang.clear()
+  assert workers.client("COM11").HTTP_GET("http://example.com")[0]
+  assert len(workers._context.processes) == 3
+  assert workers._context.processes[1].is_alive()
+
+def test_dead_worker_is_restarted(workers):
+  workers._context.processes[0].kill()
+  end = time.monotonic() + 1
+  while (workers.stats()["alive"] < 2) and (time.monotonic() < end):
+    time.sleep(0.01)
+  assert workers.stats()["restarts"] == 1
+  assert workers.client("COM11").HTTP_GET("http://example.com")[0]